@@ -0,0 +1,28 @@
+"""
+Delete revoked refresh-token rows whose token has expired anyway.
+
+Usage:
+  python manage.py purge_revoked_tokens
+  python manage.py purge_revoked_tokens --dry-run
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from authentication.models import RevokedToken
+from authentication.revocation import get_revoked_token_store
+
+
+class Command(BaseCommand):
+    help = 'Purge expired entries from the revoked refresh-token store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be removed.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = RevokedToken.objects.filter(expires_at__lte=timezone.now()).count()
+            self.stdout.write(f'{count} expired revoked token(s) would be purged.')
+            return
+
+        removed = get_revoked_token_store().purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Purged {removed} expired revoked token(s).'))
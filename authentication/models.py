@@ -5,6 +5,8 @@ from django.db import models
 from django.utils import timezone
 import threading
 
+from fred.model_mixins import DirtyFieldsMixin
+
 # Thread-local storage for tracking profile completion calculations
 _thread_locals = threading.local()
 
@@ -49,7 +51,7 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(DirtyFieldsMixin, AbstractBaseUser, PermissionsMixin):
     class Types(models.TextChoices):
         ADMIN = "ADMIN", "Admin"
         CLIENT = "CLIENT", "Client"
@@ -242,4 +244,24 @@ class Profile(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['location']),
-        ]
\ No newline at end of file
+        ]
+
+class RevokedToken(models.Model):
+    """
+    Durable record of a revoked refresh-token JTI (logout / rotation).
+    Read through authentication.revocation; rows past expires_at are purged by
+    `manage.py purge_revoked_tokens`.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='revoked_tokens')
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['revoked_at']),
+        ]
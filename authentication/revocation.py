@@ -0,0 +1,208 @@
+"""
+Revoked refresh-token (JTI) store used by logout and refresh-token rotation.
+
+The store is pluggable through ``settings.JWT_REVOCATION['STORE']``:
+
+  - DatabaseRevokedTokenStore: RevokedToken rows only.
+  - CachedRevokedTokenStore (default): an in-process Bloom filter answers "never
+    revoked" without I/O; possible hits are confirmed in the cache (TTL = remaining
+    token lifetime) and then in the RevokedToken table, which stays the source of
+    truth if the cache is cold, evicted or unavailable.
+
+The Bloom filter picks up revocations made by other processes by polling
+RevokedToken.revoked_at at most every BLOOM_SYNC_SECONDS; set it to 0 to sync on
+every check.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from authentication.models import RevokedToken
+
+logger = logging.getLogger('authentication')
+
+DEFAULTS = {
+    'STORE': 'authentication.revocation.CachedRevokedTokenStore',
+    'CACHE_KEY_PREFIX': 'jwt:revoked:',
+    'BLOOM_CAPACITY': 100_000,
+    'BLOOM_ERROR_RATE': 0.001,
+    'BLOOM_SYNC_SECONDS': 2,
+    'BLOOM_REBUILD_SECONDS': 60 * 60,
+}
+
+
+def revocation_setting(name):
+    return getattr(settings, 'JWT_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+def _expiry_from_claim(exp) -> datetime:
+    return datetime.fromtimestamp(int(exp), tz=dt_timezone.utc)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on a single blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.num_hashes))
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    @property
+    def saturated(self) -> bool:
+        return self.count >= self.capacity
+
+
+class BaseRevokedTokenStore:
+    def revoke(self, jti: str, expires_at: datetime, user_id=None) -> bool:
+        """Record the revocation; returns False when ``jti`` was already revoked."""
+        raise NotImplementedError
+
+    def is_revoked(self, jti: str) -> bool:
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Drop entries whose token has expired anyway; returns the number removed."""
+        return 0
+
+
+class DatabaseRevokedTokenStore(BaseRevokedTokenStore):
+    def revoke(self, jti, expires_at, user_id=None):
+        _, created = RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'expires_at': expires_at, 'user_id': user_id},
+        )
+        return created
+
+    def is_revoked(self, jti):
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def purge_expired(self):
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class CachedRevokedTokenStore(DatabaseRevokedTokenStore):
+    def __init__(self):
+        self.key_prefix = revocation_setting('CACHE_KEY_PREFIX')
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._watermark = None
+        self._last_sync = 0.0
+        self._last_rebuild = 0.0
+
+    def _cache_key(self, jti):
+        return f"{self.key_prefix}{jti}"
+
+    # -- Bloom front -------------------------------------------------------
+
+    def _rebuild_bloom(self, now):
+        bloom = BloomFilter(revocation_setting('BLOOM_CAPACITY'), revocation_setting('BLOOM_ERROR_RATE'))
+        watermark = timezone.now()
+        for jti in RevokedToken.objects.filter(expires_at__gt=watermark).values_list('jti', flat=True).iterator():
+            bloom.add(jti)
+        if bloom.saturated:
+            logger.warning("Revoked-token Bloom filter is over capacity; raise JWT_REVOCATION['BLOOM_CAPACITY'].")
+        self._bloom, self._watermark = bloom, watermark
+        self._last_sync = self._last_rebuild = now
+
+    def _sync_bloom(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._bloom is None or now - self._last_rebuild >= revocation_setting('BLOOM_REBUILD_SECONDS'):
+                self._rebuild_bloom(now)
+                return
+            if now - self._last_sync < revocation_setting('BLOOM_SYNC_SECONDS'):
+                return
+            # Small overlap so rows committed around the previous watermark are not missed.
+            since = self._watermark - timedelta(seconds=1)
+            self._watermark = timezone.now()
+            for jti in RevokedToken.objects.filter(revoked_at__gte=since).values_list('jti', flat=True):
+                self._bloom.add(jti)
+            self._last_sync = now
+
+    # -- Store API -----------------------------------------------------------
+
+    def revoke(self, jti, expires_at, user_id=None):
+        created = super().revoke(jti, expires_at, user_id=user_id)
+        remaining = int((expires_at - timezone.now()).total_seconds())
+        if remaining > 0:
+            try:
+                cache.set(self._cache_key(jti), True, timeout=remaining)
+            except Exception as e:
+                logger.warning(f"Could not cache revoked token {jti}: {e}")
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+        return created
+
+    def is_revoked(self, jti):
+        self._sync_bloom()
+        if jti not in self._bloom:
+            return False
+        try:
+            if cache.get(self._cache_key(jti)):
+                return True
+        except Exception as e:
+            logger.warning(f"Revoked-token cache lookup failed, using database: {e}")
+        # Bloom false positive or evicted cache entry: the table decides.
+        return super().is_revoked(jti)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_revoked_token_store() -> BaseRevokedTokenStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(revocation_setting('STORE'))()
+    return _store
+
+
+def revoke_token(token) -> bool:
+    """
+    Revoke a decoded simplejwt token (RefreshToken / UntypedToken) until it expires.
+
+    Returns False when the token had already been revoked, so callers can use the
+    revocation itself as a single-use guard.
+    """
+    return get_revoked_token_store().revoke(
+        token['jti'],
+        _expiry_from_claim(token['exp']),
+        user_id=token.get('user_id'),
+    )
+
+
+def is_token_revoked(token) -> bool:
+    jti = token.get('jti')
+    return bool(jti) and get_revoked_token_store().is_revoked(jti)
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.serializers import TokenVerifySerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import UntypedToken
+from authentication.revocation import is_token_revoked, revoke_token
 from authentication.tokens import GigsHubRefreshToken
 from tenancy.services import build_auth_claims
 
@@ -120,6 +122,14 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'auth_context']
 
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. UserSerializer(users, many=True, fields=['id', 'email'])
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_auth_context(self, obj):
         override = self.context.get('auth_context')
         if override is not None:
@@ -136,11 +146,17 @@ class CustomTokenVerifySerializer(TokenVerifySerializer):
     """
     def validate(self, attrs):
         try:
-            return super().validate(attrs)
+            data = super().validate(attrs)
+            token = UntypedToken(attrs['token'])
         except Exception as e:
             raise ValidationError({
                 'token': ['Token is invalid or expired']
             })
+        if token.get(jwt_settings.TOKEN_TYPE_CLAIM) == 'refresh' and is_token_revoked(token):
+            raise ValidationError({
+                'token': ['Token is invalid or expired']
+            })
+        return data
 
 
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
@@ -153,11 +169,20 @@ class CustomTokenRefreshSerializer(TokenRefreshSerializer):
         except Exception:
             raise ValidationError({'refresh': ['Refresh token is invalid or expired']})
 
+        if is_token_revoked(decoded):
+            raise ValidationError({'refresh': ['Refresh token is invalid or expired']})
+
         acting = decoded.get('acting_org_id') or None
         if acting == '':
             acting = None
         user_id = decoded['user_id']
 
+        # Revoke up front: the insert is the only check shared by every worker, so
+        # concurrent refreshes with the same token cannot both rotate it.
+        if jwt_settings.ROTATE_REFRESH_TOKENS and jwt_settings.BLACKLIST_AFTER_ROTATION:
+            if not revoke_token(decoded):
+                raise ValidationError({'refresh': ['Refresh token is invalid or expired']})
+
         try:
             data = super().validate(attrs)
         except Exception:
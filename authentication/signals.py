@@ -31,12 +31,8 @@ def set_signal_processing_flag(signal_name, instance_id, value=True):
 @receiver(pre_save, sender=User)
 def track_user_type_changes(sender, instance, **kwargs):
     """Track user type changes for profile cleanup"""
-    if instance.pk:  # Only for existing users
-        try:
-            original = User.objects.get(pk=instance.pk)
-            instance._original_user_type = original.user_type
-        except User.DoesNotExist:
-            instance._original_user_type = None
+    if instance.pk and not instance._state.adding:  # Only for existing users
+        instance._original_user_type = instance.previous('user_type')
     else:
         instance._original_user_type = None
 
@@ -1,3 +1,4 @@
+import json
 import logging
 import uuid
 
@@ -5,13 +6,20 @@ from django.shortcuts import get_object_or_404
 from django.utils.text import slugify
 from django.utils.decorators import method_decorator
 from django.contrib.auth import login, authenticate, logout as django_logout
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django_filters.rest_framework import DjangoFilterBackend
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
+from rest_framework.generics import ListAPIView
+from rest_framework.filters import SearchFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from authentication.revocation import revoke_token
 from authentication.tokens import GigsHubRefreshToken
+from tenancy.collaboration import get_peer_ids, get_recruiter_ids, get_roster
 from tenancy.services import (
     build_auth_claims,
     merge_entitlement_flags,
@@ -157,20 +165,21 @@ class LogoutView(APIView):
 
     def post(self, request):
         refresh_token = request.data.get('refresh')
-        logger.info(f"Attempting to log out user: {request.user.email}")
+        email = request.user.email  # django_logout() swaps request.user for AnonymousUser
+        logger.info(f"Attempting to log out user: {email}")
 
         if refresh_token:
             try:
                 token = RefreshToken(refresh_token)
-                token.blacklist()
-                logger.info(f"Refresh token blacklisted for user: {request.user.email}")
+                revoke_token(token)
+                logger.info(f"Refresh token revoked for user: {email}")
             except Exception as e:
                 logger.error(f"Error blacklisting refresh token: {str(e)}")
                 return Response({'error': 'Failed to blacklist token'}, status=400)
 
         # Django session logout
         django_logout(request)
-        logger.info(f"User {request.user.email} logged out successfully.")
+        logger.info(f"User {email} logged out successfully.")
 
         return Response({"message": "Logged out successfully"}, status=200)
 
@@ -497,43 +506,57 @@ class CapabilityUpgradeView(APIView):
         )
 
 
+class CollaborationPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def _collaborator_payload(f):
+    return {
+        'id': str(f.id),
+        'display_name': f.display_name or (f.user.get_full_name() or '').strip() or f.user.email,
+        'email': f.user.email,
+        'freelancer_type': f.freelancer_type,
+        'freelancer_type_display': f.get_freelancer_type_display(),
+        'experience_level': f.experience_level,
+        'experience_level_display': f.get_experience_level_display(),
+        'availability_status': f.availability_status,
+        'average_rating': float(f.average_rating) if getattr(f, 'average_rating', None) is not None else None,
+    }
+
+
 class RecruiterTeamListView(APIView):
     """
     Freelancers this user has recruited (accepted project workspace invites add rows to RecruitedFreelancer).
     Used by the client hub dashboard and My team — same roster for personal or organization posting context.
+
+    The roster comes from the cached collaboration graph; only the requested page is hydrated.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from tenancy.models import RecruitedFreelancer
+        roster = get_roster(request.user.pk)
+        paginator = CollaborationPagination()
+        page = paginator.paginate_queryset(roster, request, view=self)
 
-        qs = (
-            RecruitedFreelancer.objects.filter(recruiter=request.user)
-            .select_related('freelancer', 'freelancer__user')
-            .order_by('-created_at')
-        )
+        freelancers = Freelancer.objects.select_related('user').in_bulk([fid for fid, _ in page])
         recruits = []
-        for link in qs:
-            f = link.freelancer
-            u = f.user
-            display = f.display_name or (u.get_full_name() or '').strip() or u.email
-            recruits.append(
-                {
-                    'id': str(f.id),
-                    'display_name': display,
-                    'email': u.email,
-                    'freelancer_type': f.freelancer_type,
-                    'freelancer_type_display': f.get_freelancer_type_display(),
-                    'experience_level': f.experience_level,
-                    'experience_level_display': f.get_experience_level_display(),
-                    'availability_status': f.availability_status,
-                    'average_rating': float(f.average_rating) if getattr(f, 'average_rating', None) is not None else None,
-                    'recruited_at': link.created_at.isoformat(),
-                }
-            )
+        for freelancer_id, recruited_at in page:
+            f = freelancers.get(uuid.UUID(freelancer_id))
+            if f is None:
+                continue
+            payload = _collaborator_payload(f)
+            payload['recruited_at'] = recruited_at.isoformat()
+            recruits.append(payload)
 
-        return Response({'recruits': recruits, 'total': len(recruits)})
+        return Response({
+            'recruits': recruits,
+            'total': len(roster),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
 
 
 class CollaborationPeersView(APIView):
@@ -541,58 +564,41 @@ class CollaborationPeersView(APIView):
     Freelancers who share at least one client's roster with you — typically after accepting organization invites.
 
     Implemented via tenancy.RecruitedFreelancer: accepting a project invite adds you to that client's recruits.
+    Peer ids are resolved from the cached collaboration graph; only the requested page is hydrated.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from tenancy.models import RecruitedFreelancer as RF
-        from uni_services.models import Freelancer as Fl
-
         if not getattr(request.user, 'is_freelancer', False):
             return Response({'detail': 'Freelancers only.'}, status=403)
 
-        try:
-            me = Fl.objects.get(user=request.user)
-        except Fl.DoesNotExist:
+        me = Freelancer.objects.filter(user=request.user).only('id').first()
+        if me is None:
             return Response({'clients': [], 'peers': []})
 
-        recruiter_ids = list(RF.objects.filter(freelancer=me).values_list('recruiter_id', flat=True).distinct())
+        recruiter_ids = get_recruiter_ids(me.pk)
         if not recruiter_ids:
             return Response({'clients': [], 'peers': []})
 
         recruiter_users = User.objects.filter(id__in=recruiter_ids).only('id', 'email')
         clients = [{'id': u.id, 'email': u.email} for u in recruiter_users]
 
-        peer_ids = (
-            RF.objects.filter(recruiter_id__in=recruiter_ids)
-            .exclude(freelancer_id=me.pk)
-            .values_list('freelancer_id', flat=True)
-            .distinct()
-        )
         peers_qs = (
-            Fl.objects.filter(pk__in=peer_ids)
+            Freelancer.objects.filter(pk__in=get_peer_ids(me.pk))
             .select_related('user')
-            .order_by('display_name')
+            .order_by('display_name', 'id')
         )
+        paginator = CollaborationPagination()
+        page = paginator.paginate_queryset(peers_qs, request, view=self)
 
-        peers = []
-        for f in peers_qs:
-            peers.append(
-                {
-                    'id': str(f.id),
-                    'display_name': f.display_name or (f.user.get_full_name() or f.user.email),
-                    'email': f.user.email,
-                    'freelancer_type': f.freelancer_type,
-                    'freelancer_type_display': f.get_freelancer_type_display(),
-                    'experience_level': f.experience_level,
-                    'experience_level_display': f.get_experience_level_display(),
-                    'availability_status': f.availability_status,
-                    'average_rating': float(f.average_rating) if getattr(f, 'average_rating', None) is not None else None,
-                }
-            )
-
-        return Response({'clients': clients, 'peers': peers})
+        return Response({
+            'clients': clients,
+            'peers': [_collaborator_payload(f) for f in page],
+            'total_peers': paginator.page.paginator.count,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
 
 
 class UserProfileView(APIView):
@@ -637,22 +643,89 @@ class ChangePasswordView(APIView):
             return Response({'error': 'Password change failed', 'details': e.detail}, status=400)
 
 
-# Admin and User list views (unchanged)
-class AdminListView(APIView):
-    permission_classes = [IsAuthenticated]
+# Admin and User list views
+class UserDirectoryCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
 
-    def get(self, request):
-        admins = User.objects.filter(is_staff=True)  
-        serializer = UserSerializer(admins, many=True)
-        logger.info("Fetched list of admin users.")
-        return Response(serializer.data, status=200)
 
+class UserDirectoryListView(ListAPIView):
+    """
+    Cursor-paginated user listing shared by the admin and user directories.
 
-class UserListView(APIView):
+    Query params:
+      - user_type, is_active, search (email / first / last name)
+      - fields=id,email,...  sparse fieldset; auth_context is left out unless listed here,
+                             since building it costs queries per row
+      - stream=ndjson        stream every matching row as newline-delimited JSON
+    """
     permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        logger.info("Fetched list of all users.")
-        return Response(serializer.data, status=200)
\ No newline at end of file
+    serializer_class = UserSerializer
+    pagination_class = UserDirectoryCursorPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_fields = ['user_type', 'is_active']
+    search_fields = ['email', 'first_name', 'last_name']
+    stream_chunk_size = 500
+    log_message = "Fetched user directory."
+
+    # Model columns each serializer field needs, used to narrow the SELECT.
+    _field_columns = {
+        'full_name': ('first_name', 'last_name'),
+    }
+    default_fields = [name for name in UserSerializer.Meta.fields if name != 'auth_context']
+
+    def get_base_queryset(self):
+        return User.objects.all()
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return self.default_fields
+        allowed = set(UserSerializer.Meta.fields)
+        requested = [f.strip() for f in raw.split(',') if f.strip() in allowed]
+        return requested or self.default_fields
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        fields = self.get_requested_fields()
+        if 'auth_context' not in fields:
+            columns = {'id', 'created_at'}
+            for name in fields:
+                columns.update(self._field_columns.get(name, (name,)))
+            queryset = queryset.only(*columns)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'ndjson':
+            return self.stream_ndjson()
+        logger.info(self.log_message)
+        return super().list(request, *args, **kwargs)
+
+    def stream_ndjson(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by('created_at', 'id')
+        serializer = self.get_serializer()
+        chunk_size = self.stream_chunk_size
+
+        def rows():
+            for user in queryset.iterator(chunk_size=chunk_size):
+                yield json.dumps(serializer.to_representation(user), cls=DjangoJSONEncoder) + '\n'
+
+        logger.info(f"{self.log_message} (streamed as NDJSON)")
+        return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+
+class AdminListView(UserDirectoryListView):
+    log_message = "Fetched list of admin users."
+
+    def get_base_queryset(self):
+        return User.objects.filter(is_staff=True)
+
+
+class UserListView(UserDirectoryListView):
+    log_message = "Fetched list of all users."
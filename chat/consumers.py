@@ -1,14 +1,19 @@
 # chat/consumers.py
 import json
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import ChatRoom, Message
+from . import presence
+from .message_buffer import message_buffer, message_ids, parse_message_id
+from .read_state import mark_read, room_group_name
+from .typing import typing_coordinator
 from django.utils import timezone
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
+        self.room_group_name = room_group_name(self.room_id)
         self.user = self.scope['user']
 
         # Verify user has access to this room
@@ -21,6 +26,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         await self.accept()
+        self.present = True
+        await self.update_presence(online=True)
+        # Typists this worker knows about; the rest are re-announced within TTL_SECONDS / 2
+        await self.user_typing({
+            'changes': [{'user_id': user_id, 'is_typing': True} for user_id in typing_coordinator.typing_users(self.room_id)],
+            'ttl': typing_coordinator.ttl,
+        })
 
     @database_sync_to_async
     def can_access_room(self):
@@ -35,6 +47,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        typing_coordinator.stop(self.room_id, self.user.id)
+        if getattr(self, 'present', False):
+            await self.update_presence(online=False)
+        # Persist whatever this worker still buffers before the socket goes away
+        await message_buffer.flush()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -44,66 +61,115 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.handle_message(data)
         elif message_type == 'typing':
             await self.handle_typing(data)
+        elif message_type == 'read':
+            await self.handle_read(data)
+        elif message_type == 'heartbeat':
+            await self.update_presence(online=True)
+
+    async def update_presence(self, online):
+        # Socket-level presence; the room hears about it only when the user as a whole comes or goes
+        if online:
+            changed = await sync_to_async(presence.touch)(self.user.id, self.channel_name)
+        else:
+            changed = await sync_to_async(presence.leave)(self.user.id, self.channel_name)
+        if changed:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {
+                    'type': 'user_presence',
+                    'user_id': self.user.id,
+                    'online': online
+                }
+            )
+        if presence.flush_due():
+            await database_sync_to_async(presence.flush_last_active)()
 
     async def handle_message(self, data):
         message = data['message']
-        
-        # Save message to database
-        message_obj = await self.save_message(message)
-        
+
+        # Id and timestamp are assigned here; the row is written behind by message_buffer
+        message_obj = Message(
+            id=await message_ids.anext_id(),
+            room_id=int(self.room_id),
+            sender=self.user,
+            content=message,
+            timestamp=timezone.now(),
+        )
+
         # Send message to room group
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
+                'id': message_obj.id,
                 'message': message,
                 'sender_id': self.user.id,
                 'sender_email': self.user.email,
                 'timestamp': str(message_obj.timestamp)
             }
         )
+        await message_buffer.add(message_obj)
+        typing_coordinator.stop(self.room_id, self.user.id)
 
     async def handle_typing(self, data):
-        # Broadcast typing status
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_typing',
-                'user_id': self.user.id,
-                'is_typing': data.get('is_typing', False)
-            }
-        )
+        # Debounced, rate limited and broadcast in batches by the typing coordinator
+        typing_coordinator.update(self.room_id, self.user.id, data.get('is_typing', False))
+
+    async def handle_read(self, data):
+        # Write what this worker buffers first, so the legacy is_read flags cover it too
+        await message_buffer.flush()
+        # The read_receipt broadcast is sent by read_state.mark_read once committed
+        await self.mark_room_read(data.get('message_id'))
+
+    @database_sync_to_async
+    def mark_room_read(self, message_id):
+        room = ChatRoom.objects.get(id=self.room_id)
+        if message_id is not None:
+            # Ids carry their time, so a cursor may name a message another worker still buffers
+            message_id = parse_message_id(message_id)
+            if message_id is None:
+                return None
+        return mark_read(room, self.user, message_id)
 
     async def chat_message(self, event):
         # Send chat message to WebSocket
         await self.send(text_data=json.dumps({
             'type': 'message',
+            # Usable as the ?after= cursor of the messages endpoint after a reconnect
+            'id': event['id'],
             'message': event['message'],
             'sender_id': event['sender_id'],
             'sender_email': event['sender_email'],
-            'timestamp': event['timestamp']
+            'timestamp': event['timestamp'],
+            'attachment': event.get('attachment'),
         }))
 
     async def user_typing(self, event):
-        # Send typing status to WebSocket
+        # Send coalesced typing changes to WebSocket, skipping the typist's own
+        for change in event['changes']:
+            if change['user_id'] == self.user.id:
+                continue
+            await self.send(text_data=json.dumps({
+                'type': 'typing',
+                'user_id': change['user_id'],
+                'is_typing': change['is_typing'],
+                'ttl': event['ttl']
+            }))
+
+    async def user_presence(self, event):
+        # Send a participant coming online / going offline to WebSocket
+        if event['user_id'] == self.user.id:
+            return
         await self.send(text_data=json.dumps({
-            'type': 'typing',
+            'type': 'presence',
             'user_id': event['user_id'],
-            'is_typing': event['is_typing']
+            'online': event['online']
         }))
 
-    @database_sync_to_async
-    def save_message(self, content):
-        # Save message to the database
-        room = ChatRoom.objects.get(id=self.room_id)
-        message = Message.objects.create(
-            room=room,
-            sender=self.user,
-            content=content
-        )
-        
-        # Update room's updated_at timestamp
-        room.updated_at = timezone.now()
-        room.save()
-        
-        return message
+    async def read_receipt(self, event):
+        # Send a participant's read cursor to WebSocket
+        await self.send(text_data=json.dumps({
+            'type': 'read',
+            'user_id': event['user_id'],
+            'last_read_message_id': event['last_read_message_id']
+        }))
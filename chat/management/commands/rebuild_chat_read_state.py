@@ -0,0 +1,35 @@
+"""
+Rebuild RoomParticipantState rows (read cursors and unread counts, see
+chat.read_state) from the legacy Message.is_read flags.
+
+Usage:
+  python manage.py rebuild_chat_read_state                 # every room
+  python manage.py rebuild_chat_read_state --room 12 --room 15
+
+Run it once after deploying the read-state table to backfill existing rooms,
+and after bulk edits of Message.is_read (e.g. the admin's mark as read/unread).
+"""
+from django.core.management.base import BaseCommand
+
+from chat.models import ChatRoom
+from chat.read_state import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild chat read cursors and unread counts in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room', action='append', type=int, metavar='ID', help='Limit to these rooms.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rooms = ChatRoom.objects.order_by('pk')
+        if options['room']:
+            rooms = rooms.filter(pk__in=options['room'])
+        ids = list(rooms.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+
+        rebuilt = 0
+        for start in range(0, len(ids), chunk_size):
+            rebuilt += rebuild(ids[start:start + chunk_size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} read states for {len(ids)} rooms"))
@@ -0,0 +1,319 @@
+"""
+Write-behind persistence for chat messages.
+
+ChatConsumer no longer waits for the database before broadcasting: a message
+gets its id and timestamp in memory, is broadcast to the room straight away and
+is handed to this process's MessageBuffer, which writes buffered messages with
+one ``bulk_create`` when MAX_SIZE messages are pending or MAX_DELAY_MS after the
+first one arrived. Each flush also updates the read states
+(chat.read_state.record_messages) and bumps ``updated_at`` of the rooms it
+touched with a single ``update()``.
+
+Ids come from MessageIdGenerator rather than the database sequence, so they
+exist before the row does. Message.save uses the same generator, which keeps ids
+growing with time across every writer (read cursors compare ids). An id packs
+milliseconds since 2025-01-01, a worker number and a per-millisecond sequence
+into 53 bits so it survives JSON/JavaScript number precision. Every process
+writing messages holds its own worker number (0-31) as a MessageWorkerLease row,
+taken on its first id and renewed while it keeps issuing ids; a lease is only
+taken over LEASE_GRACE_SECONDS after it expired. Pinning ``WORKER_ID`` leases
+that number and fails when another live process holds it. Because ids carry
+their time, ``parse_message_id`` can accept a cursor for a message that is still
+buffered somewhere without loading its row.
+
+Durability: the buffer is flushed when a socket disconnects, before a read
+cursor is moved over the websocket, and at interpreter exit (atexit), so a
+graceful shutdown loses nothing. A failed flush keeps the batch and retries on
+the next one; rows that hit an integrity error are retried one by one, and a row
+that still cannot be written is logged as an error with its content. Until a
+flush lands (MAX_DELAY_MS at most) a message is visible on the websocket but not
+yet in the REST history.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_SIZE': 200,
+    'MAX_DELAY_MS': 250,
+    'WORKER_ID': None,
+    'LEASE_SECONDS': 120,
+}
+
+# Clock skew tolerated between hosts before an expired lease is taken over.
+LEASE_GRACE_SECONDS = 10
+# How far ahead of this host's clock a client-supplied id may point.
+FUTURE_ID_TOLERANCE_MS = 5000
+
+ID_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+WORKER_BITS = 5
+SEQUENCE_BITS = 7
+
+
+def buffer_setting(name):
+    return getattr(settings, 'CHAT_MESSAGE_BUFFER', {}).get(name, DEFAULTS[name])
+
+
+class WorkerLeaseError(RuntimeError):
+    pass
+
+
+class MessageIdGenerator:
+    """Time-ordered 53-bit ids: milliseconds since ID_EPOCH | worker | sequence."""
+
+    def __init__(self, worker_id=None, lease_seconds=None):
+        self.pinned_worker_id = worker_id
+        self.lease_seconds = lease_seconds or buffer_setting('LEASE_SECONDS')
+        self.worker_id = None
+        self._owner = None
+        self._pid = None
+        self._expires_at = None
+        self._epoch_ms = int(ID_EPOCH.timestamp() * 1000)
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._lease_lock = threading.Lock()
+
+    def _lease_due(self) -> bool:
+        if self._pid != os.getpid():
+            # Forked after leasing: the parent keeps its number.
+            return True
+        return self._expires_at - timezone.now() < timedelta(seconds=self.lease_seconds / 2)
+
+    def lease(self) -> None:
+        """Take or renew this process's worker number. Touches the database; call it from sync code."""
+
+        from .models import MessageWorkerLease
+
+        with self._lease_lock:
+            if self._owner is not None and not self._lease_due():
+                return
+            now = timezone.now()
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            if self._owner is not None and self._pid == os.getpid():
+                if MessageWorkerLease.objects.filter(worker_id=self.worker_id, owner=self._owner).update(expires_at=expires_at):
+                    self._expires_at = expires_at
+                    return
+                # Only possible after the lease ran out unrenewed, i.e. while no ids were issued.
+                logger.warning(f"Chat message worker {self.worker_id} was taken over; leasing another")
+
+            owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            free = Q(expires_at__lt=now - timedelta(seconds=LEASE_GRACE_SECONDS))
+            candidates = range(1 << WORKER_BITS) if self.pinned_worker_id is None else [self.pinned_worker_id]
+            for worker_id in candidates:
+                taken = MessageWorkerLease.objects.filter(free, worker_id=worker_id).update(owner=owner, expires_at=expires_at)
+                if not taken:
+                    try:
+                        with transaction.atomic():
+                            MessageWorkerLease.objects.create(worker_id=worker_id, owner=owner, expires_at=expires_at)
+                    except IntegrityError:
+                        continue
+                with self._lock:
+                    self.worker_id, self._owner, self._pid, self._expires_at = worker_id, owner, os.getpid(), expires_at
+                logger.info(f"Leased chat message worker {worker_id} as {owner}")
+                return
+
+            self.worker_id = self._owner = None
+            if self.pinned_worker_id is not None:
+                raise WorkerLeaseError(
+                    f"CHAT_MESSAGE_BUFFER['WORKER_ID'] {self.pinned_worker_id} is held by another live process; "
+                    "leave WORKER_ID unset so each process leases its own"
+                )
+            raise WorkerLeaseError(f"All {1 << WORKER_BITS} chat message worker numbers are leased")
+
+    def release(self) -> None:
+        from .models import MessageWorkerLease
+
+        with self._lease_lock:
+            if self._owner is not None and self._pid == os.getpid():
+                MessageWorkerLease.objects.filter(worker_id=self.worker_id, owner=self._owner).delete()
+            self.worker_id = self._owner = None
+
+    def next_id(self) -> int:
+        if self._owner is None or self._lease_due():
+            self.lease()
+        with self._lock:
+            if timezone.now() >= self._expires_at:
+                raise WorkerLeaseError(f"Lease on chat message worker {self.worker_id} expired")
+            now_ms = max(int(time.time() * 1000) - self._epoch_ms, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) % (1 << SEQUENCE_BITS)
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; borrow the next one.
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (now_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    async def anext_id(self) -> int:
+        """next_id for async code: leasing runs on the database thread, issuing ids does not."""
+
+        if self._owner is None or self._lease_due():
+            await sync_to_async(self.lease, thread_sensitive=True)()
+        return self.next_id()
+
+    def timestamp_ms(self, message_id) -> int:
+        """Unix milliseconds encoded in a message id."""
+
+        return (message_id >> (WORKER_BITS + SEQUENCE_BITS)) + self._epoch_ms
+
+
+def parse_message_id(value):
+    """
+    A message id from a client cursor, or None when it cannot be one: not a
+    positive integer, or dated in the future. The row need not exist yet.
+    """
+
+    if not str(value).isdigit() or int(value) <= 0:
+        return None
+    message_id = int(value)
+    if message_ids.timestamp_ms(message_id) > time.time() * 1000 + FUTURE_ID_TOLERANCE_MS:
+        return None
+    return message_id
+
+
+class MessageBuffer:
+    """Per-process buffer of unsaved Message instances; see the module docstring."""
+
+    def __init__(self, max_size=None, max_delay_ms=None):
+        self.max_size = max_size or buffer_setting('MAX_SIZE')
+        self.max_delay = (max_delay_ms or buffer_setting('MAX_DELAY_MS')) / 1000
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._tasks = set()
+        self.flushes = 0
+        self.written = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, message) -> None:
+        with self._lock:
+            self._pending.append(message)
+            full = len(self._pending) >= self.max_size
+        if full:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._spawn_flush)
+
+    def _spawn_flush(self) -> None:
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _take(self) -> list:
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return batch
+
+    async def flush(self) -> int:
+        batch = self._take()
+        if not batch:
+            return 0
+        try:
+            await sync_to_async(self._write, thread_sensitive=True)(batch)
+        except Exception:
+            logger.exception(f"Flushing {len(batch)} chat messages failed; keeping them for the next flush")
+            with self._lock:
+                self._pending[:0] = batch
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._spawn_flush)
+            return 0
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Wait for flushes already in flight, then flush what is left."""
+
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        return await self.flush()
+
+    def flush_sync(self) -> int:
+        """Flush from synchronous code (atexit, management commands)."""
+
+        batch = self._take()
+        if batch:
+            self._write(batch)
+        return len(batch)
+
+    def _write(self, batch) -> None:
+        from .models import ChatRoom, Message
+        from .read_state import record_messages
+
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(batch)
+                record_messages(batch)
+                ChatRoom.objects.filter(pk__in={m.room_id for m in batch}).update(updated_at=timezone.now())
+            saved = batch
+        except IntegrityError:
+            logger.warning(f"Bulk insert of {len(batch)} chat messages hit an integrity error; inserting one by one")
+            saved = [message for message in batch if self._write_one(message)]
+            with transaction.atomic():
+                record_messages(saved)
+                ChatRoom.objects.filter(pk__in={m.room_id for m in saved}).update(updated_at=timezone.now())
+        self.flushes += 1
+        self.written += len(saved)
+
+    def _write_one(self, message) -> bool:
+        from .models import ChatRoom, Message
+
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([message])
+            return True
+        except IntegrityError as error:
+            failure = error
+        if Message.objects.filter(pk=message.pk).exists():
+            # Leased worker numbers rule this out; keep the message rather than the id.
+            broadcast_id, message.pk = message.pk, message_ids.next_id()
+            logger.error(f"Chat message id {broadcast_id} already taken; saving the message as {message.pk}")
+            with transaction.atomic():
+                Message.objects.bulk_create([message])
+            return True
+        if not ChatRoom.objects.filter(pk=message.room_id).exists():
+            logger.warning(f"Not saving chat message {message.pk}: room {message.room_id} was deleted")
+            return False
+        logger.error(
+            f"Could not save chat message {message.pk} from user {message.sender_id} in room {message.room_id} "
+            f"sent at {message.timestamp.isoformat()} ({failure}): {message.content!r}"
+        )
+        return False
+
+
+message_ids = MessageIdGenerator(buffer_setting('WORKER_ID'))
+message_buffer = MessageBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        message_buffer.flush_sync()
+    except Exception:
+        logger.exception("Flushing chat messages at exit failed")
+    try:
+        message_ids.release()
+    except Exception:
+        logger.exception("Releasing the chat message worker lease failed")
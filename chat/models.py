@@ -1,13 +1,15 @@
 # chat/models.py
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
 class ChatRoom(models.Model):
     # Generic foreign key to handle different types of requests/services
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
+    # Text, so it can hold BaseService's string ids ('ORD-002') as well as integer pks.
+    object_id = models.CharField(max_length=50)
     content_object = GenericForeignKey('content_type', 'object_id')
     
     # Participants in the chat
@@ -34,6 +36,15 @@ class ChatRoom(models.Model):
     def __str__(self):
         return f"Chat for {self.content_type.model}: {self.object_id}"
 
+    def save(self, *args, **kwargs):
+        from . import read_state
+
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                read_state.ensure_participants([self])
+
 class Message(models.Model):
     room = models.ForeignKey(
         ChatRoom,
@@ -47,7 +58,8 @@ class Message(models.Model):
     )
     content = models.TextField()
     attachment = models.FileField(upload_to='chat_attachments/', null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: the write-behind buffer (chat.message_buffer) sets it before the insert.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
 
@@ -55,8 +67,78 @@ class Message(models.Model):
         ordering = ['timestamp']
         indexes = [
             models.Index(fields=['room', 'timestamp']),
+            # History and read cursors page on the time-ordered id.
+            models.Index(fields=['room', 'id']),
             models.Index(fields=['sender', 'is_read']),
         ]
 
     def __str__(self):
-        return f"{self.sender.email}: {self.content[:50]}"
\ No newline at end of file
+        return f"{self.sender.email}: {self.content[:50]}"
+
+    def save(self, *args, **kwargs):
+        from . import read_state
+        from .message_buffer import message_ids
+
+        adding = self._state.adding
+        if adding and self.pk is None:
+            # Same time-ordered ids as buffered messages, so read cursors stay comparable.
+            self.pk = message_ids.next_id()
+            kwargs['force_insert'] = True
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                read_state.record_messages([self])
+
+    def delete(self, *args, **kwargs):
+        from . import read_state
+
+        with transaction.atomic():
+            read_state.forget_message(self)
+            return super().delete(*args, **kwargs)
+
+
+class RoomParticipantState(models.Model):
+    """
+    A participant's read cursor in a room (see chat.read_state).
+
+    ``unread_count`` is the number of messages from others after
+    ``last_read_message_id``; it is kept up to date as messages are saved and the
+    cursor moves, so unread badges are a single indexed read.
+    """
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name='participant_states'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='chat_room_states'
+    )
+    last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='unique_room_participant'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'unread_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in room {self.room_id}: {self.unread_count} unread"
+
+
+class MessageWorkerLease(models.Model):
+    """
+    A worker number of chat.message_buffer.MessageIdGenerator held by one process
+    until ``expires_at``; the holder renews it while it keeps issuing ids.
+    """
+    worker_id = models.PositiveSmallIntegerField(primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Message worker {self.worker_id} held by {self.owner} until {self.expires_at}"
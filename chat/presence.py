@@ -0,0 +1,277 @@
+"""
+Online presence for chat users and freelancers.
+
+ChatConsumer reports every socket: ``touch`` on connect and on each client
+``{"type": "heartbeat"}``, ``leave`` on disconnect. A user is online while at
+least one of their sockets has been touched within TTL_SECONDS, so crashed
+workers and dropped connections age out on their own.
+
+The store is pluggable through ``settings.CHAT_PRESENCE['STORE']``:
+
+  - RedisPresenceStore: one sorted set per user (socket -> expiry) plus a
+    last-seen hash, shared by every worker;
+  - InMemoryPresenceStore (default): the same in process memory, for tests and
+    single-process development.
+
+``Freelancer.last_active`` is not written per heartbeat: touched users are
+collected in memory and written with one UPDATE at most every FLUSH_SECONDS
+(and at exit). Lookups are bulk: ``presence_for`` / ``online_user_ids`` take a
+collection of user ids and answer with one store round trip. They serve REST
+endpoints (the public marketplace directory among them), so a store that is down
+or slow is logged and everyone is reported offline instead of failing the request;
+RedisPresenceStore uses short socket timeouts for the same reason.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Case, DateTimeField, Value, When
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'STORE': 'chat.presence.InMemoryPresenceStore',
+    'OPTIONS': {},
+    'TTL_SECONDS': 60,
+    'FLUSH_SECONDS': 60,
+}
+
+
+def presence_setting(name):
+    return getattr(settings, 'CHAT_PRESENCE', {}).get(name, DEFAULTS[name])
+
+
+class BasePresenceStore:
+    def touch(self, user_id, connection_id, now: float, ttl: float) -> bool:
+        """Mark a socket alive until now + ttl; True if the user was offline before."""
+        raise NotImplementedError
+
+    def leave(self, user_id, connection_id, now: float) -> bool:
+        """Forget a socket; True if the user has no live socket left."""
+        raise NotImplementedError
+
+    def online(self, user_ids, now: float) -> set:
+        raise NotImplementedError
+
+    def last_seen(self, user_ids) -> dict:
+        """{user_id: unix time} for users the store has seen."""
+        raise NotImplementedError
+
+
+class InMemoryPresenceStore(BasePresenceStore):
+    def __init__(self, **options):
+        self._sockets = {}
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def _live(self, user_id, now):
+        sockets = self._sockets.get(user_id, {})
+        for connection_id in [c for c, expires_at in sockets.items() if expires_at <= now]:
+            del sockets[connection_id]
+        return sockets
+
+    def touch(self, user_id, connection_id, now, ttl):
+        with self._lock:
+            sockets = self._live(user_id, now)
+            was_offline = not sockets
+            sockets[connection_id] = now + ttl
+            self._sockets[user_id] = sockets
+            self._last_seen[user_id] = now
+            return was_offline
+
+    def leave(self, user_id, connection_id, now):
+        with self._lock:
+            sockets = self._live(user_id, now)
+            sockets.pop(connection_id, None)
+            self._last_seen[user_id] = now
+            if not sockets:
+                self._sockets.pop(user_id, None)
+            return not sockets
+
+    def online(self, user_ids, now):
+        with self._lock:
+            return {user_id for user_id in user_ids if self._live(user_id, now)}
+
+    def last_seen(self, user_ids):
+        with self._lock:
+            return {user_id: self._last_seen[user_id] for user_id in user_ids if user_id in self._last_seen}
+
+
+class RedisPresenceStore(BasePresenceStore):
+    def __init__(self, url='redis://127.0.0.1:6379/0', prefix='presence:', **options):
+        import redis
+
+        options.setdefault('socket_timeout', 0.5)
+        options.setdefault('socket_connect_timeout', 0.5)
+        self.redis = redis.Redis.from_url(url, **options)
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f"{self.prefix}user:{user_id}"
+
+    @property
+    def _last_seen_key(self):
+        return f"{self.prefix}last_seen"
+
+    def touch(self, user_id, connection_id, now, ttl):
+        key = self._key(user_id)
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zcard(key)
+        pipe.zadd(key, {connection_id: now + ttl})
+        pipe.expire(key, int(ttl) + 1)
+        pipe.hset(self._last_seen_key, user_id, now)
+        _, live_before, *_ = pipe.execute()
+        return live_before == 0
+
+    def leave(self, user_id, connection_id, now):
+        key = self._key(user_id)
+        pipe = self.redis.pipeline()
+        pipe.zrem(key, connection_id)
+        pipe.zcount(key, f'({now}', '+inf')
+        pipe.hset(self._last_seen_key, user_id, now)
+        _, live, _ = pipe.execute()
+        return live == 0
+
+    def online(self, user_ids, now):
+        user_ids = list(user_ids)
+        pipe = self.redis.pipeline()
+        for user_id in user_ids:
+            pipe.zcount(self._key(user_id), f'({now}', '+inf')
+        return {user_id for user_id, live in zip(user_ids, pipe.execute()) if live}
+
+    def last_seen(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        values = self.redis.hmget(self._last_seen_key, user_ids)
+        return {user_id: float(value) for user_id, value in zip(user_ids, values) if value is not None}
+
+
+_store = None
+_store_lock = threading.Lock()
+_pending_last_active = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def get_presence_store() -> BasePresenceStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(presence_setting('STORE'))(**presence_setting('OPTIONS'))
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'CHAT_PRESENCE':
+        _store = None
+
+
+def _seen(user_id, now) -> None:
+    with _pending_lock:
+        _pending_last_active[user_id] = now
+
+
+def touch(user_id, connection_id) -> bool:
+    """Connect or heartbeat; True when the user just came online."""
+
+    now = time.time()
+    _seen(user_id, now)
+    return get_presence_store().touch(user_id, connection_id, now, presence_setting('TTL_SECONDS'))
+
+
+def leave(user_id, connection_id) -> bool:
+    """Disconnect; True when this was the user's last live socket."""
+
+    now = time.time()
+    _seen(user_id, now)
+    return get_presence_store().leave(user_id, connection_id, now)
+
+
+def online_user_ids(user_ids) -> set:
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return set()
+    try:
+        return get_presence_store().online(user_ids, time.time())
+    except Exception:
+        logger.exception(f"Presence lookup for {len(user_ids)} users failed; reporting them offline")
+        return set()
+
+
+def presence_for(user_ids) -> dict:
+    """{user_id: {'online': bool, 'last_seen': aware datetime or None}} in one store round trip each."""
+
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    try:
+        store = get_presence_store()
+        online = store.online(user_ids, time.time())
+        last_seen = store.last_seen(user_ids)
+    except Exception:
+        logger.exception(f"Presence lookup for {len(user_ids)} users failed; reporting them offline")
+        online, last_seen = set(), {}
+    return {
+        user_id: {
+            'online': user_id in online,
+            'last_seen': (
+                datetime.fromtimestamp(last_seen[user_id], tz=dt_timezone.utc) if user_id in last_seen else None
+            ),
+        }
+        for user_id in user_ids
+    }
+
+
+def flush_due() -> bool:
+    return bool(_pending_last_active) and time.monotonic() - _last_flush >= presence_setting('FLUSH_SECONDS')
+
+
+def flush_last_active(force=False) -> int:
+    """Write collected activity to Freelancer.last_active with one UPDATE, at most every FLUSH_SECONDS."""
+
+    global _last_flush
+    from uni_services.models import Freelancer
+
+    with _pending_lock:
+        if not _pending_last_active or not (force or flush_due()):
+            return 0
+        pending = dict(_pending_last_active)
+        _pending_last_active.clear()
+        _last_flush = time.monotonic()
+
+    when = [
+        When(user_id=user_id, then=Value(datetime.fromtimestamp(ts, tz=dt_timezone.utc)))
+        for user_id, ts in pending.items()
+    ]
+    try:
+        return Freelancer.objects.filter(user_id__in=list(pending)).update(
+            last_active=Case(*when, output_field=DateTimeField())
+        )
+    except Exception:
+        logger.exception(f"Flushing last_active for {len(pending)} users failed; retrying on the next flush")
+        with _pending_lock:
+            for user_id, ts in pending.items():
+                _pending_last_active.setdefault(user_id, ts)
+        return 0
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_last_active(force=True)
+    except Exception:
+        logger.exception("Flushing last_active at exit failed")
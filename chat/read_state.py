@@ -0,0 +1,178 @@
+"""
+Per-participant read cursors for chat rooms.
+
+Every room has one RoomParticipantState per participant (client and admin),
+created with the room. Its ``unread_count`` is maintained incrementally:
+
+  - ``record_messages`` adds new messages past each other participant's cursor
+    to their count, one UPDATE per (room, sender) in the batch; Message.save
+    calls it, bulk writers must call it themselves;
+  - ``mark_read`` moves a participant's cursor forward and recomputes their count
+    in one UPDATE, then broadcasts a ``read_receipt`` to the room group;
+  - ``forget_message`` takes a deleted, still unread message back out.
+
+Message ids are the cursor (they only grow), not timestamps. The legacy
+``Message.is_read`` / ``read_at`` flags are still set on mark-read, set-based,
+for clients that read them.
+
+``rebuild`` derives the states from the legacy flags; the
+``rebuild_chat_read_state`` command uses it to backfill existing rooms.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ChatRoom, Message, RoomParticipantState
+
+logger = logging.getLogger(__name__)
+
+
+def room_group_name(room_id) -> str:
+    return f'chat_{room_id}'
+
+
+def ensure_participants(rooms) -> None:
+    """Create missing states for the rooms' client and admin."""
+
+    RoomParticipantState.objects.bulk_create(
+        [
+            RoomParticipantState(room_id=room.pk, user_id=user_id)
+            for room in rooms
+            for user_id in {room.client_id, room.admin_id}
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def record_messages(messages) -> None:
+    """
+    Count freshly saved messages as unread for everyone in the room but their
+    sender, skipping those already behind a participant's cursor (a message
+    buffered by another worker can be written after the cursor moved past it).
+    """
+
+    now = timezone.now()
+    by_sender = defaultdict(list)
+    for m in messages:
+        by_sender[(m.room_id, m.sender_id)].append(m.pk)
+    for (room_id, sender_id), ids in by_sender.items():
+        ids.sort()
+        # Messages newer than the cursor: all of them below ids[0], n - i below ids[i].
+        newer = Case(
+            When(last_read_message_id__isnull=True, then=Value(len(ids))),
+            *[When(last_read_message_id__lt=message_id, then=Value(len(ids) - i)) for i, message_id in enumerate(ids)],
+            default=Value(0),
+        )
+        RoomParticipantState.objects.filter(
+            Q(last_read_message_id__isnull=True) | Q(last_read_message_id__lt=ids[-1]),
+            room_id=room_id,
+        ).exclude(user_id=sender_id).update(unread_count=F('unread_count') + newer, updated_at=now)
+
+
+def forget_message(message) -> None:
+    RoomParticipantState.objects.filter(
+        Q(last_read_message_id__isnull=True) | Q(last_read_message_id__lt=message.pk),
+        room_id=message.room_id,
+        unread_count__gt=0,
+    ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') - 1)
+
+
+def mark_read(room, user, message_id=None):
+    """
+    Move ``user``'s cursor in ``room`` up to ``message_id`` (default: the latest
+    message). Returns the state, or None when there is nothing to read. The
+    cursor never moves backwards.
+    """
+
+    if message_id is None:
+        message_id = Message.objects.filter(room=room).order_by('-id').values_list('id', flat=True).first()
+        if message_id is None:
+            return None
+
+    remaining = Message.objects.filter(room=room, id__gt=message_id).exclude(sender=user)
+    with transaction.atomic():
+        moved = RoomParticipantState.objects.filter(
+            Q(last_read_message_id__isnull=True) | Q(last_read_message_id__lt=message_id),
+            room=room, user=user,
+        ).update(
+            last_read_message_id=message_id,
+            unread_count=Coalesce(
+                Subquery(remaining.order_by().values('room').annotate(n=Count('pk')).values('n'), output_field=IntegerField()),
+                0,
+            ),
+            updated_at=timezone.now(),
+        )
+        if not moved and not RoomParticipantState.objects.filter(room=room, user=user).exists():
+            # Room predates read states and was not backfilled yet.
+            RoomParticipantState.objects.create(
+                room=room, user=user, last_read_message_id=message_id, unread_count=remaining.count(),
+            )
+            moved = 1
+        if moved:
+            Message.objects.filter(room=room, id__lte=message_id, is_read=False).exclude(sender=user).update(
+                is_read=True, read_at=timezone.now(),
+            )
+            transaction.on_commit(lambda: broadcast_read(room.pk, user.pk, message_id))
+    return RoomParticipantState.objects.get(room=room, user=user)
+
+
+def broadcast_read(room_id, user_id, message_id) -> None:
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(room_group_name(room_id), {
+            'type': 'read_receipt',
+            'user_id': user_id,
+            'last_read_message_id': message_id,
+        })
+    except Exception:
+        # The cursor is already committed; a lost receipt only delays the other side's ticks.
+        logger.exception(f"Broadcasting read receipt for room {room_id} failed")
+
+
+def rebuild(room_ids) -> int:
+    """
+    Rewrite the states of ``room_ids`` from the legacy flags: the cursor is the
+    newest message from others marked read, the count is others' unread messages.
+    """
+
+    rooms = list(ChatRoom.objects.filter(pk__in=room_ids).only('pk', 'client_id', 'admin_id'))
+    per_sender = defaultdict(dict)
+    rows = (
+        Message.objects.filter(room__in=rooms).order_by().values('room', 'sender')
+        .annotate(
+            last_read=Max('id', filter=Q(is_read=True)),
+            unread=Count('id', filter=Q(is_read=False)),
+        )
+    )
+    for row in rows:
+        per_sender[row['room']][row['sender']] = row
+
+    states = []
+    for room in rooms:
+        for user_id in {room.client_id, room.admin_id}:
+            others = [row for sender, row in per_sender[room.pk].items() if sender != user_id]
+            read_ids = [row['last_read'] for row in others if row['last_read'] is not None]
+            states.append(RoomParticipantState(
+                room_id=room.pk,
+                user_id=user_id,
+                last_read_message_id=max(read_ids) if read_ids else None,
+                unread_count=sum(row['unread'] for row in others),
+            ))
+    RoomParticipantState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['room', 'user'],
+        update_fields=['last_read_message_id', 'unread_count', 'updated_at'],
+    )
+    return len(states)
@@ -0,0 +1,217 @@
+"""
+Full-text search over chat messages and order comments.
+
+The index lives in the database and follows every write, including
+``bulk_create`` from the message buffer:
+
+  - PostgreSQL: a GIN expression index on ``to_tsvector(CONFIG, <text column>)``;
+    matches use ``websearch_to_tsquery`` and snippets ``ts_headline``;
+  - SQLite: an FTS5 external-content table per source (``<table>_fts``) kept in
+    sync by insert/update/delete triggers; matches use ``MATCH`` and snippets
+    ``snippet()``;
+  - other backends fall back to ``icontains`` on every term, unindexed.
+
+``install`` creates the index, table and triggers if they are missing (and fills
+a new FTS table from existing rows); ChatConfig runs it after every migrate.
+
+``search`` filters a queryset of one of SOURCES and annotates a ``search_snippet``
+around the hits; ``highlight`` turns it into HTML-escaped text with ``<mark>``
+around the matched terms. Results are paged newest first with ``page`` (keyset
+on the primary key), never by offset.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Text search configuration for PostgreSQL; changing it needs the index rebuilt.
+    'POSTGRES_CONFIG': 'english',
+    'SQLITE_TOKENIZER': 'porter unicode61 remove_diacritics 2',
+    'SNIPPET_WORDS': 24,
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# (app_label, model, text field)
+SOURCES = {
+    'message': ('chat', 'Message', 'content'),
+    'comment': ('uni_services', 'OrderComment', 'message'),
+}
+
+# Private-use code points bracket the hits inside snippets; ``highlight``
+# escapes the text around them and only then turns them into <mark> tags.
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+ELLIPSIS = '…'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_setting(name):
+    return getattr(settings, 'CHAT_SEARCH', {}).get(name, DEFAULTS[name])
+
+
+def _source(model):
+    for app_label, model_name, field_name in SOURCES.values():
+        if model._meta.label == f'{app_label}.{model_name}':
+            return model._meta.db_table, model._meta.get_field(field_name).column, field_name
+    raise ValueError(f'{model._meta.label} is not a search source')
+
+
+def _pg_config():
+    config = search_setting('POSTGRES_CONFIG')
+    # Inlined into the SQL so queries match the index expression exactly.
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_.]*', config):
+        raise ValueError(f'Invalid text search configuration: {config!r}')
+    return config
+
+
+def terms(query) -> list[str]:
+    return TERM_RE.findall(query or '')
+
+
+def _fts5_query(words) -> str:
+    # Every term quoted (no FTS5 operators from user input), all required, the last one as a prefix.
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def install(using='default') -> None:
+    """Create the search index for every source on ``using`` if it is missing."""
+
+    connection = connections[using]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    qn = connection.ops.quote_name
+    existing = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for app_label, model_name, field_name in SOURCES.values():
+            model = apps.get_model(app_label, model_name)
+            table, column = model._meta.db_table, model._meta.get_field(field_name).column
+            if table not in existing:
+                continue
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {qn(table + '_fts')} ON {qn(table)} "
+                    f"USING gin (to_tsvector('{_pg_config()}'::regconfig, {qn(column)}))"
+                )
+                continue
+
+            fts, pk = f'{table}_fts', model._meta.pk.column
+            created = fts not in existing
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {qn(fts)} USING fts5("
+                f"{qn(column)}, content={qn(table)}, content_rowid={qn(pk)}, "
+                f"tokenize='{search_setting('SQLITE_TOKENIZER')}')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {qn(fts + '_ai')} AFTER INSERT ON {qn(table)} BEGIN "
+                f"INSERT INTO {qn(fts)}(rowid, {qn(column)}) VALUES (new.{qn(pk)}, new.{qn(column)}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {qn(fts + '_ad')} AFTER DELETE ON {qn(table)} BEGIN "
+                f"INSERT INTO {qn(fts)}({qn(fts)}, rowid, {qn(column)}) VALUES ('delete', old.{qn(pk)}, old.{qn(column)}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {qn(fts + '_au')} AFTER UPDATE OF {qn(column)} ON {qn(table)} BEGIN "
+                f"INSERT INTO {qn(fts)}({qn(fts)}, rowid, {qn(column)}) VALUES ('delete', old.{qn(pk)}, old.{qn(column)}); "
+                f"INSERT INTO {qn(fts)}(rowid, {qn(column)}) VALUES (new.{qn(pk)}, new.{qn(column)}); END"
+            )
+            if created:
+                cursor.execute(f"INSERT INTO {qn(fts)}({qn(fts)}) VALUES ('rebuild')")
+                logger.info(f"Built full-text index {fts}")
+
+
+def install_after_migrate(using='default', **kwargs) -> None:
+    try:
+        install(using)
+    except DatabaseError:
+        # Search degrades (no FTS5 in this SQLite build, missing privileges); migrate must not fail.
+        logger.exception("Creating the full-text search indexes failed")
+
+
+def search(queryset, query):
+    """
+    ``queryset`` narrowed to rows matching every term of ``query`` and annotated
+    with ``search_snippet``. Raises ValueError when the query has no terms.
+    """
+
+    words = terms(query)
+    if not words:
+        raise ValueError('Search query has no searchable terms')
+    table, column, field_name = _source(queryset.model)
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    length = search_setting('SNIPPET_WORDS')
+
+    if connection.vendor == 'postgresql':
+        config = _pg_config()
+        document = f"to_tsvector('{config}'::regconfig, {qn(table)}.{qn(column)})"
+        tsquery = f"websearch_to_tsquery('{config}'::regconfig, %s)"
+        options = (
+            f'StartSel="{MARK_START}", StopSel="{MARK_END}", MaxWords={length}, MinWords={max(length // 3, 1)}, '
+            f'MaxFragments=2, FragmentDelimiter=" {ELLIPSIS} "'
+        )
+        query = ' '.join(words)
+        return queryset.extra(where=[f'{document} @@ {tsquery}'], params=[query]).annotate(
+            search_snippet=RawSQL(
+                f"ts_headline('{config}'::regconfig, {qn(table)}.{qn(column)}, {tsquery}, %s)",
+                (query, options),
+            ),
+        )
+
+    if connection.vendor == 'sqlite':
+        fts, pk = qn(f'{table}_fts'), qn(queryset.model._meta.pk.column)
+        match = _fts5_query(words)
+        return queryset.extra(
+            where=[f'{qn(table)}.{pk} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)'], params=[match],
+        ).annotate(
+            search_snippet=RawSQL(
+                f"SELECT snippet({fts}, 0, %s, %s, %s, %s) FROM {fts} "
+                f"WHERE {fts} MATCH %s AND {fts}.rowid = {qn(table)}.{pk}",
+                (MARK_START, MARK_END, ELLIPSIS, length, match),
+            ),
+        )
+
+    condition = Q()
+    for word in words:
+        condition &= Q(**{f'{field_name}__icontains': word})
+    return queryset.filter(condition).annotate(search_snippet=RawSQL(f'{qn(table)}.{qn(column)}', ()))
+
+
+def highlight(snippet, query=None) -> str:
+    """HTML for a ``search_snippet``: escaped text, hits wrapped in <mark>."""
+
+    snippet = snippet or ''
+    if MARK_START not in snippet and query:
+        # Fallback backend: mark the terms ourselves.
+        pattern = re.compile('|'.join(re.escape(word) for word in terms(query)), re.IGNORECASE)
+        snippet = pattern.sub(lambda m: f'{MARK_START}{m.group(0)}{MARK_END}', snippet)
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def page(queryset, before=None, limit=None):
+    """
+    Newest-first keyset page: rows with a primary key below ``before``.
+    Returns (rows, has_more, next_cursor). Raises ValueError for a bad cursor or limit.
+    """
+
+    limit = min(max(int(limit or search_setting('PAGE_SIZE')), 1), search_setting('MAX_PAGE_SIZE'))
+    if before:
+        queryset = queryset.filter(pk__lt=int(before))
+    rows = list(queryset.order_by('-pk')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, has_more, (rows[-1].pk if has_more else None)
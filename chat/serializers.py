@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
 from .models import ChatRoom, Message
+from .presence import presence_for
+from .search import highlight
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_email = serializers.EmailField(source='sender.email', read_only=True)
@@ -13,28 +15,78 @@ class MessageSerializer(serializers.ModelSerializer):
             'timestamp', 'is_read', 'read_at', 'attachment'
         ]
 
+
+class MessagePreviewSerializer(serializers.ModelSerializer):
+    """Same shape as the latest_message annotation on room listings"""
+    sender_email = serializers.EmailField(source='sender.email', read_only=True)
+    sender_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = ['id', 'content', 'sender_id', 'sender_email', 'timestamp', 'is_read']
+
+
+class MessageSearchHitSerializer(serializers.ModelSerializer):
+    """A search hit: the message with an HTML snippet, hits in <mark>"""
+    sender_email = serializers.EmailField(source='sender.email', read_only=True)
+    sender_id = serializers.IntegerField(read_only=True)
+    highlight = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = ['id', 'room', 'sender_id', 'sender_email', 'timestamp', 'highlight']
+
+    def get_highlight(self, obj):
+        return highlight(obj.search_snippet, self.context.get('query'))
+
+
 class ChatRoomSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    """
+    Room metadata only; the history is paged through /chatrooms/{id}/messages/.
+    latest_message and unread_count come from ChatRoomViewSet's annotations.
+    """
     client_email = serializers.EmailField(source='client.email', read_only=True)
     admin_email = serializers.EmailField(source='admin.email', read_only=True)
     latest_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
+    presence = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatRoom
         fields = [
             'id', 'client', 'client_email', 'admin', 'admin_email',
             'content_type', 'object_id', 'created_at', 'updated_at',
-            'is_active', 'messages', 'latest_message', 'unread_count'
+            'is_active', 'latest_message', 'unread_count', 'presence'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
     def get_latest_message(self, obj):
-        latest = obj.messages.first()
-        if latest:
-            return MessageSerializer(latest).data
-        return None
+        if not hasattr(obj, 'latest_message_id'):
+            # Rooms that did not come through ChatRoomViewSet.get_queryset (e.g. just created)
+            latest = obj.messages.select_related('sender').order_by('-timestamp', '-id').first()
+            return MessagePreviewSerializer(latest).data if latest else None
+        if obj.latest_message_id is None:
+            return None
+        return {
+            'id': obj.latest_message_id,
+            'content': obj.latest_message_content,
+            'sender_id': obj.latest_message_sender_id,
+            'sender_email': obj.latest_message_sender_email,
+            'timestamp': serializers.DateTimeField().to_representation(obj.latest_message_timestamp),
+            'is_read': obj.latest_message_is_read,
+        }
 
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread_messages'):
+            return obj.unread_messages
         user = self.context['request'].user
-        return obj.messages.filter(is_read=False).exclude(sender=user).count()
\ No newline at end of file
+        return obj.messages.filter(is_read=False).exclude(sender=user).count()
+
+    def get_presence(self, obj):
+        """{user_id: {'online', 'last_seen'}} for both participants; lists pass it in context."""
+        members = (obj.client_id, obj.admin_id)
+        known = self.context.get('presence')
+        if known is None:
+            known = presence_for(members)
+        return {str(user_id): known[user_id] for user_id in members if user_id in known}
+
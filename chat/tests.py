@@ -1,3 +1,348 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, connections
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import re_path
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from uni_services.models import Freelancer
+from chat import presence
+from chat import read_state
+from chat.message_buffer import (
+    ID_EPOCH, SEQUENCE_BITS, WORKER_BITS, MessageBuffer, MessageIdGenerator, WorkerLeaseError, message_ids,
+)
+from chat.models import ChatRoom, Message, RoomParticipantState
+from chat.typing import TypingCoordinator
+from chat.consumers import ChatConsumer
+
+MESSAGES = 1000
+FLUSH_EVERY = 200
+
+# Same route as chat.routing, without its middleware imports
+websocket_urlpatterns = [re_path(r'ws/chat/(?P<room_id>\w+)/$', ChatConsumer.as_asgi())]
+
+
+class Socket(ApplicationCommunicator):
+    """
+    Minimal websocket test client; channels.testing.WebsocketCommunicator
+    needs daphne, which this project does not install.
+    """
+
+    def __init__(self, path, user):
+        super().__init__(URLRouter(websocket_urlpatterns), {
+            'type': 'websocket', 'path': path, 'headers': [], 'query_string': b'', 'subprotocols': [], 'user': user,
+        })
+
+    async def connect(self):
+        await self.send_input({'type': 'websocket.connect'})
+        return (await self.receive_output(timeout=1))['type'] == 'websocket.accept'
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self, timeout=1):
+        return json.loads((await self.receive_output(timeout))['text'])
+
+    async def disconnect(self):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(timeout=1)
+
+
+IN_MEMORY_CHAT = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'CHAT_PRESENCE': {'STORE': 'chat.presence.InMemoryPresenceStore', 'FLUSH_SECONDS': 0},
+}
+
+
+def data_statements(queries):
+    # Transaction control differs per backend; count the statements doing the work.
+    return [q['sql'] for q in queries if not q['sql'].startswith(('BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+@override_settings(**IN_MEMORY_CHAT)
+class MessageBufferFanOutTests(TransactionTestCase):
+    """Fan-out of 1k messages through ChatConsumer and the statements their persistence costs."""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(email='client@example.com', password='x', user_type='CLIENT')
+        self.admin_user = User.objects.create_user(email='admin@example.com', password='x', user_type='ADMIN')
+        self.room = ChatRoom.objects.create(
+            content_type=ContentType.objects.get_for_model(User),
+            object_id=self.client_user.pk,
+            client=self.client_user,
+            admin=self.admin_user,
+        )
+        message_ids.lease()
+        self.addCleanup(message_ids.release)
+
+    async def connect(self, user):
+        socket = Socket(f'/ws/chat/{self.room.pk}/', user)
+        self.assertTrue(await socket.connect())
+        return socket
+
+    async def exchange(self, buffer, queries):
+        """
+        Send MESSAGES messages client -> admin, flushing the buffer by hand every
+        FLUSH_EVERY messages; returns the broadcast ids and the statements of each
+        send round and each flush.
+        """
+        sender = await self.connect(self.client_user)
+        receiver = await self.connect(self.admin_user)
+        await sender.receive_json_from()  # the receiver coming online
+
+        ids, rounds, flushes = [], [], []
+        for first in range(0, MESSAGES, FLUSH_EVERY):
+            mark = len(queries)
+            for i in range(first, first + FLUSH_EVERY):
+                await sender.send_json_to({'type': 'message', 'message': f'message {i}'})
+                event = await receiver.receive_json_from()
+                await sender.receive_json_from()  # the sender's own echo
+                self.assertEqual(event['message'], f'message {i}')
+                ids.append(event['id'])
+            rounds.append(data_statements(queries[mark:]))
+
+            mark = len(queries)
+            self.assertEqual(await buffer.flush(), FLUSH_EVERY)
+            flushes.append(data_statements(queries[mark:]))
+
+        await sender.disconnect()
+        await receiver.disconnect()
+        return ids, rounds, flushes
+
+    def test_statements_per_flush_for_1k_messages(self):
+        # Neither size nor timer triggers a flush on its own; the test flushes.
+        buffer = MessageBuffer(max_size=MESSAGES + 1, max_delay_ms=3_600_000)
+        # thread_sensitive database calls run on this thread, on this thread's connection; resolve it
+        # here so the event loop thread reads the same query log
+        db = connections[DEFAULT_DB_ALIAS]
+        with mock.patch('chat.consumers.message_buffer', buffer), CaptureQueriesContext(db) as queries:
+            ids, rounds, flushes = async_to_sync(self.exchange)(buffer, queries)
+
+        fields = Message._meta.concrete_fields
+        inserts = -(-FLUSH_EVERY // db.ops.bulk_batch_size(fields, [Message()] * FLUSH_EVERY))
+        # bulk INSERT(s), unread counts (one room, one sender), room updated_at
+        per_flush = inserts + 2
+
+        # Messages are broadcast without touching the database; ids are time ordered.
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(rounds, [[]] * (MESSAGES // FLUSH_EVERY))
+        self.assertEqual([len(statements) for statements in flushes], [per_flush] * (MESSAGES // FLUSH_EVERY), flushes[0])
+        self.assertEqual(buffer.flushes, MESSAGES // FLUSH_EVERY)
+        self.assertEqual(buffer.written, MESSAGES)
+
+        messages = Message.objects.filter(room=self.room)
+        self.assertEqual(messages.count(), MESSAGES)
+        self.assertEqual(list(messages.order_by('id').values_list('id', flat=True)), ids)
+        state = RoomParticipantState.objects.get(room=self.room, user=self.admin_user)
+        self.assertEqual(state.unread_count, MESSAGES)
+
+
+@override_settings(**IN_MEMORY_CHAT)
+class MessageIdTests(TransactionTestCase):
+    """Leased worker numbers and cursors on ids whose rows are not written yet."""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(email='client@example.com', password='x', user_type='CLIENT')
+        self.admin_user = User.objects.create_user(email='admin@example.com', password='x', user_type='ADMIN')
+        self.room = ChatRoom.objects.create(
+            content_type=ContentType.objects.get_for_model(User),
+            object_id=self.client_user.pk,
+            client=self.client_user,
+            admin=self.admin_user,
+        )
+        self.addCleanup(message_ids.release)
+
+    def test_processes_lease_distinct_worker_numbers(self):
+        first, second = MessageIdGenerator(), MessageIdGenerator()
+        first.next_id()
+        second.next_id()
+        self.assertNotEqual(first.worker_id, second.worker_id)
+
+        pinned = MessageIdGenerator(worker_id=first.worker_id)
+        with self.assertRaises(WorkerLeaseError):
+            pinned.next_id()
+
+        worker_id = first.worker_id
+        first.release()
+        pinned.next_id()
+        self.assertEqual(pinned.worker_id, worker_id)
+        second.release()
+        pinned.release()
+
+    def test_buffered_message_behind_cursor_is_not_counted_unread(self):
+        # Another worker's message, written only after the admin read past it
+        late = Message(id=message_ids.next_id(), room=self.room, sender=self.client_user, content='late')
+        newer = Message.objects.create(room=self.room, sender=self.client_user, content='newer')
+        read_state.mark_read(self.room, self.admin_user, newer.pk)
+
+        # What MessageBuffer._write does for it
+        Message.objects.bulk_create([late])
+        read_state.record_messages([late])
+        newest = Message.objects.create(room=self.room, sender=self.client_user, content='newest')
+
+        state = RoomParticipantState.objects.get(room=self.room, user=self.admin_user)
+        self.assertEqual(state.unread_count, 1)
+        self.assertLess(late.pk, newer.pk)
+        self.assertLess(newer.pk, newest.pk)
+
+    def test_websocket_id_not_yet_written_is_a_valid_cursor(self):
+        api = APIClient()
+        api.force_authenticate(self.admin_user)
+        buffered_id = message_ids.next_id()
+        newer = Message.objects.create(room=self.room, sender=self.client_user, content='newer')
+
+        response = api.get(f'/api/chat/chatrooms/{self.room.pk}/messages/', {'after': buffered_id})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([m['id'] for m in response.data['results']], [newer.pk])
+
+        response = api.post(f'/api/chat/chatrooms/{self.room.pk}/read/', {'message_id': buffered_id}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['unread_count'], 1)
+
+        future = (int(time.time() * 1000) + 3_600_000 - int(ID_EPOCH.timestamp() * 1000)) << (WORKER_BITS + SEQUENCE_BITS)
+        response = api.get(f'/api/chat/chatrooms/{self.room.pk}/messages/', {'after': future})
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(**IN_MEMORY_CHAT)
+class TypingCoordinatorTests(SimpleTestCase):
+    """Typing events are rate limited, coalesced per tick and expire, against the in-memory layer."""
+
+    async def received(self, channel):
+        layer = get_channel_layer()
+        events = []
+        while True:
+            try:
+                events.append(await asyncio.wait_for(layer.receive(channel), timeout=0.01))
+            except asyncio.TimeoutError:
+                return events
+
+    async def scenario(self):
+        clock = FakeClock()
+        coordinator = TypingCoordinator(cadence_ms=300, ttl_seconds=5, rate_per_second=4, burst=8, clock=clock)
+        coordinator._ensure_running = lambda: None  # ticks are driven by the test
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add('chat_7', channel)
+
+        # A keystroke burst: 30 events, only the first 8 fit the bucket, one broadcast results.
+        for _ in range(30):
+            coordinator.update(7, 1, True)
+        await coordinator.tick()
+        first = await self.received(channel)
+
+        # Still typing plus on/off flicker inside one tick: nothing changes, nothing is sent.
+        clock.now += 2
+        coordinator.update(7, 1, True)
+        coordinator.update(7, 1, False)
+        coordinator.update(7, 1, True)
+        await coordinator.tick()
+        flicker = await self.received(channel)
+
+        # No confirmation within the TTL: the user expires and a stop is broadcast.
+        clock.now += 6
+        await coordinator.tick()
+        expired = await self.received(channel)
+        return coordinator, first, flicker, expired
+
+    def test_burst_is_rate_limited_coalesced_and_expires(self):
+        coordinator, first, flicker, expired = async_to_sync(self.scenario)()
+
+        self.assertEqual([event['changes'] for event in first], [[{'user_id': 1, 'is_typing': True}]])
+        self.assertEqual(flicker, [])
+        self.assertEqual([event['changes'] for event in expired], [[{'user_id': 1, 'is_typing': False}]])
+        self.assertEqual(coordinator.metrics['received'], 33)
+        self.assertEqual(coordinator.metrics['rate_limited'], 22)
+        self.assertEqual(coordinator.metrics['coalesced'], 10)
+        self.assertEqual(coordinator.metrics['expired'], 1)
+        self.assertEqual(coordinator.metrics['broadcasts'], 2)
+        self.assertEqual(coordinator.snapshot()['tracked'], 0)
+
+    async def ongoing(self):
+        clock = FakeClock()
+        coordinator = TypingCoordinator(cadence_ms=300, ttl_seconds=6, rate_per_second=4, burst=8, clock=clock)
+        coordinator._ensure_running = lambda: None
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add('chat_7', channel)
+
+        rounds = []
+        # Typing on for 10s, a keystroke per second: announced, then refreshed every ttl / 2.
+        for _ in range(10):
+            coordinator.update(7, 1, True)
+            await coordinator.tick()
+            rounds.append(len(await self.received(channel)))
+            clock.now += 1
+        return coordinator, rounds
+
+    def test_ongoing_typing_is_reannounced_within_ttl(self):
+        coordinator, rounds = async_to_sync(self.ongoing)()
+
+        self.assertEqual(rounds, [1, 0, 0, 1, 0, 0, 1, 0, 0, 1])
+        self.assertEqual(coordinator.metrics['reannounced'], 3)
+        self.assertEqual(coordinator.typing_users(7), [1])
+
+
+@override_settings(**IN_MEMORY_CHAT)
+class PresenceTests(TransactionTestCase):
+    """Socket presence through ChatConsumer, with the in-memory store."""
+
+    def setUp(self):
+        self.freelancer_user = User.objects.create_user(email='freelancer@example.com', password='x', user_type='FREELANCER')
+        self.admin_user = User.objects.create_user(email='admin@example.com', password='x', user_type='ADMIN')
+        self.room = ChatRoom.objects.create(
+            content_type=ContentType.objects.get_for_model(User),
+            object_id=self.freelancer_user.pk,
+            client=self.freelancer_user,
+            admin=self.admin_user,
+        )
+        self.long_ago = timezone.now() - timedelta(days=30)
+        Freelancer.objects.filter(user=self.freelancer_user).update(last_active=self.long_ago)
+
+    async def sessions(self):
+        path = f'/ws/chat/{self.room.pk}/'
+        watcher = Socket(path, self.admin_user)
+        await watcher.connect()
+        first, second = Socket(path, self.freelancer_user), Socket(path, self.freelancer_user)
+        await first.connect()
+        came_online = await watcher.receive_json_from()
+        await second.connect()
+        await first.send_json_to({'type': 'heartbeat'})
+        await first.disconnect()
+        online_with_one_socket = presence.online_user_ids([self.freelancer_user.pk])
+        await second.disconnect()
+        went_offline = await watcher.receive_json_from()
+        await watcher.disconnect()
+        return came_online, online_with_one_socket, went_offline
+
+    def test_online_until_last_socket_leaves_and_last_active_is_flushed(self):
+        came_online, online_with_one_socket, went_offline = async_to_sync(self.sessions)()
+
+        self.assertEqual(came_online, {'type': 'presence', 'user_id': self.freelancer_user.pk, 'online': True})
+        self.assertEqual(online_with_one_socket, {self.freelancer_user.pk})
+        self.assertEqual(went_offline, {'type': 'presence', 'user_id': self.freelancer_user.pk, 'online': False})
+        state = presence.presence_for([self.freelancer_user.pk, self.admin_user.pk])
+        self.assertFalse(state[self.freelancer_user.pk]['online'])
+        self.assertIsNotNone(state[self.freelancer_user.pk]['last_seen'])
+        self.assertGreater(Freelancer.objects.get(user=self.freelancer_user).last_active, self.long_ago)
 
-# Create your tests here.
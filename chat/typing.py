@@ -0,0 +1,175 @@
+"""
+Server-side typing indicators for chat rooms.
+
+Clients still send ``{"type": "typing", "is_typing": ...}`` on keystrokes, but
+ChatConsumer no longer forwards each one to the room group. The process-wide
+TypingCoordinator keeps the typing state per (room, user) and:
+
+  - rate limits each user per room with a token bucket (RATE_PER_SECOND / BURST);
+    events over the limit are dropped;
+  - coalesces: every CADENCE_MS it broadcasts, per room, only the users whose
+    state differs from what was last broadcast, in one ``user_typing`` group
+    message. Repeated "still typing" events and on/off flicker inside one tick
+    never leave the process;
+  - expires a user who has not confirmed typing for TTL_SECONDS (lost "stop"
+    events, closed tabs); sending a message or disconnecting stops typing at once;
+  - re-announces users still typing every TTL_SECONDS / 2. Broadcasts carry
+    ``ttl`` and clients hide an indicator not refreshed within it, so an ongoing
+    typist stays visible, and members who joined meanwhile learn about them
+    (``typing_users`` gives a new socket this worker's typists right away).
+
+State lives in the worker that holds the typist's socket and broadcasts carry
+per-user changes, so rooms spread over several workers merge correctly.
+``metrics`` counts received, rate_limited, coalesced, expired and reannounced
+events and the broadcasts sent; ``snapshot()`` returns them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .read_state import room_group_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CADENCE_MS': 300,
+    'TTL_SECONDS': 6,
+    'RATE_PER_SECOND': 4,
+    'BURST': 8,
+}
+
+
+def typing_setting(name):
+    return getattr(settings, 'CHAT_TYPING', {}).get(name, DEFAULTS[name])
+
+
+class _UserTyping:
+    __slots__ = ('typing', 'broadcast', 'announced_at', 'expires_at', 'tokens', 'refilled_at', 'events')
+
+    def __init__(self, now, burst):
+        self.typing = False
+        self.broadcast = False
+        self.announced_at = now
+        self.expires_at = now
+        self.tokens = burst
+        self.refilled_at = now
+        self.events = 0
+
+
+class TypingCoordinator:
+    def __init__(self, cadence_ms=None, ttl_seconds=None, rate_per_second=None, burst=None, clock=time.monotonic):
+        self.cadence = (cadence_ms or typing_setting('CADENCE_MS')) / 1000
+        self.ttl = ttl_seconds or typing_setting('TTL_SECONDS')
+        self.rate = rate_per_second or typing_setting('RATE_PER_SECOND')
+        self.burst = burst or typing_setting('BURST')
+        self.clock = clock
+        self.metrics = Counter()
+        self._rooms = {}
+        self._task = None
+
+    def _state(self, room_id, user_id, now):
+        users = self._rooms.setdefault(str(room_id), {})
+        if user_id not in users:
+            users[user_id] = _UserTyping(now, self.burst)
+        return users[user_id]
+
+    def update(self, room_id, user_id, is_typing) -> bool:
+        """Record a client typing event; False when it was rate limited."""
+
+        now = self.clock()
+        self.metrics['received'] += 1
+        state = self._state(room_id, user_id, now)
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate)
+        state.refilled_at = now
+        if state.tokens < 1:
+            self.metrics['rate_limited'] += 1
+            return False
+        state.tokens -= 1
+        state.events += 1
+        state.typing = bool(is_typing)
+        if state.typing:
+            state.expires_at = now + self.ttl
+        self._ensure_running()
+        return True
+
+    def stop(self, room_id, user_id) -> None:
+        """The user sent a message or left: no longer typing, without touching the rate limit."""
+
+        state = self._rooms.get(str(room_id), {}).get(user_id)
+        if state is not None and state.typing:
+            state.typing = False
+            self._ensure_running()
+
+    def typing_users(self, room_id) -> list:
+        """Users in ``room_id`` this worker last broadcast as typing, for a socket that just joined."""
+
+        now = self.clock()
+        users = self._rooms.get(str(room_id), {})
+        return [user_id for user_id, state in users.items() if state.broadcast and state.expires_at > now]
+
+    def collect(self) -> dict:
+        """Expire and diff every tracked state: {room_id: [{'user_id', 'is_typing'}]} to broadcast."""
+
+        now = self.clock()
+        changes = {}
+        for room_id, users in list(self._rooms.items()):
+            for user_id, state in list(users.items()):
+                if state.typing and state.expires_at <= now:
+                    state.typing = False
+                    self.metrics['expired'] += 1
+                changed = state.typing != state.broadcast
+                # Still typing: refresh the indicator before clients' ttl runs out.
+                reannounce = not changed and state.typing and now - state.announced_at >= self.ttl / 2
+                self.metrics['coalesced'] += state.events - (1 if (changed or reannounce) and state.events else 0)
+                state.events = 0
+                if changed or reannounce:
+                    changes.setdefault(room_id, []).append({'user_id': user_id, 'is_typing': state.typing})
+                    state.broadcast = state.typing
+                    state.announced_at = now
+                    if reannounce:
+                        self.metrics['reannounced'] += 1
+                refilled = state.tokens + (now - state.refilled_at) * self.rate >= self.burst
+                if not state.typing and refilled:
+                    del users[user_id]
+            if not users:
+                del self._rooms[room_id]
+        return changes
+
+    async def tick(self) -> int:
+        changes = self.collect()
+        if not changes:
+            return 0
+        channel_layer = get_channel_layer()
+        for room_id, room_changes in changes.items():
+            await channel_layer.group_send(room_group_name(room_id), {
+                'type': 'user_typing',
+                'changes': room_changes,
+                'ttl': self.ttl,
+            })
+            self.metrics['broadcasts'] += 1
+        return len(changes)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while self._rooms:
+            await asyncio.sleep(self.cadence)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Broadcasting typing state failed")
+
+    def snapshot(self) -> dict:
+        return dict(self.metrics, tracked=sum(len(users) for users in self._rooms.values()))
+
+
+typing_coordinator = TypingCoordinator()
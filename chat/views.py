@@ -5,14 +5,19 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q, Max
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
 import logging
 
 from authentication.models import User
 from chat.models import ChatRoom
-from chat.serializers import ChatRoomSerializer
-from uni_services.models import BaseService
-from .models import ChatRoom, Message
+from chat.serializers import ChatRoomSerializer, MessageSearchHitSerializer, MessageSerializer
+from uni_services.service_types import resolve_content_type
+from .models import ChatRoom, Message, RoomParticipantState
+from . import read_state, search as message_search
+from .message_buffer import parse_message_id
+from .presence import presence_for
 # Set up logger for debugging
 logger = logging.getLogger(__name__)
 
@@ -26,22 +31,163 @@ class IsAdminOrClientOwner(permissions.BasePermission):
             return True
         return obj.client == request.user
 
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
 class ChatRoomViewSet(viewsets.ModelViewSet):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
+        # Each subquery is a LIMIT 1 seek on the (room, timestamp) index or the (room, user) state.
+        latest = Message.objects.filter(room=OuterRef('pk')).order_by('-timestamp', '-id')
+        unread = RoomParticipantState.objects.filter(room=OuterRef('pk'), user=user).values('unread_count')[:1]
         return ChatRoom.objects.filter(
             Q(client=user) | Q(admin=user)
-        ).annotate(
-            last_message_time=Max('messages__timestamp')
-        ).order_by('-last_message_time')
+        ).select_related('client', 'admin').annotate(
+            latest_message_id=Subquery(latest.values('id')[:1]),
+            latest_message_content=Subquery(latest.values('content')[:1]),
+            latest_message_sender_id=Subquery(latest.values('sender_id')[:1]),
+            latest_message_sender_email=Subquery(latest.values('sender__email')[:1]),
+            latest_message_timestamp=Subquery(latest.values('timestamp')[:1]),
+            latest_message_is_read=Subquery(latest.values('is_read')[:1]),
+            last_message_time=F('latest_message_timestamp'),
+            unread_messages=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+        ).order_by(F('last_message_time').desc(nulls_last=True), '-id')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rooms = list(page if page is not None else queryset)
+        # One bulk presence lookup for every participant on the page
+        context = self.get_serializer_context()
+        context['presence'] = presence_for({user_id for room in rooms for user_id in (room.client_id, room.admin_id)})
+        serializer = self.get_serializer_class()(rooms, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """
+        Keyset-paginated room history, oldest first within a page.
+
+        ?before=<message id>  the page of messages just older than that message
+                              (infinite scroll upwards); without a cursor, the latest page
+        ?after=<message id>   messages newer than that message, oldest first
+                              (gap-filling after a reconnect)
+        ?limit=<n>            page size, default 50, at most 200
+
+        ``has_more`` tells whether more messages exist past the page in the
+        direction requested; ``before`` / ``after`` are the cursors to continue with.
+        """
+        room = get_object_or_404(ChatRoom.objects.filter(Q(client=request.user) | Q(admin=request.user)), pk=pk)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', MESSAGE_PAGE_SIZE)), 1), MAX_MESSAGE_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response({'error': 'Pass either before or after, not both'}, status=status.HTTP_400_BAD_REQUEST)
+
+        history = Message.objects.filter(room=room).select_related('sender')
+        cursor = before or after
+        if cursor:
+            # Ids are time ordered, so the cursor needs no row: a websocket id still
+            # buffered by another worker is a valid ?after=.
+            cursor_id = parse_message_id(cursor)
+            if cursor_id is None:
+                return Response({'error': f'Unknown message cursor: {cursor}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if after:
+            page = list(history.filter(id__gt=cursor_id).order_by('id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before:
+                history = history.filter(id__lt=cursor_id)
+            page = list(history.order_by('-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+
+        return Response({
+            'results': MessageSerializer(page, many=True, context={'request': request}).data,
+            'has_more': has_more,
+            'before': page[0].id if page else before,
+            'after': page[-1].id if page else after,
+        })
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """
+        Move the caller's read cursor up to ``message_id`` (default: the latest
+        message) and broadcast a read receipt to the room.
+        """
+        room = get_object_or_404(ChatRoom.objects.filter(Q(client=request.user) | Q(admin=request.user)), pk=pk)
+        message_id = request.data.get('message_id')
+        if message_id is not None:
+            # May not be written yet (write-behind); its id dates it, so no row is needed.
+            parsed = parse_message_id(message_id)
+            if parsed is None:
+                return Response({'error': f'Unknown message: {message_id}'}, status=status.HTTP_400_BAD_REQUEST)
+            message_id = parsed
+
+        state = read_state.mark_read(room, request.user, message_id)
+        return Response({
+            'room': room.pk,
+            'last_read_message_id': state.last_read_message_id if state else None,
+            'unread_count': state.unread_count if state else 0,
+        })
+
+    @action(detail=False, methods=['get'])
+    def unread(self, request):
+        """Unread badge counts: the total and the rooms that have unread messages."""
+        states = RoomParticipantState.objects.filter(user=request.user, unread_count__gt=0)
+        rooms = dict(states.values_list('room_id', 'unread_count'))
+        return Response({'total': sum(rooms.values()), 'rooms': rooms})
+
+    @action(detail=False, methods=['get'], url_path='search-messages')
+    def search_messages(self, request):
+        """
+        Full-text search over the messages of the caller's rooms, newest first.
+
+        ?q=<text>             every term must match (the last one as a prefix on SQLite)
+        ?room=<room id>       only this room
+        ?before=<message id>  continue after the previous page's ``before`` cursor
+        ?limit=<n>            page size, default 20, at most 100
+        """
+        messages = Message.objects.filter(
+            Q(room__client=request.user) | Q(room__admin=request.user)
+        ).select_related('sender')
+        room_id = request.query_params.get('room')
+        if room_id:
+            if not str(room_id).isdigit():
+                return Response({'error': f'Unknown room: {room_id}'}, status=status.HTTP_400_BAD_REQUEST)
+            messages = messages.filter(room_id=room_id)
+
+        query = request.query_params.get('q', '')
+        try:
+            hits, has_more, before = message_search.page(
+                message_search.search(messages, query),
+                before=request.query_params.get('before'),
+                limit=request.query_params.get('limit'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageSearchHitSerializer(hits, many=True, context={'request': request, 'query': query})
+        return Response({'results': serializer.data, 'has_more': has_more, 'before': before})
 
     @action(detail=False, methods=['get'])
     def search(self, request):
         """
-        Search for a chatroom by object_id.
+        Search for a chatroom by object_id (the service's content type is resolved
+        from the id, so the lookup uses the (content_type, object_id) index).
         """
         object_id = request.query_params.get('object_id')
         
@@ -55,12 +201,20 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        content_type = resolve_content_type(object_id)
+        if content_type is None:
+            error_msg = f"No chatroom found for object_id: {object_id}"
+            logger.info(error_msg)
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
         try:
-            # Move the Q objects into a filter
-            chatroom = ChatRoom.objects.filter(
-                Q(client=request.user) | Q(admin=request.user)
-            ).get(object_id=object_id)
-            
+            chatroom = self.get_queryset().filter(content_type=content_type, object_id=object_id).first()
+            if chatroom is None:
+                raise ChatRoom.DoesNotExist
+
             logger.info(f"Found existing chatroom: {chatroom.id}")
             serializer = self.get_serializer(chatroom)
             return Response(serializer.data)
@@ -222,25 +376,10 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
 
     def get_content_type_from_object_id(self, object_id):
         """
-        Dynamically determine the content type based on the object_id.
+        The content type of the service with this object_id, read from its
+        polymorphic_ctype (see uni_services.service_types).
         """
-        try:
-            # Get all models that inherit from BaseService
-            from django.apps import apps
-            base_service_models = [
-                model for model in apps.get_models() 
-                if issubclass(model, BaseService) and model != BaseService
-            ]
-            
-            # Check each model for the object_id
-            for model in base_service_models:
-                if model.objects.filter(id=object_id).exists():
-                    logger.info(f"Object {object_id} identified as {model.__name__}")
-                    return ContentType.objects.get_for_model(model)
-
+        content_type = resolve_content_type(object_id)
+        if content_type is None:
             logger.error(f"No matching content type found for object_id: {object_id}")
-            return None
-
-        except Exception as e:
-            logger.error(f"Error determining content type for object_id {object_id}: {str(e)}")
-            return None
\ No newline at end of file
+        return content_type
@@ -17,6 +17,67 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def check_document_file(name, document_type, filename, size):
+    """
+    Size and extension limits of the DocumentRequirement matching a document's
+    name or type (MAX_UPLOAD_SIZE without one). Raises ValidationError.
+    Shared by DocumentSerializer and the chunked upload target for documents.
+    """
+    logger.debug(f"Validating file upload: name={name}, document_type={document_type}, size={size}")
+
+    # Find matching requirement
+    requirement = None
+    try:
+        requirement = DocumentRequirement.objects.filter(
+            name__iexact=name,
+            active=True
+        ).first() or DocumentRequirement.objects.filter(
+            document_type=document_type,
+            active=True
+        ).first()
+        
+        if requirement:
+            logger.debug(f"Found matching requirement: {requirement.name} with max_file_size={requirement.max_file_size}")
+    except Exception as e:
+        logger.warning(f"Error while fetching DocumentRequirement: {e}")
+
+    # Set reasonable minimum file size limit (5MB default)
+    DEFAULT_MAX_SIZE = 5 * 1024 * 1024  # 5MB default
+    
+    # Use specific requirement size limit or default
+    if requirement and requirement.max_file_size and requirement.max_file_size > 100000:  # Sanity check: at least 100KB
+        # Use the requirement's size limit
+        max_size = requirement.max_file_size  # Already in bytes
+        logger.debug(f"Using requirement max size: {max_size} bytes ({max_size/(1024*1024):.1f} MB)")
+    else:
+        # Fallback to global or default size limit
+        max_size = getattr(settings, 'MAX_UPLOAD_SIZE', DEFAULT_MAX_SIZE)
+        logger.debug(f"Using fallback max size: {max_size} bytes ({max_size/(1024*1024):.1f} MB)")
+    
+    # Ensure we never have a zero or tiny max size
+    if max_size < 1024 * 1024:  # If less than 1MB, use default
+        logger.warning(f"Max size {max_size} is too small, using default 5MB instead")
+        max_size = DEFAULT_MAX_SIZE
+        
+    # Now check the file size
+    if size > max_size:
+        max_size_mb = max_size / (1024 * 1024)
+        logger.warning(f"File size {size} exceeds max {max_size}")
+        raise serializers.ValidationError(
+            f"File is too large. Maximum size is {max_size_mb:.1f} MB."
+        )
+
+    # Validate extension if applicable
+    if requirement and requirement.allowed_extensions:
+        allowed_exts = [ext.strip().lower() for ext in requirement.allowed_extensions.split(',') if ext.strip()]
+        file_ext = f".{filename.split('.')[-1].lower()}" if '.' in filename else ''
+        if allowed_exts and file_ext and file_ext not in allowed_exts:
+            logger.warning(f"Invalid file extension: {file_ext}. Allowed: {allowed_exts}")
+            raise serializers.ValidationError(
+                f"Invalid file extension. Allowed extensions are: {requirement.allowed_extensions}"
+            )
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     """Serializer for Document model with file upload handling."""
     file_url = serializers.SerializerMethodField()
@@ -69,6 +130,11 @@ class DocumentSerializer(serializers.ModelSerializer):
         if not value:
             return value
 
+        check_document_file(
+            self.initial_data.get('name', ''), self.initial_data.get('document_type', ''), value.name, value.size
+        )
+        return value
+
         document_type = self.initial_data.get('document_type', '')
         name = self.initial_data.get('name', '')
         logger.debug(f"Validating file upload: name={name}, document_type={document_type}, size={value.size}")
@@ -0,0 +1,90 @@
+"""
+Reusable model mixins shared across apps.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any
+
+_MISSING = object()
+
+
+class DirtyFieldsMixin:
+    """
+    Snapshot concrete field values when a row is loaded so saves can diff
+    against the database state without re-reading the row.
+
+    Mix in ahead of the Django model base, e.g.
+    ``class Payout(DirtyFieldsMixin, models.Model)``. The snapshot is taken in
+    ``from_db`` and refreshed after every successful ``save()`` (post_save
+    receivers still see the pre-save snapshot) and ``refresh_from_db()``.
+    Deferred fields are not tracked until they are loaded.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._reset_field_snapshot()
+        return instance
+
+    def _tracked_fields(self):
+        deferred = self.get_deferred_fields()
+        return [f for f in self._meta.concrete_fields if f.attname not in deferred]
+
+    def _reset_field_snapshot(self, attnames=None):
+        snapshot = getattr(self, '_loaded_field_values', None)
+        if snapshot is None or attnames is None:
+            snapshot = {}
+        for field in self._tracked_fields():
+            if attnames is None or field.attname in attnames:
+                snapshot[field.attname] = copy.deepcopy(getattr(self, field.attname))
+        self._loaded_field_values = snapshot
+
+    @property
+    def has_field_snapshot(self) -> bool:
+        """True once the instance has been loaded from (or written to) the DB."""
+        return getattr(self, '_loaded_field_values', None) is not None
+
+    def previous(self, field_name: str, default: Any = None) -> Any:
+        """Value of ``field_name`` as last read from / written to the DB."""
+        snapshot = getattr(self, '_loaded_field_values', None)
+        if snapshot is None:
+            return default
+        attname = self._meta.get_field(field_name).attname
+        return snapshot.get(attname, default)
+
+    def changed_fields(self) -> set[str]:
+        """
+        Names of concrete fields whose in-memory value differs from the snapshot.
+        Unsaved instances report every concrete field.
+        """
+        snapshot = getattr(self, '_loaded_field_values', None)
+        if snapshot is None:
+            return {f.name for f in self._meta.concrete_fields}
+        changed = set()
+        for field in self._tracked_fields():
+            old = snapshot.get(field.attname, _MISSING)
+            if old is _MISSING or old != getattr(self, field.attname):
+                changed.add(field.name)
+        return changed
+
+    def has_changed(self, field_name: str) -> bool:
+        return field_name in self.changed_fields()
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.has_field_snapshot:
+            attnames = {self._meta.get_field(name).attname for name in update_fields}
+            self._reset_field_snapshot(attnames)
+        else:
+            self._reset_field_snapshot()
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is not None and self.has_field_snapshot:
+            attnames = {self._meta.get_field(name).attname for name in fields}
+            self._reset_field_snapshot(attnames)
+        else:
+            self._reset_field_snapshot()
@@ -86,6 +86,7 @@ INSTALLED_APPS = [
     'support',
     'resources',
     'payouts',
+    'uploads',
 
 ]
 
@@ -100,6 +101,47 @@ CHANNEL_LAYERS = {
     },
 }
 
+# One cache for every worker process. These entries are invalidated after commit by
+# the process that wrote, which reaches the other workers only through a shared
+# cache (a per-process LocMemCache keeps serving their stale copies until the TTL):
+#   - tenancy.collaboration rosters and recruiter lists
+#   - payouts.period_stats closed-period versions
+#   - support.stats generation
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/2'),
+        'KEY_PREFIX': 'fred',
+    },
+}
+
+# Write-behind chat message persistence, see chat/message_buffer.py. Each process
+# leases its own message id worker number (0-31) from the database; leave WORKER_ID
+# unset, since pinning one number fails in every process but the first.
+CHAT_MESSAGE_BUFFER = {
+    'MAX_SIZE': 200,
+    'MAX_DELAY_MS': 250,
+    'WORKER_ID': None,
+    'LEASE_SECONDS': 120,
+}
+
+# Online presence, see chat/presence.py. Socket heartbeats expire after TTL_SECONDS;
+# Freelancer.last_active is written in batches every FLUSH_SECONDS.
+CHAT_PRESENCE = {
+    'STORE': 'chat.presence.RedisPresenceStore',
+    'OPTIONS': {'url': 'redis://127.0.0.1:6379/1'},
+    'TTL_SECONDS': 60,
+    'FLUSH_SECONDS': 60,
+}
+
+# Typing indicators, see chat/typing.py: per-user rate limit, coalesced broadcast cadence, expiry.
+CHAT_TYPING = {
+    'CADENCE_MS': 300,
+    'TTL_SECONDS': 6,
+    'RATE_PER_SECOND': 4,
+    'BURST': 8,
+}
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -170,6 +212,42 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Revoked refresh-token store (logout + rotation), see authentication/revocation.py
+JWT_REVOCATION = {
+    'STORE': 'authentication.revocation.CachedRevokedTokenStore',
+    'BLOOM_CAPACITY': 100_000,
+    'BLOOM_ERROR_RATE': 0.001,
+    # Max delay before revocations made by another process reach this process's Bloom filter.
+    'BLOOM_SYNC_SECONDS': 2,
+}
+
+# Disbursement worker (python manage.py run_disbursements), see payouts/disbursement.py.
+# Only payment methods listed under PROVIDERS are sent automatically, e.g.
+#   'mpesa': {'ADAPTER': 'payouts.disbursement.MockDisbursementProvider',
+#             'RATE_PER_SECOND': 10, 'BURST': 10, 'MAX_CONCURRENCY': 4, 'OPTIONS': {}},
+PAYOUT_DISBURSEMENT = {
+    'PROVIDERS': {},
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE_SECONDS': 2,
+    'BACKOFF_MAX_SECONDS': 15 * 60,
+}
+
+# Monthly partner statements (PDF/CSV), see payouts/statements.py. MAX_WORKERS sizes the
+# in-process render pool; generate_partner_statements --workers sets its own.
+PAYOUT_STATEMENTS = {
+    'MAX_WORKERS': 2,
+    'STALE_SECONDS': 10 * 60,
+}
+
+# Chunked, resumable uploads, see uploads/chunked.py. TEMP_DIR must be shared by all web workers.
+CHUNKED_UPLOADS = {
+    'CHUNK_SIZE': 5 * 1024 * 1024,
+    'MAX_FILE_SIZE': 2 * 1024 * 1024 * 1024,
+    'TEMP_DIR': os.environ.get('CHUNKED_UPLOAD_DIR'),
+    'SESSION_TTL_HOURS': 24,
+}
+
 # # Enable CORS for your frontend
 # CORS_ALLOWED_ORIGINS = [
 #     "http://localhost:3000",  # Your Next.js frontend URL
@@ -45,6 +45,7 @@ urlpatterns = [
     path('api/', include('documents_management.urls')),
     path('api/support/', include('support.urls')),
     path('api/payouts/', include('payouts.urls')),
+    path('api/uploads/', include('uploads.urls')),
     path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'),
     path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='redoc-ui'),
     path('api/openapi.json', schema_view.without_ui(cache_timeout=0), name='openapi-schema'),
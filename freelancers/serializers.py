@@ -2,6 +2,7 @@ from decimal import Decimal
 from rest_framework import serializers
 
 from uni_services.models import Freelancer, FreelancerCertification, FreelancerPortfolio, FreelancerReview
+from chat.presence import online_user_ids
 
 
 class FreelancerSerializer(serializers.ModelSerializer):
@@ -33,6 +34,7 @@ class MarketplaceDirectorySerializer(serializers.ModelSerializer):
     catalog_preview = serializers.SerializerMethodField()
     skill_preview = serializers.SerializerMethodField()
     marketplace_tier_display = serializers.CharField(source='get_marketplace_tier_display', read_only=True)
+    is_online = serializers.SerializerMethodField()
 
     class Meta:
         model = Freelancer
@@ -48,8 +50,15 @@ class MarketplaceDirectorySerializer(serializers.ModelSerializer):
             'catalog_preview',
             'average_rating',
             'hourly_rate',
+            'is_online',
         ]
 
+    def get_is_online(self, obj):
+        online = self.context.get('online_user_ids')
+        if online is None:
+            online = online_user_ids([obj.user_id])
+        return obj.user_id in online
+
     def get_public_first_name(self, obj):
         if getattr(obj.user, 'first_name', None):
             return obj.user.first_name
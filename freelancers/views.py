@@ -2,6 +2,7 @@
 import django_filters
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
@@ -9,11 +10,15 @@ from django.db.models import Q, Count, Sum
 from django.db.models import Avg 
 from uni_services.models import BaseService, Freelancer
 from django.db.models import Sum, Count, Avg
-from datetime import  timedelta
-from django.utils import timezone
-from django.db.models import Prefetch
-from payouts.models import Payout, PayoutSetting
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from payouts.ledger import get_balance
+from chat.presence import online_user_ids
+from payouts import statements
+from payouts.models import PartnerBalance, PartnerStatement, Payout, PayoutSetting
+from payouts.serializers import PartnerStatementRequestSerializer, PartnerStatementSerializer
 from tenancy.services import set_exclusive_freelancer_tier_flag
+from uni_services import dashboard
 
 from .serializers import (
     FreelancerSerializer,
@@ -47,6 +52,23 @@ class FreelancerFilter(django_filters.FilterSet):
             'is_profile_verified'
         ]
 
+class ProfilePayoutsPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'payouts_cursor'
+    ordering = ('-request_date', '-id')
+
+
+class ProfileTasksPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'tasks_cursor'
+    # completed_at falls back to updated_at for rows completed by a bulk update
+    ordering = ('-completed_sort', '-id')
+
+
 class FreelancerViewSet(viewsets.ModelViewSet):
     queryset = Freelancer.objects.select_related('user').prefetch_related(
         'portfolio_items', 
@@ -92,7 +114,7 @@ class FreelancerViewSet(viewsets.ModelViewSet):
             self.permission_classes = [AllowAny]
         elif self.action == 'set_marketplace_tier':
             self.permission_classes = [IsAuthenticated]
-        elif self.action in ['create', 'update', 'partial_update', 'destroy', 'toggle_verification']:
+        elif self.action in ['create', 'update', 'partial_update', 'destroy', 'toggle_verification', 'earnings_report']:
             self.permission_classes = [IsAdminUser]
         elif self.action in ['my_profile']:
             self.permission_classes = [IsAuthenticated]
@@ -133,8 +155,9 @@ class FreelancerViewSet(viewsets.ModelViewSet):
         tier = request.query_params.get('tier')
         if tier in ('native', 'dynamic', 'demer'):
             qs = qs.filter(marketplace_tier=tier)
-        qs = qs.order_by('-is_featured', '-average_rating', '-total_projects_completed')[:48]
-        ser = MarketplaceDirectorySerializer(qs, many=True, context={'request': request})
+        cards = list(qs.order_by('-is_featured', '-average_rating', '-total_projects_completed')[:48])
+        online = online_user_ids([card.user_id for card in cards])
+        ser = MarketplaceDirectorySerializer(cards, many=True, context={'request': request, 'online_user_ids': online})
         return Response(ser.data)
 
     @action(detail=False, methods=['post'], url_path='set-marketplace-tier')
@@ -402,11 +425,9 @@ class FreelancerViewSet(viewsets.ModelViewSet):
         )
         
         if serializer.is_valid():
+            # FreelancerReview.save updates the rating counters
             serializer.save(freelancer=freelancer, client=request.user)
             
-            # Update freelancer stats
-            freelancer.update_statistics()
-            
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -454,461 +475,111 @@ class FreelancerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     @action(detail=False, methods=['get'], url_path='dashboard-stats')
     def dashboard_stats(self, request):
-        """Get freelancer dashboard statistics for authenticated user"""
+        """
+        Get freelancer dashboard statistics for authenticated user, served from the
+        pre-aggregated FreelancerDashboardSnapshot (?refresh=true recomputes it live).
+        """
         try:
-            # Start with basic query and add prefetch_related based on actual relationships
-            freelancer = Freelancer.objects.select_related('user').prefetch_related(
-                'assigned_orders',  # Remove the __order part that's causing the error
-                'reviews',
-                'portfolio_items',
-                'certifications'
+            freelancer = Freelancer.objects.select_related(
+                'user__profile__balance', 'dashboard_snapshot',
             ).get(user=request.user)
         except Freelancer.DoesNotExist:
             return Response(
                 {'error': 'Freelancer profile not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Calculate time periods
-        now = timezone.now()
-        one_month_ago = now - timedelta(days=30)
-        three_months_ago = now - timedelta(days=90)
-        
-        # Get assigned orders queryset
-        assigned_orders = freelancer.assigned_orders.all()
-        
-        # Calculate monthly earnings safely
-        try:
-            monthly_earnings = assigned_orders.filter(
-                status='completed',
-                completed_at__gte=one_month_ago
-            ).aggregate(
-                total=Sum('bid_amount')
-            )['total'] or 0
-        except Exception as e:
-            monthly_earnings = 0
-        
-        # Calculate quarterly earnings safely
-        try:
-            quarterly_earnings = assigned_orders.filter(
-                status='completed',
-                completed_at__gte=three_months_ago
-            ).aggregate(
-                total=Sum('bid_amount')
-            )['total'] or 0
-        except Exception as e:
-            quarterly_earnings = 0
-        
-        # Safe count operations
-        try:
-            active_tasks = assigned_orders.filter(
-                status__in=['assigned', 'start_working', 'in_progress']
-            ).count()
-        except:
-            active_tasks = 0
-        
-        try:
-            completed_tasks = assigned_orders.filter(status='completed').count()
-        except:
-            completed_tasks = 0
-        
-        try:
-            pending_tasks = assigned_orders.filter(
-                status__in=['submitted', 'under_review']
-            ).count()
-        except:
-            pending_tasks = 0
-        
-        # Calculate success rate
-        success_rate = self._calculate_success_rate(freelancer)
-        
-        # Get profile completion score safely
-        try:
-            profile_completion = freelancer.calculate_profile_completion()
-        except:
-            profile_completion = 50  # Default value
-        
-        # Build response data
-        stats = {
-            # Financial stats
-            'financial': {
-                'total_earnings': float(freelancer.total_earnings or 0),
-                'monthly_earnings': float(monthly_earnings),
-                'quarterly_earnings': float(quarterly_earnings),
-                'average_project_value': self._calculate_average_project_value(freelancer),
-                'earnings_growth': self._calculate_earnings_growth(freelancer),
-            },
-            
-            # Task/Project stats
-            'projects': {
-                'active_tasks': active_tasks,
-                'completed_tasks': completed_tasks,
-                'pending_tasks': pending_tasks,
-                'total_projects': freelancer.total_projects_completed or 0,
-                'success_rate': success_rate,
-                'completion_rate': self._calculate_completion_rate(freelancer),
-            },
-            
-            # Profile stats
-            'profile': {
-                'average_rating': float(freelancer.average_rating or 0),
-                'total_reviews': freelancer.reviews.count(),
-                'profile_completion': profile_completion,
-                'profile_views': getattr(freelancer, 'profile_views', 0),
-                'is_verified': freelancer.is_profile_verified,
-                'portfolio_items': freelancer.portfolio_items.count(),
-                'certifications': freelancer.certifications.count(),
-            },
-            
-            # Activity stats
-            'activity': {
-                'last_active': freelancer.last_active,
-                'join_date': freelancer.created_at,
-                'days_active': (now - freelancer.created_at).days,
-                'is_available': freelancer.is_available,
-                'availability_status': getattr(freelancer, 'availability_status', 'available'),
-            },
-            
-            # Chart data
-            'charts': {
-                'earnings_data': self._get_earnings_data(freelancer),
-                'task_status_data': self._get_task_status_data(freelancer),
-                'rating_trend': self._get_rating_trend(freelancer),
-            },
-            
-            # Recent activity
-            'recent_activity': self._get_recent_activity(freelancer),
-            
-            # Performance metrics
-            'performance': {
-                'response_time': self._calculate_avg_response_time(freelancer),
-                'project_delivery_time': self._calculate_avg_delivery_time(freelancer),
-                'client_satisfaction': self._calculate_client_satisfaction(freelancer),
-                'repeat_client_rate': self._calculate_repeat_client_rate(freelancer),
-            }
-        }
-        
-        return Response(stats)
 
-    def _calculate_success_rate(self, freelancer):
-        """Calculate success rate based on completed vs cancelled/failed projects"""
-        completed = freelancer.assigned_orders.filter(status='completed').count()
-        cancelled = freelancer.assigned_orders.filter(
-            status__in=['cancelled', 'failed', 'disputed']
-        ).count()
-        total = completed + cancelled
-        
-        if total == 0:
-            return 100  # Default to 100% if no projects
-        
-        return round((completed / total) * 100, 1)
-
-    def _calculate_completion_rate(self, freelancer):
-        """Calculate project completion rate"""
-        total_assigned = freelancer.assigned_orders.count()
-        completed = freelancer.assigned_orders.filter(status='completed').count()
-        
-        if total_assigned == 0:
-            return 100
-        
-        return round((completed / total_assigned) * 100, 1)
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
+        snapshot = dashboard.get_snapshot(freelancer, refresh=refresh)
+        return Response(dashboard.dashboard_payload(freelancer, snapshot))
 
-    def _calculate_average_project_value(self, freelancer):
-        """Calculate average project value"""
-        avg_value = freelancer.assigned_orders.filter(
-            status='completed',
-            bid_amount__isnull=False
-        ).aggregate(
-            avg=Avg('bid_amount')
-        )['avg']
-        
-        return float(avg_value or 0)
+    FULL_PROFILE_SECTIONS = ('payouts', 'tasks', 'settings')
 
-    def _calculate_earnings_growth(self, freelancer):
-        """Calculate earnings growth compared to previous month"""
-        now = timezone.now()
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_month_start = current_month_start - timedelta(days=32)
-        last_month_start = last_month_start.replace(day=1)
-        
-        current_month_earnings = freelancer.assigned_orders.filter(
-            status='completed',
-            completed_at__gte=current_month_start
-        ).aggregate(total=Sum('bid_amount'))['total'] or 0
-        
-        last_month_earnings = freelancer.assigned_orders.filter(
-            status='completed',
-            completed_at__gte=last_month_start,
-            completed_at__lt=current_month_start
-        ).aggregate(total=Sum('bid_amount'))['total'] or 0
-        
-        if last_month_earnings == 0:
-            return 0 if current_month_earnings == 0 else 100
-        
-        growth = ((current_month_earnings - last_month_earnings) / last_month_earnings) * 100
-        return round(growth, 1)
+    def _full_profile_freelancer(self, pk):
+        return Freelancer.objects.select_related(
+            'user',
+            'user__profile',  # Access profile through user
+            'user__profile__payout_setting',  # Access payout_setting through profile
+            'user__profile__balance',  # Materialized payout totals
+        ).get(pk=pk)
 
-    def _get_earnings_data(self, freelancer):
-        """Get earnings data for the last 6 months"""
-        now = timezone.now()
-        months = []
-        
-        for i in range(5, -1, -1):
-            # Calculate month start
-            month_date = now - timedelta(days=30*i)
-            month_start = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            
-            # Calculate next month start
-            if month_start.month == 12:
-                next_month = month_start.replace(year=month_start.year + 1, month=1)
-            else:
-                next_month = month_start.replace(month=month_start.month + 1)
-            
-            earnings = freelancer.assigned_orders.filter(
-                status='completed',
-                completed_at__gte=month_start,
-                completed_at__lt=next_month
-            ).aggregate(
-                total=Sum('bid_amount')
-            )['total'] or 0
-            
-            months.append({
-                'month': month_start.strftime('%b %Y'),
-                'earnings': float(earnings),
-                'projects': freelancer.assigned_orders.filter(
-                    status='completed',
-                    completed_at__gte=month_start,
-                    completed_at__lt=next_month
-                ).count()
-            })
-        
-        return months
-
-    def _get_task_status_data(self, freelancer):
-        """Get task status distribution"""
-        status_counts = freelancer.assigned_orders.values('status').annotate(
-            count=Count('id')
-        )
-        
-        status_map = {
-            'completed': {'name': 'Completed', 'color': '#10b981'},
-            'in_progress': {'name': 'In Progress', 'color': '#3b82f6'},
-            'start_working': {'name': 'To Start', 'color': '#f59e0b'},
-            'assigned': {'name': 'Assigned', 'color': '#8b5cf6'},
-            'on_hold': {'name': 'On Hold', 'color': '#64748b'},
-            'submitted': {'name': 'Submitted', 'color': '#06b6d4'},
-            'under_review': {'name': 'Under Review', 'color': '#84cc16'},
-            'cancelled': {'name': 'Cancelled', 'color': '#ef4444'},
+    def _payouts_page(self, request, partner_profile):
+        """One cursor page of the partner's payouts, newest first."""
+        paginator = ProfilePayoutsPagination()
+        queryset = Payout.objects.none()
+        if partner_profile:
+            queryset = Payout.objects.filter(partner=partner_profile).only(
+                'id', 'amount', 'status', 'payment_method', 'request_date',
+                'processed_date', 'transaction_id', 'note',
+            )
+        payouts = paginator.paginate_queryset(queryset, request)
+        return {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'list': [
+                {
+                    'id': payout.id,
+                    'amount': float(payout.amount),
+                    'status': payout.status,
+                    'payment_method': payout.payment_method,
+                    'request_date': payout.request_date,
+                    'processed_date': payout.processed_date,
+                    'transaction_id': payout.transaction_id,
+                    'note': payout.note,
+                }
+                for payout in payouts
+            ],
         }
-        
-        data = []
-        for item in status_counts:
-            if item['status'] in status_map:
-                data.append({
-                    'name': status_map[item['status']]['name'],
-                    'value': item['count'],
-                    'color': status_map[item['status']]['color']
-                })
-        
-        return data
-
-    def _get_rating_trend(self, freelancer):
-        """Get rating trend over time"""
-        reviews = freelancer.reviews.order_by('created_at')
-        
-        if not reviews.exists():
-            return []
-        
-        trend = []
-        running_total = 0
-        count = 0
-        
-        for review in reviews:
-            count += 1
-            running_total += review.rating
-            avg_rating = running_total / count
-            
-            trend.append({
-                'date': review.created_at.strftime('%b %Y'),
-                'rating': round(avg_rating, 2),
-                'review_count': count
-            })
-        
-        return trend
 
-    def _get_recent_activity(self, freelancer):
-        """Get recent activity for the freelancer"""
-        activities = []
-        
-        # Get recent completed projects
-        completed = freelancer.assigned_orders.filter(
-            status='completed'
-        ).order_by('-completed_at')[:3]
-        
-        for project in completed:
-            activities.append({
-                'id': f"project_{project.id}",
-                'type': 'project_completed',
-                'action': 'Completed project',
-                'title': project.order.title if hasattr(project, 'order') else 'Project',
-                'time': project.completed_at,
-                'time_ago': self._time_ago(project.completed_at),
-                'amount': f"${project.bid_amount}" if project.bid_amount else None,
-                'icon': 'check-circle'
-            })
-        
-        # Get recent reviews
-        reviews = freelancer.reviews.order_by('-created_at')[:3]
-        
-        for review in reviews:
-            activities.append({
-                'id': f"review_{review.id}",
-                'type': 'review_received',
-                'action': 'Received review',
-                'title': f"{review.rating} star review",
-                'time': review.created_at,
-                'time_ago': self._time_ago(review.created_at),
-                'amount': f"{review.rating}/5 stars",
-                'icon': 'star'
-            })
-        
-        # Get recent project assignments
-        assigned = freelancer.assigned_orders.filter(
-            status='assigned'
-        ).order_by('-created_at')[:2]
-        
-        for project in assigned:
-            activities.append({
-                'id': f"assigned_{project.id}",
-                'type': 'project_assigned',
-                'action': 'New project assigned',
-                'title': project.order.title if hasattr(project, 'order') else 'New Project',
-                'time': project.created_at,
-                'time_ago': self._time_ago(project.created_at),
-                'amount': f"${project.bid_amount}" if project.bid_amount else None,
-                'icon': 'briefcase'
-            })
-        
-        # Sort all activities by time (most recent first)
-        activities.sort(key=lambda x: x['time'], reverse=True)
-        
-        return activities[:10]
-
-    def _calculate_avg_response_time(self, freelancer):
-        """Calculate average response time to new projects"""
-        # This would require tracking when projects are posted vs when freelancer responds
-        # For now, return a placeholder or implement based on your bid/message system
-        return "< 2 hours"  # Placeholder
-
-    def _calculate_avg_delivery_time(self, freelancer):
-        """Calculate average project delivery time"""
-        completed_orders = freelancer.assigned_orders.filter(
-            status='completed',
-            started_at__isnull=False,
-            completed_at__isnull=False
-        )
-        
-        if not completed_orders.exists():
-            return 0
-        
-        total_hours = 0
-        count = 0
-        
-        for order in completed_orders:
-            if order.started_at and order.completed_at:
-                duration = order.completed_at - order.started_at
-                total_hours += duration.total_seconds() / 3600
-                count += 1
-        
-        if count == 0:
-            return 0
-        
-        avg_hours = total_hours / count
-        
-        if avg_hours < 24:
-            return f"{round(avg_hours)} hours"
-        else:
-            return f"{round(avg_hours / 24)} days"
-
-    def _calculate_client_satisfaction(self, freelancer):
-        """Calculate overall client satisfaction percentage"""
-        reviews = freelancer.reviews.all()
-        
-        if not reviews.exists():
-            return 100  # Default to 100% if no reviews
-        
-        satisfied_reviews = reviews.filter(rating__gte=4).count()
-        total_reviews = reviews.count()
-        
-        return round((satisfied_reviews / total_reviews) * 100, 1)
-
-    def _calculate_repeat_client_rate(self, freelancer):
-        """Calculate percentage of repeat clients"""
-        orders = freelancer.assigned_orders.all()
-        
-        if not orders.exists():
-            return 0
-        
-        # Count unique clients - adjust based on your actual model structure
-        try:
-            unique_clients = orders.values('client_id').distinct().count()
-        except:
-            # Fallback if client_id doesn't exist - adjust field name as needed
-            unique_clients = orders.count()  # Temporary fallback
-        total_orders = orders.count()
-        
-        if unique_clients == 0:
-            return 0
-        
-        # If we have more orders than unique clients, we have repeat clients
-        repeat_rate = max(0, (total_orders - unique_clients) / total_orders * 100)
-        
-        return round(repeat_rate, 1)
+    def _tasks_page(self, request, freelancer):
+        """One cursor page of the freelancer's completed orders, most recently completed first."""
+        paginator = ProfileTasksPagination()
+        queryset = BaseService.objects.non_polymorphic().filter(
+            assigned_to=freelancer, status='completed',
+        ).annotate(
+            completed_sort=Coalesce('completed_at', 'updated_at'),
+        ).only('id', 'title', 'category', 'status', 'cost', 'bid_amount', 'completed_at', 'updated_at')
+        tasks = paginator.paginate_queryset(queryset, request)
+        return {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'list': [
+                {
+                    'id': task.id,
+                    'title': task.title,
+                    'category': task.category,
+                    'service_type': task.category,
+                    'status': task.status,
+                    'cost': float(task.final_cost) if task.final_cost else None,
+                    'completed_at': task.completed_at,
+                }
+                for task in tasks
+            ],
+        }
 
-    def _time_ago(self, dt):
-        """Convert datetime to time ago string"""
-        if not dt:
-            return "Unknown"
-            
-        now = timezone.now()
-        diff = now - dt
-        
-        if diff.days > 7:
-            return f"{diff.days // 7} weeks ago"
-        elif diff.days > 0:
-            return f"{diff.days} days ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hours ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minutes ago"
-        else:
-            return "Just now"
     @action(detail=True, methods=['get'])
     def full_profile(self, request, pk=None):
-        """Get complete freelancer profile with payouts, tasks, and settings"""
+        """
+        Get freelancer profile with payout and task summaries.
+
+        Sections are only expanded on request: ?include=payouts,tasks,settings.
+        Payouts and tasks come one cursor page at a time (payouts_cursor /
+        tasks_cursor, page_size); the full lists are also served by the
+        full_profile/payouts and full_profile/tasks sub-resources.
+        """
+        include = {
+            section.strip() for section in request.query_params.get('include', '').split(',') if section.strip()
+        }
+        unknown = include - set(self.FULL_PROFILE_SECTIONS)
+        if unknown:
+            return Response(
+                {'error': f"Unknown include: {', '.join(sorted(unknown))}. "
+                          f"Valid values: {', '.join(self.FULL_PROFILE_SECTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
-            # Prefetch related data to optimize queries
-            freelancer = Freelancer.objects.select_related(
-                'user',
-                'user__profile',  # Access profile through user
-                'user__profile__payout_setting'  # Access payout_setting through profile
-            ).prefetch_related(
-                'portfolio_items',
-                'reviews',
-                'certifications',
-                Prefetch(
-                    'user__profile__payouts',  # Access payouts through profile
-                    queryset=Payout.objects.select_related('partner', 'requested_by', 'processed_by')
-                                        .order_by('-request_date')
-                ),
-                Prefetch(
-                    'assigned_orders',
-                    queryset=BaseService.objects.filter(status='completed')
-                                        .order_by('-completed_at')
-                )
-            ).get(pk=pk)
+            freelancer = self._full_profile_freelancer(pk)
         except Freelancer.DoesNotExist:
             return Response(
                 {'error': 'Freelancer not found'},
@@ -920,76 +591,54 @@ class FreelancerViewSet(viewsets.ModelViewSet):
 
         # Get partner profile (could be None if not set up yet)
         partner_profile = getattr(freelancer.user, 'profile', None)
-        
-        # Add payouts data
-        payouts_data = []
-        total_earnings = 0
-        pending_amount = 0
-        
+        payout_setting = getattr(partner_profile, 'payout_setting', None) if partner_profile else None
+
+        # Section totals come from the materialized balance (payouts.ledger) and the
+        # Freelancer counters (uni_services.counters): no extra queries
+        balance = PartnerBalance()
         if partner_profile:
-            payouts = partner_profile.payouts.all()
-            for payout in payouts:
-                payouts_data.append({
-                    'id': payout.id,
-                    'amount': float(payout.amount),
-                    'status': payout.status,
-                    'payment_method': payout.payment_method,
-                    'request_date': payout.request_date,
-                    'processed_date': payout.processed_date,
-                    'transaction_id': payout.transaction_id,
-                    'note': payout.note,
-                })
-            
-            # Calculate total earnings from payouts
-            total_earnings = partner_profile.payouts.filter(status='completed').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            # Calculate pending amount
-            pending_amount = partner_profile.payouts.filter(status='pending').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
+            balance = getattr(partner_profile, 'balance', None) or PartnerBalance(partner=partner_profile)
 
-        # Add completed tasks data
-        completed_tasks = freelancer.assigned_orders.all()
-        tasks_data = []
-        for task in completed_tasks:
-            tasks_data.append({
-                'id': task.id,
-                'title': task.title,
-                'category': task.category,
-                'service_type': task.category,
-                'status': task.status,
-                'cost': float(task.final_cost) if task.final_cost else None,
-                'completed_at': task.completed_at,
-            })
+        def link(name):
+            return request.build_absolute_uri(reverse(f'freelancer-{name}', kwargs={'pk': freelancer.pk}))
 
-        # Add payout settings data
-        payout_settings = {}
-        if partner_profile and hasattr(partner_profile, 'payout_setting'):
-            payout_setting = partner_profile.payout_setting
+        payouts = {
+            'total_count': balance.payout_count,
+            'completed_amount': float(balance.payouts_completed),
+            'pending_amount': float(balance.payouts_pending),
+            'url': link('full-profile-payouts'),
+        }
+        if 'payouts' in include:
+            payouts.update(self._payouts_page(request, partner_profile))
+
+        tasks = {
+            'total_completed': freelancer.total_projects_completed,
+            'url': link('full-profile-tasks'),
+        }
+        if 'tasks' in include:
+            tasks.update(self._tasks_page(request, freelancer))
+
+        if 'settings' in include:
+            payout_settings = {}
+            if payout_setting:
+                payout_settings = {
+                    'payment_method': payout_setting.payment_method,
+                    'payment_details': payout_setting.payment_details,
+                    'minimum_payout_amount': float(payout_setting.minimum_payout_amount),
+                    'auto_payout': payout_setting.auto_payout,
+                    'payout_schedule': payout_setting.payout_schedule,
+                    'updated_at': payout_setting.updated_at,
+                }
+        else:
             payout_settings = {
-                'payment_method': payout_setting.payment_method,
-                'payment_details': payout_setting.payment_details,
-                'minimum_payout_amount': float(payout_setting.minimum_payout_amount),
-                'auto_payout': payout_setting.auto_payout,
-                'payout_schedule': payout_setting.payout_schedule,
-                'updated_at': payout_setting.updated_at,
+                'configured': payout_setting is not None,
+                'url': f"{link('full-profile')}?include=settings",
             }
 
-        # Build response data (moved outside the if block)
         response_data = {
             'freelancer': freelancer_data,
-            'payouts': {
-                'total_count': len(payouts_data),
-                'completed_amount': float(total_earnings),
-                'pending_amount': float(pending_amount),
-                'list': payouts_data,
-            },
-            'tasks': {  
-                'total_completed': completed_tasks.count(),
-                'list': tasks_data,
-            },
+            'payouts': payouts,
+            'tasks': tasks,
             'payout_settings': payout_settings,
             'stats': {
                 'average_rating': freelancer.average_rating,
@@ -1000,6 +649,22 @@ class FreelancerViewSet(viewsets.ModelViewSet):
 
         return Response(response_data)
 
+    @action(detail=True, methods=['get'], url_path='full_profile/payouts', url_name='full-profile-payouts')
+    def full_profile_payouts(self, request, pk=None):
+        """Cursor-paginated payouts of the freelancer (?payouts_cursor=, ?page_size=)"""
+        try:
+            freelancer = Freelancer.objects.select_related('user__profile').get(pk=pk)
+        except Freelancer.DoesNotExist:
+            return Response({'error': 'Freelancer not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._payouts_page(request, getattr(freelancer.user, 'profile', None)))
+
+    @action(detail=True, methods=['get'], url_path='full_profile/tasks', url_name='full-profile-tasks')
+    def full_profile_tasks(self, request, pk=None):
+        """Cursor-paginated completed orders of the freelancer (?tasks_cursor=, ?page_size=)"""
+        if not Freelancer.objects.filter(pk=pk).exists():
+            return Response({'error': 'Freelancer not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._tasks_page(request, pk))
+
 
     @action(detail=True, methods=['post'])
     def update_payout_settings(self, request, pk=None):
@@ -1025,7 +690,13 @@ class FreelancerViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def earnings_report(self, request, pk=None):
-        """Generate earnings report for freelancer (admin only)"""
+        """
+        Earnings report for a freelancer (admin only).
+
+        With ?statement=pdf|csv (and ?period=YYYY-MM, default last month) the
+        monthly statement is rendered in the background instead: the response is
+        the statement record, 202 until its download_url is available.
+        """
         freelancer = self.get_object()
         
         # Get partner profile
@@ -1035,23 +706,46 @@ class FreelancerViewSet(viewsets.ModelViewSet):
                 {'error': 'No partner profile found for this freelancer'},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+        statement_format = request.query_params.get('statement')
+        if statement_format:
+            serializer = PartnerStatementRequestSerializer(data={
+                'format': statement_format,
+                'period': request.query_params.get('period') or f"{statements.previous_month():%Y-%m}",
+            })
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            statement = statements.request_statement(
+                partner_profile, serializer.validated_data['period'], serializer.validated_data['format'],
+                requested_by=request.user,
+            )
+            ready = statement.status == PartnerStatement.Status.READY
+            return Response(
+                PartnerStatementSerializer(statement, context={'request': request}).data,
+                status=status.HTTP_200_OK if ready else status.HTTP_202_ACCEPTED,
+            )
         
         # Generate report data
         earnings = partner_profile.earnings.all()
         payouts = partner_profile.payouts.all()
+        balance = get_balance(partner_profile)
         
         report_data = {
             'partner_id': partner_profile.id,
             'partner_name': partner_profile.name,
-            'total_earnings': earnings.aggregate(Sum('amount'))['amount__sum'] or 0,
-            'total_paid': payouts.filter(status='completed').aggregate(Sum('amount'))['amount__sum'] or 0,
+            'total_earnings': balance.total_earnings,
+            'total_paid': balance.payouts_completed,
             'earnings_by_status': {
-                'available': earnings.filter(status='available').aggregate(Sum('amount'))['amount__sum'] or 0,
-                'processing': earnings.filter(status='processing').aggregate(Sum('amount'))['amount__sum'] or 0,
-                'paid': earnings.filter(status='paid').aggregate(Sum('amount'))['amount__sum'] or 0,
+                'available': balance.available,
+                'processing': balance.processing,
+                'paid': balance.paid,
             },
-            'recent_earnings': earnings.order_by('-created_at')[:10].values(),
-            'recent_payouts': payouts.order_by('-request_date')[:10].values(),
+            'recent_earnings': earnings.order_by('-created_at')[:10].values(
+                'id', 'date', 'amount', 'source', 'status', 'paid_date', 'created_at'
+            ),
+            'recent_payouts': payouts.order_by('-request_date')[:10].values(
+                'id', 'amount', 'status', 'payment_method', 'request_date', 'processed_date', 'transaction_id'
+            ),
         }
         
         return Response(report_data)
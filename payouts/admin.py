@@ -3,7 +3,9 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from .models import Payout, PayoutTimeline, PayoutSetting, Earnings
+from .batch import run_payout_batch
+from .models import Payout, PayoutBatch, PayoutTimeline, PayoutSetting, Earnings, PartnerBalance, LedgerEntry, PartnerStatement
+from .services import PayoutSettlement
 
 
 class PayoutTimelineInline(admin.TabularInline):
@@ -91,21 +93,21 @@ class PayoutAdmin(admin.ModelAdmin):
     actions_column.allow_tags = True
 
     def process_payouts(self, request, queryset):
-        for payout in queryset.filter(status=Payout.Status.PENDING):
-            payout.process(request.user)
-        self.message_user(request, f"Processed {queryset.count()} payouts")
+        processed = PayoutSettlement.process(queryset.values_list('pk', flat=True), user=request.user)
+        self.message_user(request, f"Processed {len(processed)} payouts")
     process_payouts.short_description = "Mark selected payouts as processing"
 
     def complete_payouts(self, request, queryset):
-        for payout in queryset.filter(status=Payout.Status.PROCESSING):
-            payout.complete(user=request.user)
-        self.message_user(request, f"Completed {queryset.count()} payouts")
+        completed = PayoutSettlement.complete(
+            queryset.filter(status=Payout.Status.PROCESSING).values_list('pk', flat=True),
+            user=request.user,
+        )
+        self.message_user(request, f"Completed {len(completed)} payouts")
     complete_payouts.short_description = "Mark selected payouts as completed"
 
     def cancel_payouts(self, request, queryset):
-        for payout in queryset.filter(status__in=[Payout.Status.PENDING, Payout.Status.PROCESSING]):
-            payout.cancel(user=request.user)
-        self.message_user(request, f"Cancelled {queryset.count()} payouts")
+        cancelled = PayoutSettlement.cancel(queryset.values_list('pk', flat=True), user=request.user)
+        self.message_user(request, f"Cancelled {len(cancelled)} payouts")
     cancel_payouts.short_description = "Cancel selected payouts"
 
     def get_urls(self):
@@ -166,6 +168,7 @@ class PayoutSettingAdmin(admin.ModelAdmin):
     list_filter = ('payment_method', 'auto_payout', 'payout_schedule')
     search_fields = ('partner__name',)
     readonly_fields = ('updated_at',)
+    actions = ['run_payout_batch_for_selected']
 
     def partner_link(self, obj):
         url = reverse('admin:authentication_profile_change', args=[obj.partner.id])
@@ -178,6 +181,74 @@ class PayoutSettingAdmin(admin.ModelAdmin):
             return self.readonly_fields + ('partner',)
         return self.readonly_fields
 
+    def run_payout_batch_for_selected(self, request, queryset):
+        schedules = sorted(set(queryset.values_list('payout_schedule', flat=True)))
+        batch = run_payout_batch(
+            schedules,
+            partner_ids=queryset.values_list('partner_id', flat=True),
+            user=request.user,
+        )
+        self.message_user(
+            request,
+            f"Payout batch #{batch.pk}: {batch.payouts_created} payouts created "
+            f"for {batch.total_amount} ({batch.partners_scanned} partners scanned)"
+        )
+    run_payout_batch_for_selected.short_description = "Run payout batch for selected auto-payout partners"
+
+
+@admin.register(PayoutBatch)
+class PayoutBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'schedules', 'partners_scanned', 'payouts_created', 'total_amount', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = (
+        'schedules', 'status', 'cursor', 'partners_scanned', 'payouts_created',
+        'total_amount', 'report', 'started_at', 'finished_at', 'created_by',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PartnerBalance)
+class PartnerBalanceAdmin(admin.ModelAdmin):
+    list_display = ('partner', 'available', 'pending_approval', 'processing', 'paid', 'payouts_pending', 'payouts_completed', 'updated_at')
+    search_fields = ('partner__user__email',)
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'partner', 'entry_type', 'amount', 'from_bucket', 'to_bucket', 'item_count', 'payout', 'created_at')
+    list_filter = ('entry_type', 'created_at')
+    search_fields = ('partner__user__email', 'payout__id', 'memo')
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PartnerStatement)
+class PartnerStatementAdmin(admin.ModelAdmin):
+    list_display = ('partner', 'period', 'format', 'status', 'created_at', 'completed_at')
+    list_filter = ('status', 'format', 'period')
+    search_fields = ('partner__user__email', 'content_hash')
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
 
 @admin.register(Earnings)
 class EarningsAdmin(admin.ModelAdmin):
@@ -0,0 +1,226 @@
+"""
+Scheduled payout engine driven by PayoutSetting (auto_payout / payout_schedule /
+minimum_payout_amount).
+
+Partners are walked in partner_id order, one chunk per transaction:
+  1. one query returns each setting in the chunk annotated with the partner's
+     unlinked AVAILABLE balance (grouped Sum subquery);
+  2. eligible partners get Payout rows via bulk_create;
+  3. one UPDATE links their AVAILABLE earnings and moves them to PROCESSING;
+  4. one UPDATE re-derives each payout amount from the rows actually linked;
+  5. timeline entries and ledger movements are bulk-created and the batch cursor advances.
+
+A crash rolls back the current chunk only; resuming the batch continues after
+`PayoutBatch.cursor`, so no partner is paid twice.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Case, CharField, DecimalField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import ledger
+from .models import Earnings, Payout, PayoutBatch, PayoutSetting, PayoutTimeline
+
+DEFAULT_CHUNK_SIZE = 1000
+SCHEDULED = ['weekly', 'biweekly', 'monthly', 'quarterly']
+
+
+def due_schedules(today: date | None = None) -> list[str]:
+    """Schedules that fall due on ``today``: weeks start Monday, months/quarters on day 1."""
+
+    today = today or timezone.localdate()
+    due = []
+    if today.weekday() == 0:
+        due.append('weekly')
+        if today.isocalendar()[1] % 2 == 0:
+            due.append('biweekly')
+    if today.day == 1:
+        due.append('monthly')
+        if today.month in (1, 4, 7, 10):
+            due.append('quarterly')
+    return due
+
+
+def _eligible_chunk(schedules, cursor, chunk_size, partner_ids=None):
+    available = (
+        Earnings.objects.filter(
+            partner_id=OuterRef('partner_id'),
+            status=Earnings.Status.AVAILABLE,
+            payout__isnull=True,
+        )
+        .values('partner_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    settings_qs = PayoutSetting.objects.filter(auto_payout=True, partner_id__gt=cursor)
+    if schedules is not None:
+        settings_qs = settings_qs.filter(payout_schedule__in=schedules)
+    if partner_ids is not None:
+        settings_qs = settings_qs.filter(partner_id__in=partner_ids)
+    return list(
+        settings_qs.annotate(
+            available=Coalesce(
+                Subquery(available, output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+        )
+        .order_by('partner_id')
+        .values('partner_id', 'payment_method', 'payment_details', 'minimum_payout_amount', 'available')[:chunk_size]
+    )
+
+
+def _process_chunk(batch, rows, note, dry_run=False):
+    eligible = [
+        r for r in rows
+        if r['available'] > 0 and r['available'] >= (r['minimum_payout_amount'] or 0)
+    ]
+    stats = {
+        'scanned': len(rows),
+        'eligible': len(eligible),
+        'below_minimum': len(rows) - len(eligible),
+        'amount': sum((r['available'] for r in eligible), Decimal('0')),
+        'by_payment_method': {},
+    }
+    for r in eligible:
+        method = stats['by_payment_method'].setdefault(r['payment_method'], {'count': 0, 'amount': Decimal('0')})
+        method['count'] += 1
+        method['amount'] += r['available']
+    if dry_run or not eligible:
+        return stats
+
+    payouts = [
+        Payout(
+            id=f"PY-{uuid.uuid4().hex[:8].upper()}",
+            partner_id=r['partner_id'],
+            amount=r['available'],
+            payment_method=r['payment_method'],
+            payment_details=r['payment_details'] or {},
+            status=Payout.Status.PENDING,
+            note=note,
+            batch=batch,
+        )
+        for r in eligible
+    ]
+    Payout.objects.bulk_create(payouts)
+    payout_for_partner = {p.partner_id: p.pk for p in payouts}
+    payout_ids = list(payout_for_partner.values())
+
+    now = timezone.now()
+    to_link = Earnings.objects.filter(
+        partner_id__in=list(payout_for_partner),
+        status=Earnings.Status.AVAILABLE,
+        payout__isnull=True,
+    )
+    ledger.post(ledger.earnings_movements(
+        to_link, Earnings.Status.PROCESSING, payout_for_partner=payout_for_partner,
+        memo=f"Reserved by payout batch #{batch.pk}",
+    ))
+    to_link.update(
+        status=Earnings.Status.PROCESSING,
+        updated_at=now,
+        payout_id=Case(
+            *[When(partner_id=partner_id, then=Value(pk)) for partner_id, pk in payout_for_partner.items()],
+            output_field=CharField(),
+        ),
+    )
+
+    # Earnings may have landed between the aggregate and the UPDATE; pay what was linked.
+    linked_total = (
+        Earnings.objects.filter(payout_id=OuterRef('pk'))
+        .values('payout_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    Payout.objects.filter(pk__in=payout_ids).update(
+        amount=Coalesce(
+            Subquery(linked_total, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        updated_at=now,
+    )
+    created = Payout.objects.filter(pk__in=payout_ids)
+    ledger.post(ledger.payout_movements(
+        created, Payout.Status.PENDING, created=True, memo=f"Created by payout batch #{batch.pk}",
+    ))
+    stats['amount'] = created.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+    PayoutTimeline.objects.bulk_create([
+        PayoutTimeline(payout_id=pk, status=Payout.Status.PENDING, note=f"Created by payout batch #{batch.pk}")
+        for pk in payout_ids
+    ])
+    return stats
+
+
+def _merge_report(report, stats):
+    report['chunks'] = report.get('chunks', 0) + 1
+    report['below_minimum'] = report.get('below_minimum', 0) + stats['below_minimum']
+    methods = report.setdefault('by_payment_method', {})
+    for method, values in stats['by_payment_method'].items():
+        entry = methods.setdefault(method, {'count': 0, 'amount': '0'})
+        entry['count'] += values['count']
+        entry['amount'] = str(Decimal(entry['amount']) + values['amount'])
+    return report
+
+
+def run_payout_batch(
+    schedules: Iterable[str] | None = None,
+    *,
+    batch: PayoutBatch | None = None,
+    partner_ids: Iterable[int] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_chunks: int | None = None,
+    dry_run: bool = False,
+    user=None,
+) -> PayoutBatch:
+    """
+    Create pending payouts for every auto-payout partner on ``schedules`` whose available
+    balance reaches their minimum. Pass ``batch`` to resume an interrupted run and
+    ``max_chunks`` to bound a single invocation. With ``dry_run`` nothing is written and an
+    unsaved PayoutBatch carrying the report is returned.
+    """
+
+    if batch is None:
+        schedules = list(schedules) if schedules is not None else due_schedules()
+        batch = PayoutBatch(schedules=schedules, created_by=user)
+        if not dry_run:
+            batch.save()
+    schedules = batch.schedules
+    partner_ids = list(partner_ids) if partner_ids is not None else None
+    note = f"Scheduled payout ({', '.join(schedules) or 'manual'})"
+
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        with transaction.atomic():
+            if not dry_run:
+                # Serialise concurrent runners of the same batch.
+                batch = PayoutBatch.objects.select_for_update().get(pk=batch.pk)
+                if batch.status != PayoutBatch.Status.RUNNING:
+                    break
+            rows = _eligible_chunk(schedules, batch.cursor, chunk_size, partner_ids)
+            if not rows:
+                batch.status = PayoutBatch.Status.COMPLETED
+                batch.finished_at = timezone.now()
+                if not dry_run:
+                    batch.save(update_fields=['status', 'finished_at'])
+                break
+
+            stats = _process_chunk(batch, rows, note, dry_run=dry_run)
+            batch.cursor = rows[-1]['partner_id']
+            batch.partners_scanned += stats['scanned']
+            batch.payouts_created += stats['eligible']
+            batch.total_amount += stats['amount']
+            batch.report = _merge_report(batch.report or {}, stats)
+            if not dry_run:
+                batch.save(update_fields=['cursor', 'partners_scanned', 'payouts_created', 'total_amount', 'report'])
+        chunks += 1
+    return batch
@@ -0,0 +1,323 @@
+"""
+Concurrent disbursement of PROCESSING payouts through per-method provider adapters.
+
+PaymentProcessor.process_payment moves a payout to PROCESSING; the worker below
+then claims such payouts in batches and sends them to the provider configured for
+their payment method in ``settings.PAYOUT_DISBURSEMENT['PROVIDERS']``:
+
+  - every method gets its own thread pool (MAX_CONCURRENCY) and token bucket
+    (RATE_PER_SECOND / BURST), so a slow or throttled provider cannot starve the others;
+  - claims take a lease (``Payout.disbursement_lease_until``) with SKIP LOCKED where the
+    database supports it, so several workers can run side by side;
+  - every request carries the idempotency key ``payout:<id>``; a payout re-sent after a
+    crash or an expired lease is deduplicated by the provider;
+  - transient errors push the lease out with exponential backoff and jitter, up to
+    MAX_ATTEMPTS; permanent errors (or exhausted retries) fail the payout, which
+    releases its earnings through PayoutSettlement.
+
+Methods without a configured provider are left alone (completed manually as before).
+MockDisbursementProvider simulates latency and failures for throughput tests against a scratch database.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .exceptions import PermanentDisbursementError, TransientDisbursementError
+from .models import Payout
+from .services import PayoutSettlement
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PROVIDERS': {},
+    'BATCH_SIZE': 100,
+    'LEASE_SECONDS': 5 * 60,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE_SECONDS': 2,
+    'BACKOFF_MAX_SECONDS': 15 * 60,
+}
+PROVIDER_DEFAULTS = {
+    'ADAPTER': 'payouts.disbursement.MockDisbursementProvider',
+    'RATE_PER_SECOND': 5,
+    'BURST': 5,
+    'MAX_CONCURRENCY': 4,
+    'OPTIONS': {},
+}
+
+
+def disbursement_setting(name):
+    return getattr(settings, 'PAYOUT_DISBURSEMENT', {}).get(name, DEFAULTS[name])
+
+
+def idempotency_key(payout_id) -> str:
+    return f"payout:{payout_id}"
+
+
+@dataclass(frozen=True)
+class DisbursementRequest:
+    payout_id: str
+    partner_id: int
+    amount: Decimal
+    payment_method: str
+    payment_details: dict
+    attempt: int
+
+    @property
+    def idempotency_key(self) -> str:
+        return idempotency_key(self.payout_id)
+
+
+@dataclass(frozen=True)
+class DisbursementResult:
+    transaction_id: str
+
+
+@dataclass
+class DisbursementStats:
+    claimed: int = 0
+    completed: int = 0
+    failed: int = 0
+    retried: int = 0
+    elapsed: float = 0.0
+
+    def merge(self, other: 'DisbursementStats') -> None:
+        self.claimed += other.claimed
+        self.completed += other.completed
+        self.failed += other.failed
+        self.retried += other.retried
+        self.elapsed += other.elapsed
+
+
+# -- Providers -----------------------------------------------------------------
+
+class BaseDisbursementProvider:
+    """
+    Adapter for one payment provider. ``disburse`` must be safe to call again with the
+    same ``request.idempotency_key`` and raise TransientDisbursementError /
+    PermanentDisbursementError on failure.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def disburse(self, request: DisbursementRequest) -> DisbursementResult:
+        raise NotImplementedError
+
+
+class MockDisbursementProvider(BaseDisbursementProvider):
+    """Local stand-in that sleeps for a random latency and fails at the configured rates."""
+
+    def __init__(self, latency=(0.05, 0.3), transient_failure_rate=0.05,
+                 permanent_failure_rate=0.01, seed=None, **options):
+        super().__init__(**options)
+        self.latency = tuple(latency)
+        self.transient_failure_rate = transient_failure_rate
+        self.permanent_failure_rate = permanent_failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sent: dict[str, str] = {}
+
+    def disburse(self, request):
+        with self._lock:
+            # Real providers answer a repeated idempotency key with the original result.
+            if request.idempotency_key in self._sent:
+                return DisbursementResult(self._sent[request.idempotency_key])
+            delay = self._random.uniform(*self.latency)
+            roll = self._random.random()
+        time.sleep(delay)
+        if roll < self.permanent_failure_rate:
+            raise PermanentDisbursementError(f"mock {request.payment_method}: account rejected")
+        if roll < self.permanent_failure_rate + self.transient_failure_rate:
+            raise TransientDisbursementError(f"mock {request.payment_method}: timeout")
+        transaction_id = f"MOCK-{request.payment_method.upper()}-{request.payout_id}"
+        with self._lock:
+            self._sent[request.idempotency_key] = transaction_id
+        return DisbursementResult(transaction_id)
+
+
+# -- Limits --------------------------------------------------------------------
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = max(int(burst), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class MethodLane:
+    """Provider, rate limiter and bounded thread pool for one payment method."""
+
+    def __init__(self, method: str, config: dict, provider: BaseDisbursementProvider | None = None):
+        config = {**PROVIDER_DEFAULTS, **config}
+        self.method = method
+        self.provider = provider or import_string(config['ADAPTER'])(**config['OPTIONS'])
+        self.limiter = TokenBucket(config['RATE_PER_SECOND'], config['BURST'])
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(int(config['MAX_CONCURRENCY']), 1),
+            thread_name_prefix=f"disburse-{method}",
+        )
+
+
+# -- Worker --------------------------------------------------------------------
+
+class DisbursementWorker:
+    def __init__(self, providers: dict | None = None, *, batch_size: int | None = None,
+                 max_attempts: int | None = None, lease_seconds: int | None = None):
+        providers = disbursement_setting('PROVIDERS') if providers is None else providers
+        self.lanes = {}
+        for method, config in providers.items():
+            if isinstance(config, BaseDisbursementProvider):
+                self.lanes[method] = MethodLane(method, {}, provider=config)
+            else:
+                self.lanes[method] = MethodLane(method, config)
+        self.batch_size = batch_size or disbursement_setting('BATCH_SIZE')
+        self.max_attempts = max_attempts or disbursement_setting('MAX_ATTEMPTS')
+        self.lease_seconds = lease_seconds or disbursement_setting('LEASE_SECONDS')
+
+    def backoff(self, attempt: int) -> float:
+        base = disbursement_setting('BACKOFF_BASE_SECONDS')
+        ceiling = disbursement_setting('BACKOFF_MAX_SECONDS')
+        return random.uniform(0.5, 1.0) * min(ceiling, base * 2 ** max(attempt - 1, 0))
+
+    def claim(self) -> list[DisbursementRequest]:
+        """Lease up to batch_size due PROCESSING payouts for the configured methods."""
+        if not self.lanes:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            due = (
+                Payout.objects.filter(status=Payout.Status.PROCESSING, payment_method__in=list(self.lanes))
+                .filter(Q(disbursement_lease_until__isnull=True) | Q(disbursement_lease_until__lte=now))
+                .order_by('request_date')
+                .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            )
+            rows = list(due.values_list(
+                'pk', 'partner_id', 'amount', 'payment_method', 'payment_details', 'disbursement_attempts',
+            )[:self.batch_size])
+            if not rows:
+                return []
+            Payout.objects.filter(pk__in=[r[0] for r in rows]).update(
+                disbursement_lease_until=now + timedelta(seconds=self.lease_seconds),
+                disbursement_attempts=F('disbursement_attempts') + 1,
+            )
+        return [
+            DisbursementRequest(pk, partner_id, amount, method, details or {}, attempts + 1)
+            for pk, partner_id, amount, method, details, attempts in rows
+        ]
+
+    @staticmethod
+    def _send(lane: MethodLane, request: DisbursementRequest):
+        """Runs on the lane's pool: provider I/O only, no database access."""
+        lane.limiter.acquire()
+        try:
+            return 'completed', lane.provider.disburse(request)
+        except PermanentDisbursementError as e:
+            return 'failed', str(e)
+        except Exception as e:
+            return 'retried', str(e)
+
+    def _record(self, request, outcome, payload) -> str:
+        if outcome == 'completed':
+            return self._record_success(request, payload)
+        if outcome == 'failed':
+            return self._record_failure(request, payload)
+        return self._record_retry(request, payload)
+
+    def _record_success(self, request, result):
+        if not PayoutSettlement.complete([request.payout_id], transaction_id=result.transaction_id):
+            logger.warning(f"Payout {request.payout_id} was disbursed ({result.transaction_id}) "
+                           f"but is no longer open; needs manual review")
+        Payout.objects.filter(pk=request.payout_id).update(disbursement_lease_until=None)
+        return 'completed'
+
+    def _record_failure(self, request, error):
+        logger.error(f"Disbursement of payout {request.payout_id} failed: {error}")
+        PayoutSettlement.fail([request.payout_id], f"Disbursement failed: {error}")
+        Payout.objects.filter(pk=request.payout_id).update(disbursement_lease_until=None)
+        return 'failed'
+
+    def _record_retry(self, request, error):
+        if request.attempt >= self.max_attempts:
+            return self._record_failure(request, f"gave up after {request.attempt} attempts: {error}")
+        delay = self.backoff(request.attempt)
+        logger.warning(f"Disbursement of payout {request.payout_id} attempt {request.attempt} "
+                       f"failed ({error}); retrying in {delay:.1f}s")
+        Payout.objects.filter(pk=request.payout_id, status=Payout.Status.PROCESSING).update(
+            disbursement_lease_until=timezone.now() + timedelta(seconds=delay),
+        )
+        return 'retried'
+
+    def run_once(self) -> DisbursementStats:
+        """Claim one batch and dispatch it across the method lanes; blocks until done."""
+        started = time.monotonic()
+        requests = self.claim()
+        stats = DisbursementStats(claimed=len(requests))
+        futures = {
+            self.lanes[request.payment_method].executor.submit(
+                self._send, self.lanes[request.payment_method], request,
+            ): request
+            for request in requests
+        }
+        # Outcomes are written from this thread as they arrive, so the pools never
+        # hold database connections.
+        for future in as_completed(futures):
+            request = futures[future]
+            try:
+                outcome = self._record(request, *future.result())
+            except Exception:
+                # The lease expires and the payout is re-sent under the same idempotency key.
+                logger.exception(f"Recording the disbursement outcome of payout {request.payout_id} failed")
+                continue
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+        stats.elapsed = time.monotonic() - started
+        return stats
+
+    def run(self, *, poll_interval: float = 5.0, max_batches: int | None = None,
+            stop_event: threading.Event | None = None) -> DisbursementStats:
+        """Loop over run_once, sleeping ``poll_interval`` whenever nothing was due."""
+        total = DisbursementStats()
+        batches = 0
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set() and (max_batches is None or batches < max_batches):
+            stats = self.run_once()
+            total.merge(stats)
+            batches += 1
+            if not stats.claimed:
+                stop_event.wait(poll_interval)
+        return total
+
+    def shutdown(self) -> None:
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=True)
@@ -2,4 +2,13 @@
 
 class PaymentProcessingError(Exception):
     """Exception raised for errors in the payment processing."""
-    pass
\ No newline at end of file
+    pass
+
+class TransientDisbursementError(PaymentProcessingError):
+    """Provider call failed in a way that may succeed if retried (timeouts, 5xx, throttling)."""
+    pass
+
+
+class PermanentDisbursementError(PaymentProcessingError):
+    """Provider rejected the disbursement; retrying will not help (bad account, compliance)."""
+    pass
@@ -0,0 +1,216 @@
+"""
+Bulk earnings ingestion (CSV / JSON) for referral campaigns and back-office imports.
+
+Rows are validated in Python, partners are resolved with one query per lookup
+kind (profile id, user email), initial statuses follow Earnings.initial_status_for
+and inserts go through bulk_create in chunks inside one transaction. bulk_create
+skips Earnings.save, so the matching ledger credits are posted here, one per
+partner and status.
+
+Accepted columns: partner_id or partner_email, amount, date (YYYY-MM-DD, defaults
+to today), source, notes, client_name (referral rows only, recorded in notes).
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from authentication.models import Profile
+
+from . import ledger
+from .models import Earnings
+
+DEFAULT_CHUNK_SIZE = 2000
+LOOKUP_BATCH_SIZE = 5000
+MAX_AMOUNT = Decimal('99999999.99')  # Earnings.amount is max_digits=10, decimal_places=2
+
+
+@dataclass
+class IngestResult:
+    total: int = 0
+    created: int = 0
+    errors: list[dict] = field(default_factory=list)
+    by_status: dict[str, int] = field(default_factory=dict)
+    dry_run: bool = False
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': len(self.errors),
+            'by_status': self.by_status,
+            'dry_run': self.dry_run,
+            'errors': self.errors,
+        }
+
+
+def parse_rows(content, fmt: str) -> list[dict]:
+    """Rows from CSV text or a JSON list (or {"rows": [...]}). Raises ValueError on malformed input."""
+
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if fmt == 'csv':
+        return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+    if fmt == 'json':
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get('rows')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise ValueError("JSON input must be a list of objects or {\"rows\": [...]}")
+        return data
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in ('', None) else value
+
+
+def _validate_row(row, today):
+    """Field-level checks that need no database access; returns (cleaned, errors)."""
+
+    errors = {}
+    cleaned = {}
+
+    partner_id, partner_email = _clean(row.get('partner_id')), _clean(row.get('partner_email'))
+    if partner_id is not None:
+        try:
+            cleaned['partner_id'] = int(partner_id)
+        except (TypeError, ValueError):
+            errors['partner_id'] = 'Must be an integer.'
+    elif partner_email is not None:
+        cleaned['partner_email'] = str(partner_email).lower()
+    else:
+        errors['partner'] = 'partner_id or partner_email is required.'
+
+    try:
+        amount = Decimal(str(_clean(row.get('amount'))))
+        if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT or amount.as_tuple().exponent < -2:
+            raise InvalidOperation
+        cleaned['amount'] = amount
+    except (InvalidOperation, ValueError):
+        errors['amount'] = 'Must be a positive amount with at most 2 decimal places.'
+
+    raw_date = _clean(row.get('date'))
+    if raw_date is None:
+        cleaned['date'] = today
+    else:
+        try:
+            cleaned['date'] = parse_date(str(raw_date))
+        except ValueError:
+            cleaned['date'] = None
+        if cleaned['date'] is None:
+            errors['date'] = 'Must be a date in YYYY-MM-DD format.'
+
+    source = _clean(row.get('source')) or Earnings.Source.REFERRAL
+    if source not in Earnings.Source.values:
+        errors['source'] = f"Must be one of: {', '.join(Earnings.Source.values)}."
+    cleaned['source'] = source
+
+    notes = _clean(row.get('notes'))
+    client_name = _clean(row.get('client_name'))
+    if source == Earnings.Source.REFERRAL and not notes:
+        notes = f"Earnings from referral: {client_name or 'Unknown client'}"
+    cleaned['notes'] = notes
+    return cleaned, errors
+
+
+def _resolve_partners(cleaned_rows):
+    """Set-based lookups (batched IN lists): existing profile ids and profile ids by user email."""
+
+    ids = list({r['partner_id'] for r in cleaned_rows if 'partner_id' in r})
+    emails = list({r['partner_email'] for r in cleaned_rows if 'partner_email' in r})
+    known_ids, by_email = set(), {}
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + LOOKUP_BATCH_SIZE]
+        known_ids.update(Profile.objects.filter(pk__in=batch).values_list('pk', flat=True))
+    for start in range(0, len(emails), LOOKUP_BATCH_SIZE):
+        batch = emails[start:start + LOOKUP_BATCH_SIZE]
+        by_email.update(
+            Profile.objects.annotate(email_lower=Lower('user__email'))
+            .filter(email_lower__in=batch)
+            .values_list('email_lower', 'pk')
+        )
+    return known_ids, by_email
+
+
+def ingest_earnings(rows, *, created_by=None, partial=False, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE) -> IngestResult:
+    """
+    Validate and insert earnings rows. Without ``partial`` any row error aborts the
+    whole import (nothing is written); with it, valid rows are inserted and the
+    invalid ones reported. Errors are reported per 1-based row number.
+    """
+
+    result = IngestResult(total=len(rows), dry_run=dry_run)
+    today = timezone.localdate()
+
+    validated = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            result.errors.append({'row': number, 'errors': {'row': 'Must be an object.'}})
+            continue
+        cleaned, errors = _validate_row(row, today)
+        validated.append((number, cleaned, errors))
+
+    known_ids, by_email = _resolve_partners([c for _, c, e in validated if not e.get('partner')])
+
+    to_create = []
+    for number, cleaned, errors in validated:
+        if 'partner_email' in cleaned:
+            cleaned['partner_id'] = by_email.get(cleaned.pop('partner_email'))
+            if cleaned['partner_id'] is None:
+                errors['partner_email'] = 'No partner profile for this email.'
+        elif 'partner_id' in cleaned and cleaned['partner_id'] not in known_ids:
+            errors['partner_id'] = 'Partner profile does not exist.'
+        if errors:
+            result.errors.append({'row': number, 'errors': errors})
+            continue
+        to_create.append(Earnings(
+            partner_id=cleaned['partner_id'],
+            created_by=created_by,
+            amount=cleaned['amount'],
+            date=cleaned['date'],
+            source=cleaned['source'],
+            status=Earnings.initial_status_for(cleaned['source']),
+            notes=cleaned['notes'],
+        ))
+    result.errors.sort(key=lambda e: e['row'])
+
+    by_status = defaultdict(int)
+    for earning in to_create:
+        by_status[str(earning.status)] += 1
+    result.by_status = dict(by_status)
+
+    if dry_run or not to_create or (result.errors and not partial):
+        return result
+
+    totals = defaultdict(lambda: [Decimal('0'), 0, None])
+    for earning in to_create:
+        entry = totals[(earning.partner_id, earning.status)]
+        entry[0] += earning.amount
+        entry[1] += 1
+        entry[2] = earning.date if entry[2] is None else min(entry[2], earning.date)
+
+    with transaction.atomic():
+        for start in range(0, len(to_create), chunk_size):
+            chunk = to_create[start:start + chunk_size]
+            Earnings.objects.bulk_create(chunk)
+            result.created += len(chunk)
+        # One aggregated credit per partner and status for the whole import.
+        ledger.post([
+            ledger.Movement(partner_id, amount, to_bucket=ledger.earning_bucket(status_),
+                            item_count=count, memo='Bulk earnings import', period_date=first_date)
+            for (partner_id, status_), (amount, count, first_date) in totals.items()
+        ])
+    return result
@@ -0,0 +1,240 @@
+"""
+Append-only partner ledger and the materialized PartnerBalance it feeds.
+
+Every code path that changes an Earnings or Payout status (or amount) posts the
+matching movements here *inside its own transaction*, before or after its UPDATE:
+
+  - earning created / approved          -> credit   (into pending/available)
+  - earnings reserved, processed, paid  -> debit    (available -> processing -> paid)
+  - payout created / processed / done   -> debit    (payouts_pending -> ... -> payouts_completed)
+  - payout cancelled / failed, earning
+    released, rejected or cancelled     -> reversal
+
+``post()`` writes the LedgerEntry rows with one bulk_create and applies the net
+per-partner deltas to PartnerBalance with one UPDATE, so set-based transitions
+stay set-based. Balances are therefore single-row reads; ``reconcile_partner_balances``
+checks them against the ledger and against raw Earnings/Payout sums.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Min, Sum, Value, When
+from django.utils import timezone
+
+from . import period_stats
+from .models import Earnings, LedgerEntry, PartnerBalance, Payout
+from .signals import ledger_posted
+
+EARNING_BUCKETS = {status: status for status in Earnings.Status.values}
+PAYOUT_BUCKETS = {
+    Payout.Status.PENDING: 'payouts_pending',
+    Payout.Status.PROCESSING: 'payouts_processing',
+    Payout.Status.COMPLETED: 'payouts_completed',
+}
+AMOUNT_FIELDS = list(EARNING_BUCKETS.values()) + list(PAYOUT_BUCKETS.values())
+
+# Progression order inside each family of buckets; moving backwards is a reversal.
+_EARNING_ORDER = {
+    Earnings.Status.PENDING: 1,
+    Earnings.Status.PENDING_APPROVAL: 1,
+    Earnings.Status.AVAILABLE: 2,
+    Earnings.Status.PROCESSING: 3,
+    Earnings.Status.PAID: 4,
+    Earnings.Status.CANCELLED: 0,
+    Earnings.Status.REJECTED: 0,
+}
+_PAYOUT_ORDER = {'payouts_pending': 1, 'payouts_processing': 2, 'payouts_completed': 3}
+
+
+def earning_bucket(status) -> str:
+    return EARNING_BUCKETS.get(status, '')
+
+
+def payout_bucket(status) -> str:
+    """Cancelled and failed payouts leave the balance."""
+    return PAYOUT_BUCKETS.get(status, '')
+
+
+@dataclass(frozen=True)
+class Movement:
+    partner_id: int
+    amount: Decimal
+    from_bucket: str = ''
+    to_bucket: str = ''
+    item_count: int = 1
+    payout_count_delta: int = 0
+    earning_id: int | None = None
+    payout_id: str | None = None
+    memo: str = ''
+    # Earliest Earnings.date / Payout.request_date involved, for period_stats invalidation.
+    period_date: date | datetime | None = None
+
+
+def entry_type_for(from_bucket: str, to_bucket: str) -> str:
+    is_payout = (from_bucket or to_bucket).startswith('payouts_')
+    if not from_bucket:
+        return LedgerEntry.EntryType.DEBIT if is_payout else LedgerEntry.EntryType.CREDIT
+    order = _PAYOUT_ORDER if is_payout else _EARNING_ORDER
+    if not to_bucket or order.get(to_bucket, 0) <= order.get(from_bucket, 0):
+        return LedgerEntry.EntryType.REVERSAL
+    if to_bucket == Earnings.Status.AVAILABLE:
+        return LedgerEntry.EntryType.CREDIT
+    return LedgerEntry.EntryType.DEBIT
+
+
+def post(movements: Iterable[Movement], entry_type: str | None = None) -> list[LedgerEntry]:
+    """Append ``movements`` to the ledger and apply them to PartnerBalance atomically."""
+
+    movements = [
+        m for m in movements
+        if (m.from_bucket != m.to_bucket and m.amount) or m.payout_count_delta
+    ]
+    if not movements:
+        return []
+
+    deltas: dict[int, dict[str, Decimal | int]] = defaultdict(lambda: defaultdict(Decimal))
+    entries = []
+    for m in movements:
+        if m.from_bucket:
+            deltas[m.partner_id][m.from_bucket] -= m.amount
+        if m.to_bucket:
+            deltas[m.partner_id][m.to_bucket] += m.amount
+        if m.payout_count_delta:
+            deltas[m.partner_id]['payout_count'] += m.payout_count_delta
+        entries.append(LedgerEntry(
+            partner_id=m.partner_id,
+            entry_type=entry_type or entry_type_for(m.from_bucket, m.to_bucket),
+            amount=m.amount,
+            from_bucket=m.from_bucket,
+            to_bucket=m.to_bucket,
+            item_count=m.item_count,
+            payout_count_delta=m.payout_count_delta,
+            earning_id=m.earning_id,
+            payout_id=m.payout_id,
+            memo=m.memo[:255],
+        ))
+
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create(entries)
+        PartnerBalance.objects.bulk_create(
+            [PartnerBalance(partner_id=pid) for pid in deltas], ignore_conflicts=True,
+        )
+        updates = {'updated_at': timezone.now()}
+        for field in AMOUNT_FIELDS + ['payout_count']:
+            whens = [
+                When(partner_id=pid, then=Value(d[field]))
+                for pid, d in deltas.items() if d.get(field)
+            ]
+            if not whens:
+                continue
+            output = IntegerField() if field == 'payout_count' else DecimalField(max_digits=14, decimal_places=2)
+            updates[field] = F(field) + Case(*whens, default=Value(0), output_field=output)
+        PartnerBalance.objects.filter(partner_id__in=list(deltas)).update(**updates)
+        _invalidate_period_stats(movements)
+        ledger_posted.send(sender=LedgerEntry, deltas={pid: dict(d) for pid, d in deltas.items()})
+    return entries
+
+
+def _invalidate_period_stats(movements):
+    earliest = {}
+    for m in movements:
+        bucket = m.from_bucket or m.to_bucket
+        if not bucket or m.period_date is None:
+            continue
+        kind = 'payouts' if bucket.startswith('payouts_') else 'earnings'
+        day = period_stats._as_date(m.period_date)
+        partners, first = earliest.get(kind, (set(), day))
+        partners.add(m.partner_id)
+        earliest[kind] = (partners, min(first, day))
+    for kind, (partners, first) in earliest.items():
+        period_stats.invalidate_closed_periods(kind, partners, first)
+
+
+def earnings_movements(queryset, to_status, *, payout_id=None, payout_for_partner=None, memo='') -> list[Movement]:
+    """
+    Movements for an UPDATE that is about to set ``to_status`` on ``queryset``;
+    one grouped query, call it inside the UPDATE's transaction. Entries reference
+    ``payout_id`` / ``payout_for_partner`` when given, else the row's current payout.
+    """
+    rows = (
+        queryset.order_by()
+        .values('partner_id', 'payout_id', 'status')
+        .annotate(total=Sum('amount'), n=Count('id'), first_date=Min('date'))
+    )
+    payout_for_partner = payout_for_partner or {}
+    return [
+        Movement(
+            partner_id=r['partner_id'],
+            amount=r['total'] or Decimal('0'),
+            from_bucket=earning_bucket(r['status']),
+            to_bucket=earning_bucket(to_status),
+            item_count=r['n'],
+            payout_id=payout_id or payout_for_partner.get(r['partner_id']) or r['payout_id'],
+            memo=memo,
+            period_date=r['first_date'],
+        )
+        for r in rows
+    ]
+
+
+def payout_movements(queryset, to_status, *, created=False, memo='') -> list[Movement]:
+    """Per-payout movements for an UPDATE (or bulk_create when ``created``) to ``to_status``."""
+
+    return [
+        Movement(
+            partner_id=partner_id,
+            amount=amount,
+            from_bucket='' if created else payout_bucket(status),
+            to_bucket=payout_bucket(to_status),
+            payout_count_delta=1 if created else 0,
+            payout_id=pk,
+            memo=memo,
+            period_date=request_date,
+        )
+        for pk, partner_id, status, amount, request_date in queryset.order_by().values_list(
+            'pk', 'partner_id', 'status', 'amount', 'request_date',
+        )
+    ]
+
+
+def change_movements(old, new, *, bucket, earning_id=None, payout_id=None, payout_count_delta=0, memo='') -> list[Movement]:
+    """
+    Movements for a single row going from ``old`` to ``new`` (each a
+    (partner_id, amount, status) tuple, or None when the row did not / no longer exists).
+    """
+    common = {'earning_id': earning_id, 'payout_id': payout_id, 'memo': memo}
+    if old and new and old[:2] == new[:2]:
+        return [Movement(new[0], new[1], bucket(old[2]), bucket(new[2]),
+                         payout_count_delta=payout_count_delta, **common)]
+    movements = []
+    if old:
+        movements.append(Movement(old[0], old[1], from_bucket=bucket(old[2]),
+                                  payout_count_delta=-1 if payout_count_delta < 0 else 0, **common))
+    if new:
+        movements.append(Movement(new[0], new[1], to_bucket=bucket(new[2]),
+                                  payout_count_delta=1 if payout_count_delta > 0 else 0, **common))
+    return movements
+
+
+def get_balance(partner) -> PartnerBalance:
+    """The partner's balance row, or an unsaved zero balance if nothing was posted yet."""
+
+    try:
+        return PartnerBalance.objects.get(partner=partner)
+    except PartnerBalance.DoesNotExist:
+        return PartnerBalance(partner=partner)
+
+
+def balance_totals(queryset) -> dict:
+    """Summed balance columns over ``queryset`` (a single row for one partner)."""
+
+    fields = AMOUNT_FIELDS + ['payout_count']
+    totals = queryset.aggregate(**{f: Sum(f) for f in fields})
+    return {f: totals[f] or (0 if f == 'payout_count' else Decimal('0')) for f in fields}
@@ -0,0 +1,65 @@
+"""
+Render monthly statements for every partner with earnings or payouts in the
+month (see payouts.statements).
+
+Usage:
+  python manage.py generate_partner_statements                     # last month, PDF and CSV
+  python manage.py generate_partner_statements --period 2026-09 --format pdf --workers 8
+  python manage.py generate_partner_statements --partner <profile id> --force
+
+Statements whose content hash matches an already rendered file are skipped, so
+re-running the command after a partial failure only renders what is missing.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import Profile
+from payouts.models import PartnerStatement
+from payouts.statements import active_partner_ids, generate_many, month_start, prepare, previous_month, statements_setting
+
+
+class Command(BaseCommand):
+    help = 'Batch-render monthly partner statements on a worker pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Month as YYYY-MM (default: last month).')
+        parser.add_argument(
+            '--format', action='append', choices=PartnerStatement.Format.values,
+            help='Formats to render (default: all).',
+        )
+        parser.add_argument('--partner', action='append', type=int, metavar='PROFILE_ID', help='Limit to these partners.')
+        parser.add_argument('--workers', type=int, default=None, help='Render threads (default: PAYOUT_STATEMENTS MAX_WORKERS).')
+        parser.add_argument('--force', action='store_true', help='Re-render statements that are already up to date.')
+
+    def handle(self, *args, **options):
+        try:
+            period = month_start(options['period']) if options['period'] else previous_month()
+        except ValueError:
+            raise CommandError('--period must be YYYY-MM')
+        formats = options['format'] or PartnerStatement.Format.values
+        workers = options['workers'] or statements_setting('MAX_WORKERS')
+
+        partner_ids = options['partner'] or active_partner_ids(period)
+        partners = Profile.objects.filter(pk__in=partner_ids).order_by('pk')
+
+        started = time.monotonic()
+        queued, cached = [], 0
+        for partner in partners.iterator():
+            for fmt in formats:
+                statement, needs_render = prepare(partner, period, fmt, force=options['force'])
+                if needs_render:
+                    queued.append(statement.pk)
+                else:
+                    cached += 1
+        self.stdout.write(f"{period:%Y-%m}: {len(queued)} statements to render, {cached} up to date or in progress")
+
+        counts = generate_many(queued, workers=workers)
+        summary = (
+            f"Rendered {counts['ready']} statements with {workers} workers in "
+            f"{time.monotonic() - started:.1f}s ({cached} cached"
+        )
+        if counts['failed']:
+            self.stdout.write(self.style.WARNING(f"{summary}, {counts['failed']} failed)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary})"))
@@ -0,0 +1,68 @@
+"""
+Bulk-import earnings from a CSV or JSON file (see payouts.ingest for the columns).
+
+Usage:
+  python manage.py import_earnings campaign.csv
+  python manage.py import_earnings campaign.json --partial       # skip invalid rows
+  python manage.py import_earnings campaign.csv --dry-run --created-by ops@example.com
+"""
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from payouts.ingest import DEFAULT_CHUNK_SIZE, ingest_earnings, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import earnings from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file.')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Defaults to the file extension.')
+        parser.add_argument('--partial', action='store_true', help='Insert valid rows even if some rows fail.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--created-by', metavar='EMAIL', help='User recorded as creator of the earnings.')
+        parser.add_argument('--max-errors', type=int, default=50, help='Row errors to print.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        fmt = options['format'] or ('json' if path.suffix.lower() == '.json' else 'csv')
+
+        created_by = None
+        if options['created_by']:
+            try:
+                created_by = get_user_model().objects.get(email=options['created_by'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['created_by']}")
+
+        try:
+            rows = parse_rows(path.read_bytes(), fmt)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not parse {path}: {e}")
+
+        result = ingest_earnings(
+            rows,
+            created_by=created_by,
+            partial=options['partial'],
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+        )
+
+        for error in result.errors[:options['max_errors']]:
+            self.stdout.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if len(result.errors) > options['max_errors']:
+            self.stdout.write(f"... and {len(result.errors) - options['max_errors']} more row errors")
+
+        summary = (
+            f"{result.total} rows, {result.created} created, {len(result.errors)} invalid "
+            f"(by status: {result.by_status})"
+        )
+        if result.errors and not options['partial'] and not options['dry_run']:
+            raise CommandError(f"Nothing imported: {summary}. Fix the rows or pass --partial.")
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(prefix + summary))
@@ -0,0 +1,123 @@
+"""
+Verify PartnerBalance rows against the ledger, and the ledger against raw
+Earnings/Payout sums.
+
+Usage:
+  python manage.py reconcile_partner_balances                # report drift
+  python manage.py reconcile_partner_balances --partner 42
+  python manage.py reconcile_partner_balances --fix          # repair drift
+
+With --fix, balance rows are rewritten from the ledger and any remaining
+difference to the raw rows is posted as an adjustment entry. Run it once with
+--fix after deploying the ledger to post opening balances for existing data.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from authentication.models import Profile
+from payouts import ledger
+from payouts.models import Earnings, LedgerEntry, PartnerBalance, Payout
+
+FIELDS = ledger.AMOUNT_FIELDS + ['payout_count']
+
+
+def _zero():
+    return {f: (0 if f == 'payout_count' else Decimal('0')) for f in FIELDS}
+
+
+def _ledger_totals(partner_ids):
+    totals = defaultdict(_zero)
+    entries = LedgerEntry.objects.filter(partner_id__in=partner_ids).order_by()
+    for row in entries.exclude(to_bucket='').values('partner_id', 'to_bucket').annotate(total=Sum('amount')):
+        totals[row['partner_id']][row['to_bucket']] += row['total']
+    for row in entries.exclude(from_bucket='').values('partner_id', 'from_bucket').annotate(total=Sum('amount')):
+        totals[row['partner_id']][row['from_bucket']] -= row['total']
+    for row in entries.values('partner_id').annotate(n=Sum('payout_count_delta')):
+        totals[row['partner_id']]['payout_count'] += row['n'] or 0
+    return totals
+
+
+def _raw_totals(partner_ids):
+    totals = defaultdict(_zero)
+    earnings = Earnings.objects.filter(partner_id__in=partner_ids).order_by()
+    for row in earnings.values('partner_id', 'status').annotate(total=Sum('amount')):
+        totals[row['partner_id']][ledger.earning_bucket(row['status'])] += row['total'] or 0
+    payouts = Payout.objects.filter(partner_id__in=partner_ids).order_by()
+    for row in payouts.values('partner_id', 'status').annotate(total=Sum('amount'), n=Count('pk')):
+        bucket = ledger.payout_bucket(row['status'])
+        if bucket:
+            totals[row['partner_id']][bucket] += row['total'] or 0
+        totals[row['partner_id']]['payout_count'] += row['n']
+    return totals
+
+
+def _diff(left, right):
+    return {f: right[f] - left[f] for f in FIELDS if left[f] != right[f]}
+
+
+class Command(BaseCommand):
+    help = 'Check materialized partner balances against the ledger and raw earnings/payouts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partner', type=int, action='append', help='Only check these partner ids.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--fix', action='store_true', help='Repair balances and post adjustment entries.')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.order_by('pk')
+        if options['partner']:
+            profiles = profiles.filter(pk__in=options['partner'])
+
+        checked = balance_drift = ledger_drift = 0
+        cursor = 0
+        while True:
+            partner_ids = list(profiles.filter(pk__gt=cursor).values_list('pk', flat=True)[:options['chunk_size']])
+            if not partner_ids:
+                break
+            cursor = partner_ids[-1]
+            with transaction.atomic():
+                balances = {
+                    b['partner_id']: b
+                    for b in PartnerBalance.objects.select_for_update()
+                    .filter(partner_id__in=partner_ids).values('partner_id', *FIELDS)
+                }
+                ledger_totals = _ledger_totals(partner_ids)
+                raw_totals = _raw_totals(partner_ids)
+
+                adjustments = []
+                for partner_id in partner_ids:
+                    checked += 1
+                    stored = balances.get(partner_id) or _zero()
+                    expected = ledger_totals[partner_id]
+                    drift = _diff(stored, expected)
+                    if drift:
+                        balance_drift += 1
+                        self.stdout.write(f"Partner {partner_id}: balance differs from ledger {drift}")
+                        if options['fix']:
+                            PartnerBalance.objects.update_or_create(partner_id=partner_id, defaults=expected)
+
+                    drift = _diff(expected, raw_totals[partner_id])
+                    if drift:
+                        ledger_drift += 1
+                        self.stdout.write(f"Partner {partner_id}: ledger differs from earnings/payouts {drift}")
+                        count_delta = drift.pop('payout_count', 0)
+                        adjustments += [
+                            ledger.Movement(partner_id, amount, to_bucket=bucket, memo='Reconciliation adjustment')
+                            for bucket, amount in drift.items()
+                        ]
+                        if count_delta:
+                            adjustments.append(ledger.Movement(
+                                partner_id, Decimal('0'), payout_count_delta=count_delta,
+                                memo='Reconciliation adjustment',
+                            ))
+                if options['fix'] and adjustments:
+                    ledger.post(adjustments, entry_type=LedgerEntry.EntryType.ADJUSTMENT)
+
+        verb = 'Repaired' if options['fix'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} partners. {verb} {balance_drift} balance and {ledger_drift} ledger discrepancies."
+        ))
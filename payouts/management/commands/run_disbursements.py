@@ -0,0 +1,84 @@
+"""
+Send PROCESSING payouts to their payment providers concurrently.
+
+Usage:
+  python manage.py run_disbursements                   # poll forever
+  python manage.py run_disbursements --once
+  python manage.py run_disbursements --mock --allow-db-writes --once
+  python manage.py run_disbursements --mock --allow-db-writes --failure-rate 0.2 --latency-ms 50 200 --rate 20
+
+--mock swaps the provider of every payment method for MockDisbursementProvider
+but still runs the real worker: it claims PROCESSING payouts from the configured
+database, completes them with fake transaction ids and posts their ledger
+entries. Point it at a scratch database only; it refuses to run without
+--allow-db-writes.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from payouts.disbursement import DisbursementStats, DisbursementWorker, disbursement_setting
+from payouts.models import Payout
+
+
+class Command(BaseCommand):
+    help = 'Run the disbursement worker for PROCESSING payouts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process a single batch and exit.')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches.')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+        parser.add_argument('--mock', action='store_true',
+                            help='Use MockDisbursementProvider for every payment method.')
+        parser.add_argument('--allow-db-writes', action='store_true',
+                            help='Confirm that --mock may settle the PROCESSING payouts in the configured database.')
+        parser.add_argument('--failure-rate', type=float, default=0.05, help='Mock transient failure rate.')
+        parser.add_argument('--permanent-failure-rate', type=float, default=0.01)
+        parser.add_argument('--latency-ms', type=int, nargs=2, default=[50, 300], metavar=('MIN', 'MAX'))
+        parser.add_argument('--rate', type=float, default=5, help='Mock requests per second per method.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Mock concurrent requests per method.')
+
+    def handle(self, *args, **options):
+        providers = None
+        if options['mock']:
+            if not options['allow_db_writes']:
+                raise CommandError(
+                    "--mock settles real PROCESSING payouts in the configured database with fake transaction "
+                    "ids and posts their ledger entries. Run it against a scratch database and pass "
+                    "--allow-db-writes to confirm."
+                )
+            mock_options = {
+                'latency': (options['latency_ms'][0] / 1000, options['latency_ms'][1] / 1000),
+                'transient_failure_rate': options['failure_rate'],
+                'permanent_failure_rate': options['permanent_failure_rate'],
+            }
+            providers = {
+                method: {
+                    'ADAPTER': 'payouts.disbursement.MockDisbursementProvider',
+                    'RATE_PER_SECOND': options['rate'],
+                    'BURST': max(int(options['rate']), 1),
+                    'MAX_CONCURRENCY': options['concurrency'],
+                    'OPTIONS': mock_options,
+                }
+                for method in Payout.PaymentMethod.values
+            }
+        elif not disbursement_setting('PROVIDERS'):
+            raise CommandError("No providers in settings.PAYOUT_DISBURSEMENT['PROVIDERS']; use --mock against a scratch database to test.")
+
+        worker = DisbursementWorker(providers, batch_size=options['batch_size'])
+        try:
+            if options['once']:
+                stats = worker.run_once()
+            else:
+                stats = DisbursementStats()
+                try:
+                    stats = worker.run(poll_interval=options['poll_interval'], max_batches=options['max_batches'])
+                except KeyboardInterrupt:
+                    self.stdout.write('Interrupted.')
+        finally:
+            worker.shutdown()
+
+        throughput = stats.claimed / stats.elapsed if stats.elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Claimed {stats.claimed}: {stats.completed} completed, {stats.failed} failed, "
+            f"{stats.retried} scheduled for retry in {stats.elapsed:.2f}s ({throughput:.1f}/s)"
+        ))
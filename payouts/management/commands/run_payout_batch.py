@@ -0,0 +1,62 @@
+"""
+Create scheduled payouts for partners with auto_payout enabled.
+
+Usage:
+  python manage.py run_payout_batch                      # schedules due today
+  python manage.py run_payout_batch --schedule weekly --schedule monthly
+  python manage.py run_payout_batch --resume 12          # continue an interrupted batch
+  python manage.py run_payout_batch --dry-run
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from payouts.batch import DEFAULT_CHUNK_SIZE, SCHEDULED, due_schedules, run_payout_batch
+from payouts.models import PayoutBatch
+
+
+class Command(BaseCommand):
+    help = 'Run the scheduled payout batch (chunked and resumable).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='append', choices=SCHEDULED,
+                            help='Schedule(s) to include; defaults to those due today.')
+        parser.add_argument('--resume', type=int, metavar='BATCH_ID', help='Resume an unfinished batch.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--max-chunks', type=int, help='Stop after this many chunks (resume later).')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be paid without writing.')
+
+    def handle(self, *args, **options):
+        batch = None
+        if options['resume']:
+            try:
+                batch = PayoutBatch.objects.get(pk=options['resume'])
+            except PayoutBatch.DoesNotExist:
+                raise CommandError(f"Payout batch {options['resume']} does not exist")
+            if batch.status != PayoutBatch.Status.RUNNING:
+                raise CommandError(f"Payout batch {batch.pk} is already {batch.status}")
+            schedules = batch.schedules
+        else:
+            schedules = options['schedule'] or due_schedules()
+            if not schedules:
+                self.stdout.write('No payout schedules are due today.')
+                return
+
+        batch = run_payout_batch(
+            schedules,
+            batch=batch,
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'],
+            dry_run=options['dry_run'],
+        )
+
+        label = 'Dry run' if options['dry_run'] else f'Batch #{batch.pk}'
+        self.stdout.write(f"{label} [{', '.join(schedules)}]: {batch.status}")
+        self.stdout.write(f"  partners scanned:  {batch.partners_scanned}")
+        self.stdout.write(f"  payouts created:   {batch.payouts_created}")
+        self.stdout.write(f"  below minimum:     {batch.report.get('below_minimum', 0)}")
+        self.stdout.write(f"  total amount:      {batch.total_amount}")
+        for method, values in sorted(batch.report.get('by_payment_method', {}).items()):
+            self.stdout.write(f"    {method:<8} {values['count']:>7}  {values['amount']}")
+        if batch.status == PayoutBatch.Status.RUNNING and not options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Not finished; resume with --resume {batch.pk}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done.'))
@@ -14,6 +14,7 @@ from django.db.models import Q
 import logging
 
 from authentication.models import Profile
+from fred.model_mixins import DirtyFieldsMixin
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +44,7 @@ class PayoutTimeline(models.Model):
     def __str__(self):
         return f"{self.payout.id} - {self.status} at {self.timestamp}"
 
-class Payout(models.Model):
+class Payout(DirtyFieldsMixin, models.Model):
     class Status(models.TextChoices):
         PENDING = 'pending', _('Pending')
         PROCESSING = 'processing', _('Processing')
@@ -58,6 +59,9 @@ class Payout(models.Model):
         MPESA = 'mpesa', _('M-Pesa')
         CRYPTO = 'crypto', _('Cryptocurrency')
 
+    # Changes to these invalidate cached closed-period stats (payouts.period_stats).
+    PERIOD_STATS_FIELDS = frozenset({'partner', 'amount', 'status', 'payment_method', 'request_date'})
+
     id = models.CharField(primary_key=True, max_length=20, editable=False)
     partner = models.ForeignKey(
         Profile,
@@ -91,6 +95,20 @@ class Payout(models.Model):
         related_name='processed_payouts',
         help_text="Admin who processed this payout"
     )
+    batch = models.ForeignKey(
+        'PayoutBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payouts',
+        help_text="Scheduled batch run that created this payout"
+    )
+    disbursement_attempts = models.PositiveSmallIntegerField(default=0)
+    disbursement_lease_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Disbursement worker lease, or earliest retry time after a transient failure"
+    )
 
     class Meta:
         ordering = ['-request_date']
@@ -99,6 +117,7 @@ class Payout(models.Model):
         indexes = [
             models.Index(fields=['status', 'request_date']),
             models.Index(fields=['partner', 'status']),
+            models.Index(fields=['status', 'disbursement_lease_until']),
         ]
 
     def __str__(self):
@@ -113,14 +132,29 @@ class Payout(models.Model):
         if not self.id:
             self.id = f"PY-{uuid.uuid4().hex[:8].upper()}"
 
-        status_changed = False
-
-        if self.pk and Payout.objects.filter(pk=self.pk).exists():
-            old_instance = Payout.objects.get(pk=self.pk)
-            if old_instance.status != self.status:
-                status_changed = True
-
-        super().save(*args, **kwargs)
+        # Diff against the snapshot taken at load time instead of re-reading the row
+        adding = self._state.adding
+        status_changed = not adding and self.has_changed('status')
+        stats_changed = adding or bool(self.changed_fields() & self.PERIOD_STATS_FIELDS)
+        old = None
+        if not adding and self.has_field_snapshot:
+            old = (self.previous('partner'), self.previous('amount'), self.previous('status'))
+        old_request_date = self.previous('request_date')
+
+        from . import period_stats
+        from .ledger import change_movements, payout_bucket, post
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            post(change_movements(
+                old, (self.partner_id, self.amount, self.status),
+                bucket=payout_bucket, payout_id=self.pk, payout_count_delta=1 if adding else 0,
+                memo=f"Payout {self.pk} {self.status}",
+            ))
+            if stats_changed:
+                period_stats.invalidate_closed_periods(
+                    'payouts', [self.partner_id, old and old[0]],
+                    period_stats.earliest_date(self.request_date, old_request_date),
+                )
 
         # After saving, create a timeline record if the status changed
         if status_changed:
@@ -132,148 +166,50 @@ class Payout(models.Model):
             )
 
 
+    def delete(self, *args, **kwargs):
+        from . import period_stats
+        from .ledger import change_movements, payout_bucket, post
+        with transaction.atomic():
+            post(change_movements(
+                (self.partner_id, self.amount, self.status), None,
+                bucket=payout_bucket, payout_id=self.pk, payout_count_delta=-1,
+                memo=f"Payout {self.pk} deleted",
+            ))
+            period_stats.invalidate_closed_periods('payouts', [self.partner_id], self.request_date)
+            return super().delete(*args, **kwargs)
+
+    # State transitions go through payouts.services.PayoutSettlement (set-based, locked).
+
     def process(self, user=None):
-        self.status = self.Status.PROCESSING
-        self.processed_by = user
-        self.save()
+        from .services import PayoutSettlement
+        PayoutSettlement.process([self.pk], user=user)
+        self.refresh_from_db()
         return self
-        
+
     def complete(self, transaction_id=None, user=None):
         """Mark payout as completed and update all related earnings to paid status"""
-        from .models import Earnings  # Local import to avoid circular imports
-        
-        # Update payout status
-        self.status = self.Status.COMPLETED
-        self.processed_date = timezone.now()
-        self.transaction_id = transaction_id
-        self.processed_by = user if user else self.processed_by
-        self.save()
-        
-        # Update all earnings associated with this payout
-        try:
-            with transaction.atomic():
-                # 1. Direct earnings linked to this payout
-                direct_earnings = Earnings.objects.filter(
-                    payout=self,
-                    status__in=[Earnings.Status.AVAILABLE, Earnings.Status.PROCESSING]
-                )
-                
-                update_count = 0
-                for earning in direct_earnings:
-                    earning.status = Earnings.Status.PAID
-                    earning.paid_date = timezone.now()
-                    earning.save(update_fields=['status', 'paid_date'])
-                    update_count += 1
-                
-                # 2. Find and update any available earnings for this partner that aren't linked yet
-                available_earnings = Earnings.objects.filter(
-                    partner=self.partner,
-                    status=Earnings.Status.AVAILABLE,
-                    payout__isnull=True
-                )
-                
-                for earning in available_earnings:
-                    earning.status = Earnings.Status.PAID
-                    earning.payout = self
-                    earning.paid_date = timezone.now()
-                    earning.save(update_fields=['status', 'payout', 'paid_date'])
-                    update_count += 1
-                
-                # 3. Update earnings linked via referrals
-                for payout_ref in self.referrals.all():
-                    if hasattr(payout_ref, 'referral') and hasattr(payout_ref.referral, 'earning'):
-                        earning = payout_ref.referral.earning
-                        if earning.status in [Earnings.Status.AVAILABLE, Earnings.Status.PROCESSING]:
-                            earning.status = Earnings.Status.PAID
-                            earning.payout = self
-                            earning.paid_date = timezone.now()
-                            earning.save(update_fields=['status', 'payout', 'paid_date'])
-                            update_count += 1
-                
-                logger.info(f"Payout {self.id} completed: Updated {update_count} earnings to PAID status")
-        
-        except Exception as e:
-            logger.error(f"Error updating earnings for payout {self.id}: {str(e)}")
-            # We don't raise the exception here to allow the payout to complete
-            # even if there are issues with updating some earnings
-        
+        from .services import PayoutSettlement
+        PayoutSettlement.complete([self.pk], transaction_id=transaction_id, user=user)
+        self.refresh_from_db()
         return self
+
     def _update_associated_earnings(self):
         """Update all earnings associated with this payout to PAID status"""
-        try:
-            with transaction.atomic():
-                # Update earnings directly linked to this payout
-                updated_direct = 0
-                for earning in self.earnings_included.filter(
-                    status__in=['processing', 'available']
-                ):
-                    earning.status = 'paid'
-                    earning.paid_date = timezone.now()
-                    earning.save(update_fields=['status', 'paid_date'])
-                    updated_direct += 1
-                
-                # Update earnings linked through referrals
-                updated_referrals = 0
-                for payout_ref in self.referrals.select_related('referral__earning').all():
-                    if hasattr(payout_ref.referral, 'earning'):
-                        earning = payout_ref.referral.earning
-                        if earning.status in ['processing', 'available']:
-                            earning.status = 'paid'
-                            earning.payout = self
-                            earning.paid_date = timezone.now()
-                            earning.save(update_fields=['status', 'payout', 'paid_date'])
-                            updated_referrals += 1
-                
-                logger.info(
-                    f"Payout {self.id} completed: Updated {updated_direct} direct earnings and {updated_referrals} referral earnings to PAID"
-                )
-                
-                # Double-check for any missed earnings related to this payout
-                # This will find any earnings related to the payout that weren't caught by the direct linkage checks
-                from .models import Earnings  # Local import to avoid circular references
-                
-                # Look for available/processing earnings that should be paid
-                missed_earnings = Earnings.objects.filter(
-                    Q(payout=self) | Q(referral__payout_referrals__payout=self),
-                    status__in=['processing', 'available']
-                ).distinct()
-                
-                if missed_earnings.exists():
-                    logger.info(f"Found {missed_earnings.count()} additional earnings to update for payout {self.id}")
-                    for earning in missed_earnings:
-                        earning.status = 'paid'
-                        earning.paid_date = timezone.now()
-                        earning.save(update_fields=['status', 'paid_date'])
-                    
-        except Exception as e:
-            logger.error(f"Error updating earnings for payout {self.id}: {str(e)}")
-            # You can choose to re-raise the exception for critical errors
-            # raise
-    
+        from .services import PayoutSettlement
+        return PayoutSettlement.settle_earnings({self.pk: self.partner_id})
+
     def cancel(self, reason=None, user=None):
-        self.status = self.Status.CANCELLED
-        if reason:
-            self.note = f"{self.note or ''}\nCancellation reason: {reason}"
-        self.processed_by = user if user else self.processed_by
-        self.save()
-        
-        # Reset earnings status to available if payout is cancelled
-        for earning in self.earnings_included.all():
-            if earning.status == Earnings.Status.PROCESSING:
-                earning.status = Earnings.Status.AVAILABLE
-                earning.payout = None
-                earning.save()
-                
+        from .services import PayoutSettlement
+        PayoutSettlement.cancel([self.pk], reason=reason, user=user)
+        self.refresh_from_db()
         return self
 
     def fail(self, error_message, user=None):
-        self.status = self.Status.FAILED
-        self.note = f"{self.note or ''}\nError: {error_message}"
-        self.processed_by = user if user else self.processed_by
-        self.save()
+        from .services import PayoutSettlement
+        PayoutSettlement.fail([self.pk], error_message, user=user)
+        self.refresh_from_db()
         return self
-        
-        
+
     @property
     def can_process(self):
         return self.status == self.Status.PENDING
@@ -364,6 +300,38 @@ class Payout(models.Model):
 
 
 
+class PayoutBatch(models.Model):
+    """A scheduled payout run (see payouts.batch.run_payout_batch); resumable from `cursor`."""
+    class Status(models.TextChoices):
+        RUNNING = 'running', _('Running')
+        COMPLETED = 'completed', _('Completed')
+
+    schedules = models.JSONField(default=list, help_text="Payout schedules included in this run")
+    status = models.CharField(max_length=15, choices=Status.choices, default=Status.RUNNING, db_index=True)
+    cursor = models.BigIntegerField(default=0, help_text="Last partner id fully processed")
+    partners_scanned = models.PositiveIntegerField(default=0)
+    payouts_created = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    report = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payout_batches'
+    )
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = _("Payout Batch")
+        verbose_name_plural = _("Payout Batches")
+
+    def __str__(self):
+        return f"Payout batch #{self.pk} ({self.status})"
+
+
 class PayoutSetting(models.Model):
     # Constants
     DEFAULT_PAYMENT_METHOD = 'bank'
@@ -462,7 +430,7 @@ class PayoutSetting(models.Model):
 
 
 
-class Earnings(models.Model):
+class Earnings(DirtyFieldsMixin, models.Model):
     class Source(models.TextChoices):
         REFERRAL = 'referral', _('Referral')
         BONUS = 'bonus', _('Bonus')
@@ -478,6 +446,9 @@ class Earnings(models.Model):
         CANCELLED = 'cancelled', _('Cancelled')
         REJECTED = 'rejected', _('Rejected')
 
+    # Changes to these invalidate cached closed-period stats (payouts.period_stats).
+    PERIOD_STATS_FIELDS = frozenset({'partner', 'amount', 'status', 'date'})
+
     partner = models.ForeignKey(
         Profile,
         on_delete=models.CASCADE,
@@ -522,8 +493,41 @@ class Earnings(models.Model):
         # ensure it starts in PENDING_APPROVAL
         if not self.id and self.source == self.Source.REFERRAL:
             self.status = self.Status.PENDING_APPROVAL
-            
-        super().save(*args, **kwargs)
+
+        from . import period_stats
+        from .ledger import change_movements, earning_bucket, post
+        old = None
+        if not self._state.adding and self.has_field_snapshot:
+            old = (self.previous('partner'), self.previous('amount'), self.previous('status'))
+        stats_changed = self._state.adding or bool(self.changed_fields() & self.PERIOD_STATS_FIELDS)
+        stats_earliest = period_stats.earliest_date(self.date, self.previous('date'))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            post(change_movements(
+                old, (self.partner_id, self.amount, self.status),
+                bucket=earning_bucket, earning_id=self.pk, payout_id=self.payout_id,
+                memo=f"Earning #{self.pk} {self.status}",
+            ))
+            if stats_changed:
+                period_stats.invalidate_closed_periods('earnings', [self.partner_id, old and old[0]], stats_earliest)
+
+    def delete(self, *args, **kwargs):
+        from . import period_stats
+        from .ledger import change_movements, earning_bucket, post
+        with transaction.atomic():
+            post(change_movements(
+                (self.partner_id, self.amount, self.status), None,
+                bucket=earning_bucket, payout_id=self.payout_id, memo=f"Earning #{self.pk} deleted",
+            ))
+            period_stats.invalidate_closed_periods('earnings', [self.partner_id], self.date)
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def initial_status_for(cls, source):
+        """Status a new earning starts in: referral, promotion and bonus earnings need approval."""
+        if source in (cls.Source.REFERRAL, cls.Source.PROMOTION, cls.Source.BONUS):
+            return cls.Status.PENDING_APPROVAL
+        return cls.Status.AVAILABLE
 
     def mark_as_available(self):
         """
@@ -607,3 +611,156 @@ class Earnings(models.Model):
         
     def __str__(self):
         return f"{self.partner.name} - {self.amount} ({self.get_status_display()})"
+
+
+class PartnerBalance(models.Model):
+    """
+    Materialized per-partner totals, maintained by payouts.ledger in the same
+    transaction as every Earnings/Payout state change. Earnings buckets follow
+    Earnings.Status; payouts_* buckets hold open and completed Payout amounts.
+    """
+    partner = models.OneToOneField(
+        Profile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance'
+    )
+    pending = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    pending_approval = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    available = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    processing = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    paid = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cancelled = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    rejected = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payouts_pending = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payouts_processing = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payouts_completed = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payout_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Partner Balance")
+        verbose_name_plural = _("Partner Balances")
+
+    def __str__(self):
+        return f"Balance for partner {self.partner_id}"
+
+    @property
+    def total_earnings(self):
+        return (
+            self.pending + self.pending_approval + self.available + self.processing
+            + self.paid + self.cancelled + self.rejected
+        )
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only record of money moving between a partner's balance buckets.
+    An empty from_bucket means the amount enters the balance, an empty
+    to_bucket means it leaves it.
+    """
+    class EntryType(models.TextChoices):
+        CREDIT = 'credit', _('Credit')
+        DEBIT = 'debit', _('Debit')
+        REVERSAL = 'reversal', _('Reversal')
+        ADJUSTMENT = 'adjustment', _('Adjustment')
+
+    partner = models.ForeignKey(
+        Profile,
+        on_delete=models.CASCADE,
+        related_name='ledger_entries'
+    )
+    entry_type = models.CharField(max_length=12, choices=EntryType.choices)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    from_bucket = models.CharField(max_length=24, blank=True, default='')
+    to_bucket = models.CharField(max_length=24, blank=True, default='')
+    item_count = models.PositiveIntegerField(default=1, help_text="Rows moved by this entry")
+    payout_count_delta = models.IntegerField(default=0)
+    earning = models.ForeignKey(
+        Earnings,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    payout = models.ForeignKey(
+        Payout,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    memo = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name = _("Ledger Entry")
+        verbose_name_plural = _("Ledger Entries")
+        indexes = [
+            models.Index(fields=['partner', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} {self.from_bucket or '-'} -> {self.to_bucket or '-'}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("Ledger entries are append-only")
+
+
+class PartnerStatement(models.Model):
+    """
+    A rendered monthly earnings/payout statement (see payouts.statements).
+
+    ``content_hash`` fingerprints the rows the statement was rendered from, so a
+    ready statement is reused until earnings or payouts in its month change.
+    """
+    class Format(models.TextChoices):
+        PDF = 'pdf', _('PDF')
+        CSV = 'csv', _('CSV')
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        RUNNING = 'running', _('Running')
+        READY = 'ready', _('Ready')
+        FAILED = 'failed', _('Failed')
+
+    partner = models.ForeignKey(
+        Profile,
+        on_delete=models.CASCADE,
+        related_name='statements'
+    )
+    period = models.DateField(help_text="First day of the statement month")
+    format = models.CharField(max_length=3, choices=Format.choices)
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    file = models.FileField(upload_to='statements/%Y/%m/', blank=True)
+    error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='requested_statements'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-period', '-created_at']
+        verbose_name = _("Partner Statement")
+        verbose_name_plural = _("Partner Statements")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['partner', 'period', 'format', 'content_hash'],
+                name='unique_statement_content',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.partner} {self.period:%Y-%m} {self.format} ({self.status})"
@@ -0,0 +1,191 @@
+"""
+Closed-period cache for payout and earnings statistics.
+
+Stats are built from per-period buckets (daily / weekly / monthly, by
+Payout.request_date or Earnings.date), each holding count and amount totals split
+by status (and payment method for payouts). Buckets for closed periods are cached
+per scope (one partner, or 'all') and frame; a request recomputes only the
+current open period, and when a period closes only that period is aggregated and
+appended to the cached entry. A stats request therefore costs one small query
+whatever the length of the history.
+
+Cached entries are versioned per (kind, scope, frame). Writes that touch a row
+dated before the current open period (backdated earnings, status changes of old
+payouts, deletes, imports) rotate the version for the row's partner and for 'all'
+after commit; see ``invalidate_closed_periods``. Writes in the open period need no
+invalidation. Versions live in the shared cache (settings.CACHES) without expiry,
+so a rotation by one worker process retires the entries of every other; with a
+per-process cache the others would keep serving closed periods for up to
+PERIOD_STATS_CACHE_TTL (a week).
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Earnings, Payout
+
+logger = logging.getLogger(__name__)
+
+FRAMES = {
+    'daily': TruncDay,
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+}
+# kind -> (model, period field, breakdown dimensions)
+SOURCES = {
+    'payouts': (Payout, 'request_date', ('status', 'payment_method')),
+    'earnings': (Earnings, 'date', ('status',)),
+}
+ENTRY_KEY = 'periodstats:{kind}:{scope}:{frame}:{version}'
+VERSION_KEY = 'periodstats:ver:{kind}:{scope}:{frame}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'PERIOD_STATS_CACHE_TTL', 7 * 24 * 60 * 60)
+
+
+def period_start(frame: str, day: date) -> date:
+    if frame == 'monthly':
+        return day.replace(day=1)
+    if frame == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _bound(kind, day: date):
+    """Filter value for ``day`` on the kind's period field (aware midnight for datetimes)."""
+    if SOURCES[kind][1] == 'request_date':
+        return timezone.make_aware(datetime.combine(day, time.min))
+    return day
+
+
+def _version(kind, scope, frame) -> str:
+    key = VERSION_KEY.format(kind=kind, scope=scope, frame=frame)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _aggregate(kind, scope, frame, start: date | None = None, end: date | None = None) -> dict[str, dict]:
+    model, field, dims = SOURCES[kind]
+    queryset = model.objects.all()
+    if scope != 'all':
+        queryset = queryset.filter(partner_id=scope)
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": _bound(kind, start)})
+    if end is not None:
+        queryset = queryset.filter(**{f"{field}__lt": _bound(kind, end)})
+
+    rows = (
+        queryset.order_by()
+        .annotate(period=FRAMES[frame](field))
+        .values('period', *dims)
+        .annotate(count=Count('pk'), amount=Sum('amount'))
+    )
+    buckets: dict[str, dict] = {}
+    for row in rows:
+        key = _as_date(row['period']).isoformat()
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {'period': row['period'], 'count': 0, 'amount': Decimal('0')}
+            for dim in dims:
+                bucket[f"by_{dim}"] = {}
+        amount = row['amount'] or Decimal('0')
+        bucket['count'] += row['count']
+        bucket['amount'] += amount
+        for dim in dims:
+            split = bucket[f"by_{dim}"].setdefault(row[dim], {'count': 0, 'amount': Decimal('0')})
+            split['count'] += row['count']
+            split['amount'] += amount
+    return buckets
+
+
+def _cached_entry(kind, scope, frame, boundary: date) -> dict:
+    key = ENTRY_KEY.format(kind=kind, scope=scope, frame=frame, version=_version(kind, scope, frame))
+    entry = cache.get(key)
+    if entry is None:
+        entry = {'closed_until': boundary, 'buckets': _aggregate(kind, scope, frame, end=boundary)}
+        cache.set(key, entry, _cache_ttl())
+    elif entry['closed_until'] < boundary:
+        # Periods closed since the entry was built: aggregate just those.
+        entry['buckets'].update(_aggregate(kind, scope, frame, start=entry['closed_until'], end=boundary))
+        entry['closed_until'] = boundary
+        cache.set(key, entry, _cache_ttl())
+    return entry
+
+
+def get_buckets(kind: str, scope, frame: str) -> list[dict]:
+    """All buckets for ``scope`` (partner id or 'all'), oldest first; closed ones from cache."""
+
+    frame = frame if frame in FRAMES else 'daily'
+    boundary = period_start(frame, timezone.localdate())
+    try:
+        entry = _cached_entry(kind, scope, frame, boundary)
+    except Exception as e:
+        logger.warning(f"Period stats cache unavailable, aggregating {kind}/{scope}/{frame} uncached: {e}")
+        entry = {'closed_until': boundary, 'buckets': _aggregate(kind, scope, frame, end=boundary)}
+
+    buckets = dict(entry['buckets'])
+    buckets.update(_aggregate(kind, scope, frame, start=boundary))
+    return [buckets[k] for k in sorted(buckets)]
+
+
+def merge_breakdown(buckets: Iterable[dict], dim: str) -> dict:
+    totals: dict = defaultdict(lambda: {'count': 0, 'amount': Decimal('0')})
+    for bucket in buckets:
+        for value, split in bucket.get(f"by_{dim}", {}).items():
+            totals[value]['count'] += split['count']
+            totals[value]['amount'] += split['amount']
+    return dict(totals)
+
+
+def earliest_date(*values) -> date | None:
+    dates = [_as_date(v) for v in values if v is not None]
+    return min(dates) if dates else None
+
+
+def invalidate_closed_periods(kind: str, partner_ids: Iterable[int], earliest) -> None:
+    """
+    Record a write to ``kind`` rows of ``partner_ids`` dated as early as ``earliest``
+    (date or datetime). Versions of frames whose closed periods it touches are
+    rotated once the surrounding transaction commits.
+    """
+    if earliest is None:
+        return
+    earliest = _as_date(earliest)
+    today = timezone.localdate()
+    frames = [frame for frame in FRAMES if earliest < period_start(frame, today)]
+    if not frames:
+        return
+    scopes = ['all', *{pid for pid in partner_ids if pid is not None}]
+    keys = [VERSION_KEY.format(kind=kind, scope=scope, frame=frame) for scope in scopes for frame in frames]
+
+    def rotate():
+        try:
+            cache.set_many({k: uuid.uuid4().hex for k in keys}, None)
+        except Exception as e:
+            # The write is committed; closed-period entries may stay stale until PERIOD_STATS_CACHE_TTL.
+            logger.warning(f"Could not rotate {kind} period stats versions for scopes {scopes}: {e}")
+
+    transaction.on_commit(rotate)
@@ -3,11 +3,14 @@ from rest_framework import serializers
 from django.db.transaction import atomic
 from django.utils import timezone
 from django.db.models import Q
+from django.urls import reverse
 
 from authentication.models import Profile
 from uni_services.models import Freelancer
 
-from .models import Payout, PayoutSetting, Earnings
+from .models import Payout, PayoutSetting, PayoutTimeline, Earnings, PartnerStatement
+from .services import PayoutSettlement
+from .statements import month_start
 from django.db import transaction
 import re
 import json
@@ -33,6 +36,16 @@ class BasePayoutSerializer(serializers.ModelSerializer):
         return None
 
 
+class PayoutTimelineSerializer(serializers.ModelSerializer):
+    """Serializer for payout status history entries"""
+    changed_by_email = serializers.CharField(source='changed_by.email', read_only=True, default=None)
+
+    class Meta:
+        model = PayoutTimeline
+        fields = ['id', 'status', 'timestamp', 'note', 'changed_by', 'changed_by_email']
+        read_only_fields = fields
+
+
 class FreelancerProfileSerializer(serializers.ModelSerializer):
     """Serializer for Freelancer profile details"""
     user_email = serializers.CharField(source='user.email', read_only=True)
@@ -142,20 +155,13 @@ class PayoutCreateSerializer(BasePayoutSerializer):
         # Create the Payout
         payout = Payout.objects.create(**validated_data)
 
-        # Process earnings if provided
+        # Reserve the selected earnings (or all of the partner's available earnings)
         if earnings_ids:
-            earnings = Earnings.objects.filter(
-                id__in=earnings_ids,
-                status='available'
-            )
-
-            total_amount = 0
-            for earning in earnings:
-                earning.mark_as_processing(payout)
-                total_amount += earning.amount
-
+            _, total_amount = PayoutSettlement.reserve_earnings(payout, earnings_ids)
             payout.amount = total_amount
-            payout.save()
+            payout.save(update_fields=['amount', 'updated_at'])
+        else:
+            PayoutSettlement.reserve_earnings(payout)
 
         return payout
 
@@ -350,4 +356,37 @@ class EarningsUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Status cannot be directly changed. Use the appropriate endpoint instead."
             )
-        return data
\ No newline at end of file
+        return data
+
+class PartnerStatementSerializer(serializers.ModelSerializer):
+    """Serializer for rendered monthly statements"""
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PartnerStatement
+        fields = ['id', 'partner', 'period', 'format', 'status', 'content_hash', 'error',
+                  'created_at', 'completed_at', 'download_url']
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != PartnerStatement.Status.READY:
+            return None
+        url = reverse('statement-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class PartnerStatementRequestSerializer(serializers.Serializer):
+    """Input for requesting a statement: month as YYYY-MM, and a partner (staff only)"""
+    period = serializers.CharField()
+    format = serializers.ChoiceField(choices=PartnerStatement.Format.choices, default=PartnerStatement.Format.PDF)
+    partner_id = serializers.IntegerField(required=False)
+
+    def validate_period(self, value):
+        try:
+            period = month_start(value)
+        except ValueError:
+            raise serializers.ValidationError("Use the YYYY-MM format.")
+        if period > timezone.localdate():
+            raise serializers.ValidationError("Statements cannot be requested for future months.")
+        return period
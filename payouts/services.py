@@ -1,57 +1,206 @@
-
+from django.db import transaction
+from django.db.models import Case, CharField, F, Sum, Value, When
+from django.db.models.functions import Coalesce, Concat
 from django.utils import timezone
 
+from . import ledger
+from .models import Earnings, Payout, PayoutTimeline
+
+
+class PayoutSettlement:
+    """
+    Set-based payout state transitions.
+
+    Every transition locks the affected payouts with select_for_update, filters on the
+    allowed source statuses (so a retried call is a no-op for payouts that already moved)
+    and touches earnings with a fixed number of UPDATE statements, whatever the number of
+    rows involved. Timeline entries are written with a single bulk_create, and the
+    matching ledger movements are posted in the same transaction (see payouts.ledger).
+    """
+
+    OPEN_EARNING_STATUSES = [Earnings.Status.AVAILABLE, Earnings.Status.PROCESSING]
+
+    @staticmethod
+    def _lock(payout_ids, from_statuses):
+        """Lock payouts still in one of ``from_statuses``; returns {payout_id: partner_id}."""
+        return dict(
+            Payout.objects.select_for_update()
+            .filter(pk__in=list(payout_ids), status__in=from_statuses)
+            .values_list('pk', 'partner_id')
+        )
+
+    @staticmethod
+    def _record_timeline(payout_ids, status, note, user=None):
+        PayoutTimeline.objects.bulk_create([
+            PayoutTimeline(payout_id=pk, status=status, note=note, changed_by=user)
+            for pk in payout_ids
+        ])
+
+    @staticmethod
+    def _append_note(prefix, text):
+        return Concat(Coalesce(F('note'), Value('')), Value(f"\n{prefix}: {text}"), output_field=CharField())
+
+    @classmethod
+    def reserve_earnings(cls, payout, earnings_ids=None):
+        """
+        Link AVAILABLE earnings to ``payout`` and move them to PROCESSING in one UPDATE.
+        Without ``earnings_ids`` every unlinked AVAILABLE earning of the partner is reserved.
+        Returns (count, total_amount).
+        """
+        qs = Earnings.objects.filter(status=Earnings.Status.AVAILABLE, payout__isnull=True)
+        if earnings_ids is not None:
+            qs = qs.filter(id__in=earnings_ids)
+        else:
+            qs = qs.filter(partner_id=payout.partner_id)
+        with transaction.atomic():
+            ids = list(qs.select_for_update().values_list('id', flat=True))
+            if not ids:
+                return 0, 0
+            rows = Earnings.objects.filter(id__in=ids)
+            total = rows.aggregate(total=Sum('amount'))['total'] or 0
+            ledger.post(ledger.earnings_movements(
+                rows, Earnings.Status.PROCESSING, payout_id=payout.pk, memo=f"Reserved for payout {payout.pk}",
+            ))
+            count = rows.update(status=Earnings.Status.PROCESSING, payout=payout, updated_at=timezone.now())
+        return count, total
+
+    @classmethod
+    def settle_earnings(cls, partner_by_payout, now=None):
+        """
+        Mark every earning belonging to the given payouts as PAID: earnings linked to the
+        payout, plus the partner's unlinked open earnings (reserved by older flows). Two UPDATEs.
+        """
+        if not partner_by_payout:
+            return 0
+        now = now or timezone.now()
+        linked_qs = Earnings.objects.filter(
+            payout_id__in=list(partner_by_payout),
+            status__in=cls.OPEN_EARNING_STATUSES,
+        )
+        ledger.post(ledger.earnings_movements(linked_qs, Earnings.Status.PAID, memo="Paid out"))
+        linked = linked_qs.update(status=Earnings.Status.PAID, paid_date=now, updated_at=now)
+
+        # Unlinked earnings go to one payout per partner.
+        payout_for_partner = {}
+        for payout_id, partner_id in partner_by_payout.items():
+            payout_for_partner.setdefault(partner_id, payout_id)
+        unlinked_qs = Earnings.objects.filter(
+            partner_id__in=list(payout_for_partner),
+            payout__isnull=True,
+            status__in=cls.OPEN_EARNING_STATUSES,
+        )
+        ledger.post(ledger.earnings_movements(
+            unlinked_qs, Earnings.Status.PAID, payout_for_partner=payout_for_partner, memo="Paid out",
+        ))
+        unlinked = unlinked_qs.update(
+            status=Earnings.Status.PAID,
+            paid_date=now,
+            updated_at=now,
+            payout_id=Case(
+                *[When(partner_id=partner_id, then=Value(payout_id)) for partner_id, payout_id in payout_for_partner.items()],
+                output_field=CharField(),
+            ),
+        )
+        return linked + unlinked
+
+    @classmethod
+    def process(cls, payout_ids, user=None):
+        with transaction.atomic():
+            locked = cls._lock(payout_ids, [Payout.Status.PENDING])
+            if not locked:
+                return []
+            now = timezone.now()
+            payouts = Payout.objects.filter(pk__in=list(locked))
+            ledger.post(ledger.payout_movements(payouts, Payout.Status.PROCESSING, memo="Payout processing"))
+            payouts.update(status=Payout.Status.PROCESSING, processed_by=user, updated_at=now)
+            earnings = Earnings.objects.filter(payout_id__in=list(locked), status=Earnings.Status.AVAILABLE)
+            ledger.post(ledger.earnings_movements(earnings, Earnings.Status.PROCESSING, memo="Payout processing"))
+            earnings.update(status=Earnings.Status.PROCESSING, updated_at=now)
+            cls._record_timeline(locked, Payout.Status.PROCESSING, "Status changed to processing", user)
+        return list(locked)
+
+    @classmethod
+    def complete(cls, payout_ids, transaction_id=None, user=None):
+        """Complete payouts and mark their earnings PAID. Already-completed payouts are skipped."""
+        with transaction.atomic():
+            locked = cls._lock(payout_ids, [Payout.Status.PENDING, Payout.Status.PROCESSING])
+            if not locked:
+                return []
+            now = timezone.now()
+            fields = {'status': Payout.Status.COMPLETED, 'processed_date': now, 'updated_at': now}
+            if transaction_id:
+                fields['transaction_id'] = transaction_id
+            if user:
+                fields['processed_by'] = user
+            payouts = Payout.objects.filter(pk__in=list(locked))
+            ledger.post(ledger.payout_movements(payouts, Payout.Status.COMPLETED, memo="Payout completed"))
+            payouts.update(**fields)
+            cls.settle_earnings(locked, now=now)
+            cls._record_timeline(locked, Payout.Status.COMPLETED, "Status changed to completed", user)
+        return list(locked)
+
+    @classmethod
+    def _release(cls, payout_ids, to_status, note_prefix, text, user=None):
+        """Move open payouts to a terminal status and return their PROCESSING earnings to AVAILABLE."""
+        with transaction.atomic():
+            locked = cls._lock(payout_ids, [Payout.Status.PENDING, Payout.Status.PROCESSING])
+            if not locked:
+                return []
+            now = timezone.now()
+            fields = {'status': to_status, 'updated_at': now}
+            if text:
+                fields['note'] = cls._append_note(note_prefix, text)
+            if user:
+                fields['processed_by'] = user
+            payouts = Payout.objects.filter(pk__in=list(locked))
+            ledger.post(ledger.payout_movements(payouts, to_status, memo=f"Payout {to_status}"))
+            payouts.update(**fields)
+            earnings = Earnings.objects.filter(payout_id__in=list(locked), status=Earnings.Status.PROCESSING)
+            ledger.post(ledger.earnings_movements(
+                earnings, Earnings.Status.AVAILABLE, memo=f"Released from {to_status} payout",
+            ))
+            earnings.update(status=Earnings.Status.AVAILABLE, payout=None, updated_at=now)
+            cls._record_timeline(locked, to_status, f"Status changed to {to_status}", user)
+        return list(locked)
+
+    @classmethod
+    def cancel(cls, payout_ids, reason=None, user=None):
+        return cls._release(payout_ids, Payout.Status.CANCELLED, "Cancellation reason", reason, user)
+
+    @classmethod
+    def fail(cls, payout_ids, error_message, user=None):
+        return cls._release(payout_ids, Payout.Status.FAILED, "Error", error_message, user)
+
+
 class PaymentProcessor:
+    """
+    Manual payout actions. Payouts left in PROCESSING are sent to their provider by
+    the disbursement worker (payouts.disbursement) when one is configured for the method.
+    """
+
     @staticmethod
-    def process_payment(payout):
+    def process_payment(payout, user=None):
         """
         Start the payment processing
         """
-        payout.status = payout.Status.PROCESSING
-        payout.save()
-        
-        # Mark related earnings as processing
-        for payout_ref in payout.referrals.all():
-            if hasattr(payout_ref.referral, 'earning'):
-                earning = payout_ref.referral.earning
-                earning.mark_as_processing(payout)
-                
+        PayoutSettlement.process([payout.pk], user=user)
+        payout.refresh_from_db()
         return payout
-    
+
     @staticmethod
-    def complete_payment(payout, transaction_id=None):
+    def complete_payment(payout, transaction_id=None, user=None):
         """
         Mark payment as completed
         """
-        payout.status = payout.Status.COMPLETED
-        payout.processed_date = timezone.now()
-        if transaction_id:
-            payout.transaction_id = transaction_id
-        payout.save()
-        
-        # Mark related earnings as paid
-        for payout_ref in payout.referrals.all():
-            if hasattr(payout_ref.referral, 'earning'):
-                earning = payout_ref.referral.earning
-                earning.mark_as_paid()
-                
+        PayoutSettlement.complete([payout.pk], transaction_id=transaction_id, user=user)
+        payout.refresh_from_db()
         return payout
-    
+
     @staticmethod
-    def fail_payment(payout, error_message):
+    def fail_payment(payout, error_message, user=None):
         """
         Mark payment as failed
         """
-        payout.status = payout.Status.FAILED
-        payout.note = f"{payout.note or ''}\nError: {error_message}"
-        payout.save()
-        
-        # Reset earnings status to available
-        for payout_ref in payout.referrals.all():
-            if hasattr(payout_ref.referral, 'earning'):
-                earning = payout_ref.referral.earning
-                earning.status = 'available'
-                earning.payout = None
-                earning.save()
-                
-        return payout
\ No newline at end of file
+        PayoutSettlement.fail([payout.pk], error_message, user=user)
+        payout.refresh_from_db()
+        return payout
@@ -0,0 +1,405 @@
+"""
+Monthly earnings / payout statements for partners, rendered to PDF or CSV.
+
+Rendering runs off the request path: ``request_statement`` records a
+PartnerStatement and, once the transaction commits, hands it to a process-wide
+thread pool (``settings.PAYOUT_STATEMENTS['MAX_WORKERS']``). Clients poll the
+statement and download the file when it is ready.
+
+Output is cached by ``content_hash``: a sha256 over the partner, month, format,
+layout version and a fingerprint of the month's earnings and payouts (count,
+total and last update per status). While nothing in the month changes, the
+same hash maps to the already rendered file; a new, edited, re-statused or
+deleted earning/payout changes the fingerprint, so the next request renders a
+fresh statement and the superseded file is removed once it is ready.
+
+The ``generate_partner_statements`` command batch-renders a month for every
+partner with activity, with its own worker count.
+
+PDFs are drawn with reportlab, which needs no system libraries.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import html
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Earnings, PartnerStatement, Payout
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_WORKERS': 2,
+    # A pending/running statement older than this is assumed lost (worker restart) and re-queued.
+    'STALE_SECONDS': 10 * 60,
+}
+
+# Bump when the rendered layout changes so cached files are not reused.
+STATEMENT_VERSION = 1
+
+# Earnings that never become payable are listed but left out of the month's total.
+EXCLUDED_EARNING_STATUSES = (Earnings.Status.CANCELLED, Earnings.Status.REJECTED)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def statements_setting(name):
+    return getattr(settings, 'PAYOUT_STATEMENTS', {}).get(name, DEFAULTS[name])
+
+
+def month_start(value) -> date:
+    """First day of the month for a date/datetime or a 'YYYY-MM' string; ValueError otherwise."""
+
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.replace(day=1)
+    return datetime.strptime(str(value).strip(), '%Y-%m').date()
+
+
+def previous_month(today=None) -> date:
+    today = today or timezone.localdate()
+    return month_start(today.replace(day=1) - timedelta(days=1))
+
+
+def _month_bounds(period: date):
+    end = (period + timedelta(days=32)).replace(day=1)
+    return period, end
+
+
+def _sources(partner_id, period: date):
+    start, end = _month_bounds(period)
+    tz = timezone.get_current_timezone()
+    earnings = Earnings.objects.filter(partner_id=partner_id, date__gte=start, date__lt=end)
+    payouts = Payout.objects.filter(
+        partner_id=partner_id,
+        request_date__gte=timezone.make_aware(datetime.combine(start, time.min), tz),
+        request_date__lt=timezone.make_aware(datetime.combine(end, time.min), tz),
+    )
+    return earnings, payouts
+
+
+def _fingerprint(queryset) -> list:
+    rows = (
+        queryset.order_by('status').values('status')
+        .annotate(n=Count('pk'), total=Sum('amount'), last_update=Max('updated_at'))
+    )
+    return [[row['status'], row['n'], str(row['total']), row['last_update'].isoformat()] for row in rows]
+
+
+def content_hash(partner_id, period: date, fmt: str) -> str:
+    """Hash of everything a statement is rendered from (two grouped queries)."""
+
+    earnings, payouts = _sources(partner_id, period)
+    inputs = {
+        'version': STATEMENT_VERSION,
+        'partner': partner_id,
+        'period': period.isoformat(),
+        'format': fmt,
+        'earnings': _fingerprint(earnings),
+        'payouts': _fingerprint(payouts),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def active_partner_ids(period: date) -> list:
+    """Partners with an earning dated, or a payout requested, in the month."""
+
+    start, end = _month_bounds(period)
+    tz = timezone.get_current_timezone()
+    earning_partners = Earnings.objects.filter(date__gte=start, date__lt=end).values_list('partner_id', flat=True)
+    payout_partners = Payout.objects.filter(
+        request_date__gte=timezone.make_aware(datetime.combine(start, time.min), tz),
+        request_date__lt=timezone.make_aware(datetime.combine(end, time.min), tz),
+    ).values_list('partner_id', flat=True)
+    return sorted(set(earning_partners.order_by()) | set(payout_partners.order_by()))
+
+
+def prepare(partner, period: date, fmt: str, requested_by=None, force=False):
+    """
+    The statement for the current content of ``partner``'s month, as
+    (statement, needs_render). A ready or in-flight statement with the same hash
+    is returned as is unless ``force``; failed and stale ones are reset to pending.
+    """
+
+    digest = content_hash(partner.pk, period, fmt)
+    lookup = {'partner': partner, 'period': period, 'format': fmt, 'content_hash': digest}
+    statement = PartnerStatement.objects.filter(**lookup).first()
+    if statement is None:
+        try:
+            with transaction.atomic():
+                return PartnerStatement.objects.create(requested_by=requested_by, **lookup), True
+        except IntegrityError:
+            # Another request created it first; treat it like an existing row.
+            statement = PartnerStatement.objects.get(**lookup)
+
+    stale_before = timezone.now() - timedelta(seconds=statements_setting('STALE_SECONDS'))
+    in_flight = statement.status in (PartnerStatement.Status.PENDING, PartnerStatement.Status.RUNNING)
+    if statement.status == PartnerStatement.Status.READY and not force:
+        return statement, False
+    if in_flight and statement.created_at > stale_before and not force:
+        return statement, False
+
+    statement.status = PartnerStatement.Status.PENDING
+    statement.error = ''
+    statement.created_at = timezone.now()
+    statement.requested_by = requested_by or statement.requested_by
+    PartnerStatement.objects.filter(pk=statement.pk).update(
+        status=statement.status, error='', created_at=statement.created_at, requested_by=statement.requested_by,
+    )
+    return statement, True
+
+
+def request_statement(partner, period: date, fmt: str, requested_by=None) -> PartnerStatement:
+    """Return the partner's statement for the month, queueing a render if its content changed."""
+
+    statement, needs_render = prepare(partner, period, fmt, requested_by=requested_by)
+    if needs_render:
+        transaction.on_commit(lambda: submit(statement.pk))
+    return statement
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=statements_setting('MAX_WORKERS'), thread_name_prefix='statements',
+            )
+        return _executor
+
+
+def submit(statement_id):
+    return executor().submit(generate_in_worker, statement_id)
+
+
+def generate_in_worker(statement_id) -> bool:
+    """generate() for pool threads, which must not keep their database connection open."""
+
+    try:
+        return generate(statement_id)
+    finally:
+        connection.close()
+
+
+def generate(statement_id) -> bool:
+    """Render a pending statement; False if someone else claimed it or rendering failed."""
+
+    claimed = PartnerStatement.objects.filter(
+        pk=statement_id, status=PartnerStatement.Status.PENDING,
+    ).update(status=PartnerStatement.Status.RUNNING)
+    if not claimed:
+        return False
+
+    statement = PartnerStatement.objects.select_related('partner__user').get(pk=statement_id)
+    try:
+        content = RENDERERS[statement.format](statement_data(statement.partner, statement.period))
+        if statement.file:
+            statement.file.delete(save=False)
+        statement.file.save(
+            f"{statement.partner_id}-{statement.period:%Y-%m}-{statement.content_hash[:12]}.{statement.format}",
+            ContentFile(content),
+            save=False,
+        )
+    except Exception as exc:
+        logger.exception(f"Rendering statement {statement_id} failed")
+        PartnerStatement.objects.filter(pk=statement_id).update(
+            status=PartnerStatement.Status.FAILED, error=str(exc)[:1000],
+        )
+        return False
+
+    statement.status = PartnerStatement.Status.READY
+    statement.completed_at = timezone.now()
+    statement.save(update_fields=['file', 'status', 'completed_at'])
+    _prune_superseded(statement)
+    return True
+
+
+def _prune_superseded(statement: PartnerStatement) -> None:
+    """Drop older finished statements for the same month and format, files included."""
+
+    superseded = PartnerStatement.objects.filter(
+        partner_id=statement.partner_id,
+        period=statement.period,
+        format=statement.format,
+        status__in=[PartnerStatement.Status.READY, PartnerStatement.Status.FAILED],
+        created_at__lt=statement.created_at,
+    ).exclude(pk=statement.pk)
+    for old in superseded:
+        if old.file:
+            old.file.delete(save=False)
+    superseded.delete()
+
+
+def statement_data(partner, period: date) -> dict:
+    earnings, payouts = _sources(partner.pk, period)
+    earning_rows = list(
+        earnings.order_by('date', 'pk').values('date', 'source', 'status', 'amount', 'notes')
+    )
+    payout_rows = list(
+        payouts.order_by('request_date', 'pk').values(
+            'id', 'request_date', 'processed_date', 'status', 'payment_method', 'amount', 'transaction_id',
+        )
+    )
+
+    earnings_by_status = {}
+    for row in earning_rows:
+        earnings_by_status[row['status']] = earnings_by_status.get(row['status'], Decimal('0')) + row['amount']
+    payouts_by_status = {}
+    for row in payout_rows:
+        payouts_by_status[row['status']] = payouts_by_status.get(row['status'], Decimal('0')) + row['amount']
+
+    return {
+        'partner': {'id': partner.pk, 'name': partner.name, 'email': partner.user.email},
+        'period': period,
+        'generated_at': timezone.localtime(),
+        'earnings': earning_rows,
+        'payouts': payout_rows,
+        'earnings_by_status': earnings_by_status,
+        'payouts_by_status': payouts_by_status,
+        'total_earned': sum(
+            (amount for key, amount in earnings_by_status.items() if key not in EXCLUDED_EARNING_STATUSES),
+            Decimal('0'),
+        ),
+        'total_paid_out': payouts_by_status.get(Payout.Status.COMPLETED, Decimal('0')),
+    }
+
+
+def _label(choices, value) -> str:
+    try:
+        return str(choices(value).label)
+    except ValueError:
+        return value or ''
+
+
+def _when(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+    return value.isoformat()
+
+
+def _earning_cells(row) -> list:
+    return [
+        _when(row['date']), _label(Earnings.Source, row['source']),
+        _label(Earnings.Status, row['status']), f"{row['amount']:.2f}", row['notes'] or '',
+    ]
+
+
+def _payout_cells(row) -> list:
+    return [
+        row['id'], _when(row['request_date']), _when(row['processed_date']),
+        _label(Payout.Status, row['status']), _label(Payout.PaymentMethod, row['payment_method']),
+        f"{row['amount']:.2f}", row['transaction_id'] or '',
+    ]
+
+
+EARNING_HEADER = ['Date', 'Source', 'Status', 'Amount', 'Notes']
+PAYOUT_HEADER = ['Payout', 'Requested', 'Processed', 'Status', 'Method', 'Amount', 'Transaction']
+
+
+def render_csv(data) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Statement', data['partner']['name'], data['partner']['email'], f"{data['period']:%Y-%m}"])
+    writer.writerow(['Generated', _when(data['generated_at'])])
+    writer.writerow([])
+    writer.writerow(['Earnings'])
+    writer.writerow(EARNING_HEADER)
+    writer.writerows(_earning_cells(row) for row in data['earnings'])
+    writer.writerow([])
+    writer.writerow(['Payouts'])
+    writer.writerow(PAYOUT_HEADER)
+    writer.writerows(_payout_cells(row) for row in data['payouts'])
+    writer.writerow([])
+    writer.writerow(['Total earned', f"{data['total_earned']:.2f}"])
+    writer.writerow(['Total paid out', f"{data['total_paid_out']:.2f}"])
+    return buffer.getvalue().encode('utf-8')
+
+
+def render_pdf(data) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#eeeeee')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ])
+
+    def wrapped(cells):
+        # Notes can be long; let the last column wrap instead of running off the page.
+        return cells[:-1] + [Paragraph(html.escape(cells[-1]), styles['BodyText'])]
+
+    def table(header, rows, empty):
+        if not rows:
+            return Paragraph(empty, styles['Italic'])
+        result = Table([header] + rows, repeatRows=1, hAlign='LEFT')
+        result.setStyle(table_style)
+        return result
+
+    partner = data['partner']
+    story = [
+        Paragraph(f"Statement for {data['period']:%B %Y}", styles['Title']),
+        Paragraph(html.escape(f"{partner['name']} <{partner['email']}>"), styles['Normal']),
+        Paragraph(f"Generated {_when(data['generated_at'])}", styles['Normal']),
+        Spacer(1, 6 * mm),
+        table(
+            ['Summary', 'Amount'],
+            [['Total earned', f"{data['total_earned']:.2f}"], ['Total paid out', f"{data['total_paid_out']:.2f}"]]
+            + [[f"Earnings {_label(Earnings.Status, key).lower()}", f"{amount:.2f}"]
+               for key, amount in sorted(data['earnings_by_status'].items())],
+            '',
+        ),
+        Spacer(1, 6 * mm),
+        Paragraph('Earnings', styles['Heading2']),
+        table(EARNING_HEADER, [wrapped(_earning_cells(row)) for row in data['earnings']], 'No earnings this month.'),
+        Spacer(1, 6 * mm),
+        Paragraph('Payouts', styles['Heading2']),
+        table(PAYOUT_HEADER, [_payout_cells(row) for row in data['payouts']], 'No payouts this month.'),
+    ]
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(
+        buffer, pagesize=A4, title=f"Statement {data['period']:%Y-%m}",
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+    ).build(story)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    PartnerStatement.Format.PDF: render_pdf,
+    PartnerStatement.Format.CSV: render_csv,
+}
+
+
+def generate_many(statement_ids, workers=None) -> dict:
+    """Render statements on a dedicated pool of ``workers`` threads; {'ready': n, 'failed': n}."""
+
+    counts = {'ready': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=workers or statements_setting('MAX_WORKERS')) as pool:
+        for ok in pool.map(generate_in_worker, statement_ids):
+            counts['ready' if ok else 'failed'] += 1
+    return counts
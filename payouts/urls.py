@@ -2,12 +2,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from payouts.views import EarningsViewSet, PayoutSettingViewSet, PayoutViewSet
+from payouts.views import EarningsViewSet, PartnerStatementViewSet, PayoutSettingViewSet, PayoutViewSet
 
 router = DefaultRouter()
 router.register(r'payouts', PayoutViewSet, basename='payout')
 router.register(r'payout-settings', PayoutSettingViewSet)
 router.register(r'earnings', EarningsViewSet)
+router.register(r'statements', PartnerStatementViewSet, basename='statement')
 
 urlpatterns = [
     path('', include(router.urls)),
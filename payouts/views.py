@@ -1,17 +1,20 @@
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import mixins, viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Sum, Q, F, Case, When, IntegerField, DecimalField
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay
+from django.http import FileResponse
 from django.utils import timezone
 
 from authentication.models import Profile
 
 
-from .models import Payout, PayoutSetting, Earnings
+from .models import Payout, PayoutSetting, Earnings, PartnerBalance, PartnerStatement
 from datetime import datetime
+from decimal import Decimal
 from rest_framework import serializers
 
 from .serializers import (
@@ -22,13 +25,31 @@ from .serializers import (
     EarningsSerializer, 
     EarningsCreateSerializer, 
     EarningsUpdateSerializer,
-
+    PayoutTimelineSerializer,
+    PartnerStatementSerializer,
+    PartnerStatementRequestSerializer,
 )
 from django.db.transaction import atomic
 from .services import PaymentProcessor
+from .exports import StreamingExportMixin
+from .ingest import ingest_earnings, parse_rows
+from . import ledger, period_stats, statements
 import logging
 
 logger = logging.getLogger(__name__)
+
+
+def _period_stats_scope(request, partner_id=None):
+    """period_stats scope for the request: the caller's own profile, or a partner / 'all' for staff."""
+    if not request.user.is_staff:
+        return Profile.objects.filter(user=request.user).values_list('pk', flat=True).first()
+    if partner_id:
+        try:
+            return int(str(partner_id).split('?')[0])
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid partner_id received for stats: {partner_id}")
+    return 'all'
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
@@ -48,7 +69,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 logger = logging.getLogger(__name__)
 
-class PayoutViewSet(viewsets.ModelViewSet):
+class PayoutViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Payout.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
@@ -56,6 +77,21 @@ class PayoutViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'payment_method']
     search_fields = ['id', 'partner__name', 'note', 'client_notes']
     ordering_fields = ['request_date', 'processed_date', 'amount']
+    export_filename = 'payouts'
+    export_keyset = ('request_date', 'id')
+    export_date_field = 'request_date'
+    export_columns = [
+        ('id', 'id'),
+        ('partner_id', 'partner_id'),
+        ('partner_email', 'partner.user.email'),
+        ('amount', 'amount'),
+        ('status', 'status'),
+        ('payment_method', 'payment_method'),
+        ('request_date', 'request_date'),
+        ('processed_date', 'processed_date'),
+        ('transaction_id', 'transaction_id'),
+        ('batch_id', 'batch_id'),
+    ]
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -181,9 +217,7 @@ class PayoutViewSet(viewsets.ModelViewSet):
         if not payout.can_process:
             return Response({'error': 'Payout cannot be processed'}, status=status.HTTP_400_BAD_REQUEST)
         
-        payout = PaymentProcessor.process_payment(payout)
-        payout.processed_by = request.user
-        payout.save()
+        payout = PaymentProcessor.process_payment(payout, user=request.user)
         
         serializer = PayoutSerializer(payout)
         return Response(serializer.data)
@@ -198,7 +232,7 @@ class PayoutViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Payout cannot be completed'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            payout = PaymentProcessor.complete_payment(payout, transaction_id, request.user)
+            payout = PaymentProcessor.complete_payment(payout, transaction_id, user=request.user)
             serializer = PayoutSerializer(payout)
             return Response(serializer.data)
         except Exception as e:
@@ -215,9 +249,7 @@ class PayoutViewSet(viewsets.ModelViewSet):
         if payout.status not in [Payout.Status.PENDING, Payout.Status.PROCESSING]:
             return Response({'error': 'Payout cannot be marked as failed'}, status=status.HTTP_400_BAD_REQUEST)
         
-        payout = PaymentProcessor.fail_payment(payout, error_message)
-        payout.processed_by = request.user
-        payout.save()
+        payout = PaymentProcessor.fail_payment(payout, error_message, user=request.user)
         
         serializer = PayoutSerializer(payout)
         return Response(serializer.data)
@@ -236,59 +268,54 @@ class PayoutViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get summary statistics of payouts"""
-        queryset = self.get_queryset()
-        
+        """Get summary statistics of payouts (read from the materialized partner balances)"""
+        balances = PartnerBalance.objects.all()
+        if not request.user.is_staff:
+            balances = balances.filter(partner__user=request.user)
+        elif request.query_params.get('partner_id'):
+            balances = balances.filter(partner_id=request.query_params['partner_id'])
+        totals = ledger.balance_totals(balances)
+
         summary_data = {
-            'total_payouts': queryset.count(),
-            'pending_amount': queryset.filter(status=Payout.Status.PENDING).aggregate(total=Sum('amount'))['total'] or 0,
-            'completed_amount': queryset.filter(status=Payout.Status.COMPLETED).aggregate(total=Sum('amount'))['total'] or 0,
-            'processing_amount': queryset.filter(status=Payout.Status.PROCESSING).aggregate(total=Sum('amount'))['total'] or 0,
-            'total_paid': queryset.filter(status=Payout.Status.COMPLETED).aggregate(total=Sum('amount'))['total'] or 0
+            'total_payouts': totals['payout_count'],
+            'pending_amount': totals['payouts_pending'],
+            'completed_amount': totals['payouts_completed'],
+            'processing_amount': totals['payouts_processing'],
+            'total_paid': totals['payouts_completed'],
         }
         
         return Response(summary_data)
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get detailed statistics for payouts"""
-        queryset = self.get_queryset()
+        """Get detailed statistics for payouts (closed periods come from period_stats' cache)"""
         time_frame = request.query_params.get('time_frame', 'monthly')
-        
-        if time_frame == 'monthly':
-            truncate_func = TruncMonth('request_date')
-        elif time_frame == 'weekly':
-            truncate_func = TruncWeek('request_date')
-        else:  # default to daily
-            truncate_func = TruncDay('request_date')
-        
-        # Get payment method distribution
-        payment_methods = queryset.values('payment_method').annotate(
-            count=Count('id'),
-            total_amount=Sum('amount')
-        ).order_by('-count')
-        
-        # Get timeline data
-        timeline_data = queryset.annotate(
-            date=truncate_func
-        ).values('date').annotate(
-            count=Count('id'),
-            total_amount=Sum('amount')
-        ).order_by('date')
-        
-        # Get status distribution
-        status_data = queryset.values('status').annotate(
-            count=Count('id'),
-            total_amount=Sum('amount')
+        scope = _period_stats_scope(request, request.query_params.get('partner_id'))
+        buckets = period_stats.get_buckets('payouts', scope, time_frame) if scope is not None else []
+
+        total_payouts = sum(b['count'] for b in buckets)
+        total_amount = sum((b['amount'] for b in buckets), Decimal('0'))
+        payment_methods = sorted(
+            period_stats.merge_breakdown(buckets, 'payment_method').items(),
+            key=lambda item: -item[1]['count'],
         )
-        
+
         stats = {
-            'total_payouts': queryset.count(),
-            'total_amount': queryset.aggregate(total=Sum('amount'))['total'] or 0,
-            'average_amount': queryset.aggregate(avg=Sum('amount') / Count('id'))['avg'] if queryset.count() > 0 else 0,
-            'by_status': status_data,
-            'by_payment_method': payment_methods,
-            'timeline': timeline_data
+            'total_payouts': total_payouts,
+            'total_amount': total_amount,
+            'average_amount': total_amount / total_payouts if total_payouts else 0,
+            'by_status': [
+                {'status': value, 'count': split['count'], 'total_amount': split['amount']}
+                for value, split in period_stats.merge_breakdown(buckets, 'status').items()
+            ],
+            'by_payment_method': [
+                {'payment_method': value, 'count': split['count'], 'total_amount': split['amount']}
+                for value, split in payment_methods
+            ],
+            'timeline': [
+                {'date': b['period'], 'count': b['count'], 'total_amount': b['amount']}
+                for b in buckets
+            ],
         }
         
         return Response(stats)
@@ -296,56 +323,30 @@ class PayoutViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def monthly_earnings(self, request):
         """Get monthly earnings breakdown"""
-        queryset = self.get_queryset()
-        
-        # For non-staff users, restrict to their own payouts
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(partner__user=self.request.user)
-        
-        # Get partner filter if provided
-        partner_id = self.request.query_params.get('partner_id')
-        if partner_id:
-            # Clean the partner_id to handle malformed URL parameters
-            if '?' in partner_id:
-                partner_id = partner_id.split('?')[0]
-                
-            try:
-                partner_id = int(partner_id)
-                queryset = queryset.filter(partner__id=partner_id)
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid partner_id received in monthly_earnings: {partner_id}")
-        
+        scope = _period_stats_scope(request, request.query_params.get('partner_id'))
+        if scope is None:
+            return Response([])
+
         # Get year filter if provided, default to current year
-        year = self.request.query_params.get('year', timezone.now().year)
-        queryset = queryset.filter(request_date__year=year)
-        
-        # Group by month and get totals
-        monthly_data = queryset.annotate(
-            month=TruncMonth('request_date')
-        ).values('month').annotate(
-            completed_count=Count(Case(When(status=Payout.Status.COMPLETED, then=1), output_field=IntegerField())),
-            completed_amount=Sum(Case(
-                When(status=Payout.Status.COMPLETED, then=F('amount')),
-                default=0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )),
-            pending_count=Count(Case(When(status=Payout.Status.PENDING, then=1), output_field=IntegerField())),
-            pending_amount=Sum(Case(
-                When(status=Payout.Status.PENDING, then=F('amount')),
-                default=0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )),
-            processing_count=Count(Case(When(status=Payout.Status.PROCESSING, then=1), output_field=IntegerField())),
-            processing_amount=Sum(Case(
-                When(status=Payout.Status.PROCESSING, then=F('amount')),
-                default=0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )),
-            total_count=Count('id'),
-            total_amount=Sum('amount')
-        ).order_by('month')
-        
-        return Response(list(monthly_data))
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid year'}, status=status.HTTP_400_BAD_REQUEST)
+
+        monthly_data = []
+        for bucket in period_stats.get_buckets('payouts', scope, 'monthly'):
+            if bucket['period'].year != year:
+                continue
+            row = {'month': bucket['period']}
+            for payout_status in (Payout.Status.COMPLETED, Payout.Status.PENDING, Payout.Status.PROCESSING):
+                split = bucket['by_status'].get(payout_status, {'count': 0, 'amount': Decimal('0')})
+                row[f"{payout_status}_count"] = split['count']
+                row[f"{payout_status}_amount"] = split['amount']
+            row['total_count'] = bucket['count']
+            row['total_amount'] = bucket['amount']
+            monthly_data.append(row)
+
+        return Response(monthly_data)
     
     @action(detail=False, methods=['post'])
     def force_update_earnings(self, request, pk=None):
@@ -357,25 +358,25 @@ class PayoutViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Staff only action'}, status=status.HTTP_403_FORBIDDEN)
         
         payout = self.get_object()
-        from payouts.models import Earnings
         
         try:
-            # Get all available earnings for this partner
-            available_earnings = Earnings.objects.filter(
+            # Move all available earnings for this partner to paid in a single UPDATE
+            now = timezone.now()
+            earnings = Earnings.objects.filter(
                 partner=payout.partner,
                 status=Earnings.Status.AVAILABLE
             )
-            
-            # Update them to paid status
-            update_count = 0
-            for earning in available_earnings:
-                old_status = earning.status
-                earning.status = Earnings.Status.PAID
-                earning.payout = payout
-                earning.paid_date = timezone.now()
-                earning.save()
-                update_count += 1
-                logger.info(f"Force updated earning {earning.id} from {old_status} to {earning.status}")
+            with atomic():
+                ledger.post(ledger.earnings_movements(
+                    earnings, Earnings.Status.PAID, payout_id=payout.pk, memo=f"Force-paid for payout {payout.pk}",
+                ))
+                update_count = earnings.update(
+                    status=Earnings.Status.PAID,
+                    payout=payout,
+                    paid_date=now,
+                    updated_at=now,
+                )
+            logger.info(f"Force updated {update_count} earnings to paid for payout {payout.id}")
             
             return Response({
                 'success': True,
@@ -748,7 +749,7 @@ class PayoutSettingViewSet(viewsets.ModelViewSet):
         # Strip strings and return
         return {k: v.strip() if isinstance(v, str) else v for k, v in details.items()}
     
-class EarningsViewSet(viewsets.ModelViewSet):
+class EarningsViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Earnings.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
@@ -756,6 +757,24 @@ class EarningsViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'source', 'partner']
     search_fields = ['partner__name', 'notes']
     ordering_fields = ['date', 'amount', 'created_at']
+    # start_date / end_date are already applied to `date` by get_queryset
+    export_filename = 'earnings'
+    export_keyset = ('date', 'id')
+    export_columns = [
+        ('id', 'id'),
+        ('partner_id', 'partner_id'),
+        ('partner_email', 'partner.user.email'),
+        ('amount', 'amount'),
+        ('source', 'source'),
+        ('status', 'status'),
+        ('date', 'date'),
+        ('payout_id', 'payout_id'),
+        ('approval_date', 'approval_date'),
+        ('paid_date', 'paid_date'),
+        ('created_at', 'created_at'),
+    ]
+    # get_queryset filters that the materialized balance cannot answer
+    SUMMARY_FILTER_PARAMS = {'start_date', 'end_date', 'min_amount', 'max_amount', 'payout_status'}
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -839,22 +858,51 @@ class EarningsViewSet(viewsets.ModelViewSet):
         Determine the initial status for an earnings record
         based on its source and whether it has a referral
         """
-        # Referral earnings always need approval
-        if source == Earnings.Source.REFERRAL:
-            return Earnings.Status.PENDING_APPROVAL
-        
-        # Your business logic for other source types
-        # You can customize this based on your requirements
-        if source in [Earnings.Source.PROMOTION]:
-            # Promotions may also need approval
-            return Earnings.Status.PENDING_APPROVAL
-        elif source == Earnings.Source.BONUS:
-            # Bonuses might be immediately available or need approval
-            # Depending on your business rules
-            return Earnings.Status.PENDING_APPROVAL  # or AVAILABLE
-        
-        # Default for other source types
-        return Earnings.Status.AVAILABLE
+        # Shared with bulk ingestion (payouts.ingest)
+        return Earnings.initial_status_for(source)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Admin bulk import. Send a JSON list (or {"rows": [...]}) as the body, or upload
+        a CSV/JSON file as `file`. ?partial=true inserts the valid rows even if others
+        fail; ?dry_run=true only validates.
+        """
+        if not request.user.is_staff:
+            return Response(
+                {'error': 'Only admin users can import earnings'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get('file')
+        try:
+            if upload:
+                fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                rows = parse_rows(upload.read(), fmt)
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get('rows')
+                if not isinstance(rows, list):
+                    raise ValueError('Provide a list of rows or upload a CSV/JSON file as "file"')
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        truthy = ('1', 'true', 'yes')
+        result = ingest_earnings(
+            rows,
+            created_by=request.user,
+            partial=request.query_params.get('partial', '').lower() in truthy,
+            dry_run=request.query_params.get('dry_run', '').lower() in truthy,
+        )
+        if result.created:
+            response_status = status.HTTP_201_CREATED
+        elif result.errors:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        logger.info(f"Bulk earnings import by {request.user.email}: {result.created}/{result.total} created")
+        return Response(result.as_dict(), status=response_status)
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -949,8 +997,21 @@ class EarningsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get summary of earnings with proper status filtering"""
+        if not set(request.query_params) & self.SUMMARY_FILTER_PARAMS:
+            # Unfiltered: a single PartnerBalance row (or the sum of them for staff)
+            balances = PartnerBalance.objects.all()
+            if not request.user.is_staff:
+                balances = balances.filter(partner__user=request.user)
+            totals = ledger.balance_totals(balances)
+            return Response({
+                'total_earnings': sum(totals[bucket] for bucket in ledger.EARNING_BUCKETS.values()),
+                'available_earnings': totals[Earnings.Status.AVAILABLE],
+                'pending_approval_earnings': totals[Earnings.Status.PENDING_APPROVAL],
+                'paid_earnings': totals[Earnings.Status.PAID],
+                'rejected_earnings': totals[Earnings.Status.REJECTED],
+            })
+
         queryset = self.get_queryset()
-        
         summary_data = {
             'total_earnings': queryset.aggregate(total=Sum('amount'))['total'] or 0,
             'available_earnings': queryset.filter(
@@ -973,6 +1034,22 @@ class EarningsViewSet(viewsets.ModelViewSet):
     def stats(self, request):
         """Get monthly/weekly stats for earnings"""
         time_frame = request.query_params.get('time_frame', 'monthly')
+
+        if not set(request.query_params) & self.SUMMARY_FILTER_PARAMS:
+            # Unfiltered: closed periods from period_stats' cache, only the open one is queried
+            scope = _period_stats_scope(request)
+            buckets = period_stats.get_buckets('earnings', scope, time_frame) if scope is not None else []
+            paid = Earnings.Status.PAID
+            return Response([
+                {
+                    'period': b['period'],
+                    'total_count': b['count'],
+                    'total_amount': b['amount'],
+                    'paid_count': b['by_status'].get(paid, {}).get('count', 0),
+                    'paid_amount': b['by_status'].get(paid, {}).get('amount', Decimal('0')),
+                }
+                for b in buckets
+            ])
         
         if time_frame == 'monthly':
             truncate_func = TruncMonth('date')
@@ -997,4 +1074,76 @@ class EarningsViewSet(viewsets.ModelViewSet):
             ))
         ).order_by('period')
         
-        return Response(list(stats))
\ No newline at end of file
+        return Response(list(stats))
+
+class PartnerStatementFilter(django_filters.FilterSet):
+    # 'format' itself is DRF's URL_FORMAT_OVERRIDE (?format=pdf would pick a renderer).
+    file_format = django_filters.ChoiceFilter(field_name='format', choices=PartnerStatement.Format.choices)
+    period = django_filters.CharFilter(method='filter_period')
+
+    class Meta:
+        model = PartnerStatement
+        fields = ['status', 'partner']
+
+    def filter_period(self, queryset, name, value):
+        """YYYY-MM like the POST, or any date within the month."""
+        try:
+            period = statements.month_start(value)
+        except ValueError:
+            try:
+                period = statements.month_start(datetime.strptime(value.strip(), '%Y-%m-%d').date())
+            except ValueError:
+                raise serializers.ValidationError({'period': ['Use the YYYY-MM format.']})
+        return queryset.filter(period=period)
+
+
+class PartnerStatementViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Monthly PDF/CSV statements (see payouts.statements). POST queues a render and
+    answers 202 until the file is ready; partners only see their own statements.
+    List filters: ?period=YYYY-MM, ?file_format=pdf|csv, ?status, ?partner.
+    """
+    serializer_class = PartnerStatementSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = PartnerStatementFilter
+
+    def get_queryset(self):
+        queryset = PartnerStatement.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(partner__user=self.request.user)
+        return queryset
+
+    def create(self, request):
+        serializer = PartnerStatementRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if request.user.is_staff and data.get('partner_id'):
+            partner = Profile.objects.filter(pk=data['partner_id']).select_related('user').first()
+        else:
+            partner = Profile.objects.filter(user=request.user).select_related('user').first()
+        if partner is None:
+            return Response({'error': 'Partner profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        statement = statements.request_statement(partner, data['period'], data['format'], requested_by=request.user)
+        ready = statement.status == PartnerStatement.Status.READY
+        return Response(
+            self.get_serializer(statement).data,
+            status=status.HTTP_200_OK if ready else status.HTTP_202_ACCEPTED,
+        )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        statement = self.get_object()
+        if statement.status != PartnerStatement.Status.READY or not statement.file:
+            return Response(
+                {'error': f'Statement is {statement.status}', 'status': statement.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            statement.file.open('rb'),
+            as_attachment=True,
+            filename=f"statement-{statement.period:%Y-%m}.{statement.format}",
+        )
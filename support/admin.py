@@ -1,8 +1,20 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 
+from . import stats as ticket_stats
 from .models import SupportTicket, Comment, SupportTicketAttachment, ActivityLog
 
+
+def _bulk_update(queryset, **changes):
+    """Set-based update that, like a ticket save, drops the cached support stats once committed."""
+    with transaction.atomic():
+        updated = queryset.update(**changes)
+        if updated:
+            transaction.on_commit(ticket_stats.invalidate)
+    return updated
+
+
 class CommentInline(admin.TabularInline):
     model = Comment
     extra = 0
@@ -91,22 +103,22 @@ class SupportTicketAdmin(admin.ModelAdmin):
     tenant_scope.short_description = 'Tenant'
 
     def assign_to_me(self, request, queryset):
-        updated = queryset.update(assigned_to=request.user)
+        updated = _bulk_update(queryset, assigned_to=request.user)
         self.message_user(request, f'{updated} tickets assigned to you.')
     assign_to_me.short_description = 'Assign selected tickets to me'
 
     def mark_status_in_progress(self, request, queryset):
-        updated = queryset.exclude(status='closed').update(status='in_progress')
+        updated = _bulk_update(queryset.exclude(status='closed'), status='in_progress')
         self.message_user(request, f'{updated} tickets moved to in progress.')
     mark_status_in_progress.short_description = 'Mark selected as in progress'
 
     def mark_status_resolved(self, request, queryset):
-        updated = queryset.exclude(status='closed').update(status='resolved')
+        updated = _bulk_update(queryset.exclude(status='closed'), status='resolved')
         self.message_user(request, f'{updated} tickets marked resolved.')
     mark_status_resolved.short_description = 'Mark selected as resolved'
 
     def mark_status_closed(self, request, queryset):
-        updated = queryset.update(status='closed')
+        updated = _bulk_update(queryset, status='closed')
         self.message_user(request, f'{updated} tickets closed.')
     mark_status_closed.short_description = 'Close selected tickets'
 
@@ -2,13 +2,14 @@ from django.db import models
 
 from authentication.models import User
 from tenancy.tenant_scope import TENANT_KIND_CHOICES
+from fred.model_mixins import DirtyFieldsMixin
 
 
 
 
 
 
-class SupportTicket(models.Model):
+class SupportTicket(DirtyFieldsMixin, models.Model):
     ISSUE_CATEGORIES = (
         ('technical', 'Technical Issue'),
         ('payment', 'Payment/Commission'),
@@ -107,6 +108,11 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Per-ticket history and the cross-ticket feed, both read newest first by keyset.
+            models.Index(fields=['ticket', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.get_activity_type_display()} by {self.performed_by} on {self.ticket}"
\ No newline at end of file
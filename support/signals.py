@@ -4,8 +4,12 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.core.paginator import Paginator, EmptyPage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from rest_framework.exceptions import NotFound
 
+from . import stats as ticket_stats
 from .models import SupportTicket, Comment, SupportTicketAttachment, ActivityLog
 from .serializers import (
     SupportTicketSerializer, 
@@ -16,6 +20,23 @@ from .serializers import (
     ActivityLogSerializer
 )
 
+
+# Signal receivers (connected by SupportConfig.ready)
+
+@receiver(post_save, sender=SupportTicket)
+@receiver(post_delete, sender=SupportTicket)
+def invalidate_ticket_stats(sender, instance, created=False, **kwargs):
+    """Drop every cached stats scope once a ticket is added, removed or moves between counters."""
+
+    if kwargs.get('raw'):
+        return
+    if kwargs.get('signal') is post_save and not created and not (instance.changed_fields() & ticket_stats.TRACKED_FIELDS):
+        return
+    transaction.on_commit(ticket_stats.invalidate)
+
+
+# Earlier activity-logging viewsets, kept for reference; support.views serves the API.
+
 class SupportTicketViewSet(viewsets.ModelViewSet):
     queryset = SupportTicket.objects.all().order_by('-created_at')
     serializer_class = SupportTicketSerializer
@@ -277,4 +298,4 @@ class CommentViewSet(viewsets.ModelViewSet):
                 'comment_id': comment.id,
                 'content_preview': comment.content[:100] + ('...' if len(comment.content) > 100 else '')
             }
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,151 @@
+"""
+Support ticket statistics for the dashboards.
+
+``ticket_stats`` computes the counters and the average resolution time in one
+aggregate query (conditional counts plus a database-side ``Avg`` over
+``updated_at - created_at`` of resolved tickets); ``weekly_breakdown`` groups the
+same figures by the week tickets were opened, also in one query.
+
+Results are cached per visibility scope, i.e. what ``visible_tickets`` would
+return for the caller: admin, agent <id> or submitter <id>, and the tenant (or all
+tenants). Keys carry a generation number that ``invalidate`` bumps, so one
+cache write drops every scope at once; support.signals calls it when a ticket is
+created or deleted, or its status, priority, assignee, submitter or tenant
+changes. SUPPORT_STATS_CACHE_TTL bounds everything else (e.g. edits to
+resolved tickets moving ``updated_at``). The generation lives in the shared cache
+(settings.CACHES), so a bump by one worker process reaches every other. When the
+cache is unreachable, stats are computed uncached and invalidation is logged and
+skipped. Admin bulk actions invalidate like a save does.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from authentication.models import User
+from tenancy.tenant_scope import effective_tenant_from_request, wants_all_tenants
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = "support:stats:{}:{}"
+GENERATION_KEY = "support:stats:generation"
+MAX_WEEKS = 52
+
+# Fields whose change moves a ticket between counters or visibility scopes.
+TRACKED_FIELDS = {'status', 'priority', 'assigned_to', 'submitted_by', 'tenant_kind', 'tenant_id'}
+
+
+def _cache_ttl() -> int:
+    return getattr(settings, "SUPPORT_STATS_CACHE_TTL", 5 * 60)
+
+
+def scope_key(request) -> str:
+    user = request.user
+    if user.is_staff and user.user_type == User.Types.ADMIN:
+        role = "admin"
+    elif user.is_staff and user.user_type == User.Types.SUPPORT_AGENT:
+        role = f"agent:{user.pk}"
+    else:
+        role = f"submitter:{user.pk}"
+    tenant = "all" if wants_all_tenants(request) else ":".join(effective_tenant_from_request(request))
+    return f"{role}:{tenant}"
+
+
+def _generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Never reuse a number after eviction: entries from before could still be cached.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate() -> None:
+    try:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+    except Exception as e:
+        # Runs after commit; cached stats then age out with SUPPORT_STATS_CACHE_TTL.
+        logger.warning(f"Could not invalidate support stats: {e}")
+
+
+def _hours(duration) -> float:
+    return round(duration.total_seconds() / 3600, 1) if duration else 0
+
+
+def _figures():
+    resolved = Q(status='resolved')
+    return {
+        'total': Count('pk'),
+        'open': Count('pk', filter=Q(status='open')),
+        'in_progress': Count('pk', filter=Q(status='in_progress')),
+        'resolved': Count('pk', filter=resolved),
+        'urgent': Count('pk', filter=Q(priority='urgent')),
+        'avg_resolution': Avg(
+            ExpressionWrapper(F('updated_at') - F('created_at'), output_field=DurationField()),
+            filter=resolved,
+        ),
+    }
+
+
+def _as_response(row) -> dict:
+    return {
+        'totalTickets': row['total'],
+        'openTickets': row['open'],
+        'inProgressTickets': row['in_progress'],
+        'resolvedTickets': row['resolved'],
+        'averageResolutionTime': _hours(row['avg_resolution']),
+        'urgentTickets': row['urgent'],
+    }
+
+
+def ticket_stats(tickets) -> dict:
+    return _as_response(tickets.order_by().aggregate(**_figures()))
+
+
+def weekly_breakdown(tickets, weeks) -> list[dict]:
+    """The same figures per week of ticket creation, oldest week first, for the last ``weeks`` weeks."""
+
+    since = timezone.now() - timedelta(weeks=weeks)
+    rows = (
+        tickets.filter(created_at__gte=since)
+        .annotate(week=TruncWeek('created_at'))
+        .order_by()
+        .values('week')
+        .annotate(**_figures())
+        .order_by('week')
+    )
+    return [{'week': row['week'].date().isoformat(), **_as_response(row)} for row in rows]
+
+
+def cached_stats(request, tickets, weeks=None) -> dict:
+    """ticket_stats (plus ``weekly`` when ``weeks`` is given) for the caller's scope, cached."""
+
+    try:
+        key = STATS_CACHE_KEY.format(_generation(), scope_key(request))
+        if weeks:
+            key += f":weeks:{weeks}"
+        stats = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Support stats cache unavailable, computing uncached: {e}")
+        key = stats = None
+    if stats is None:
+        stats = ticket_stats(tickets)
+        if weeks:
+            stats['weekly'] = weekly_breakdown(tickets, weeks)
+        if key is not None:
+            try:
+                cache.set(key, stats, _cache_ttl())
+            except Exception as e:
+                logger.warning(f"Could not cache support stats: {e}")
+    return stats
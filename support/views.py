@@ -1,8 +1,6 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.core.paginator import Paginator, EmptyPage
-from rest_framework.exceptions import NotFound
 
 from django.db import models
 
@@ -14,6 +12,7 @@ from tenancy.tenant_scope import (
     wants_all_tenants,
 )
 
+from . import stats as ticket_stats
 from .models import SupportTicket, Comment, SupportTicketAttachment, ActivityLog
 from .serializers import (
     SupportTicketSerializer,
@@ -51,6 +50,58 @@ class IsSupportAgentAssignedToTicket(permissions.BasePermission):
             return obj.assigned_to == user or obj.submitted_by == user
         return obj.submitted_by == user
     
+ACTIVITY_PAGE_SIZE = 20
+MAX_ACTIVITY_PAGE_SIZE = 100
+
+
+def activity_page(request, activities):
+    """One newest-first keyset page of ``activities``: rows older than the ?before anchor."""
+    try:
+        limit = min(max(int(request.query_params.get('limit', ACTIVITY_PAGE_SIZE)), 1), MAX_ACTIVITY_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    before = request.query_params.get('before')
+    if before:
+        anchor = None
+        if before.isdigit():
+            anchor = activities.filter(pk=before).values('created_at', 'id').first()
+        if anchor is None:
+            return Response({"error": f"Unknown activity cursor: {before}"}, status=status.HTTP_400_BAD_REQUEST)
+        activities = activities.filter(
+            models.Q(created_at__lt=anchor['created_at']) |
+            models.Q(created_at=anchor['created_at'], id__lt=anchor['id'])
+        )
+
+    page = list(activities.select_related('performed_by').order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return Response({
+        'activities': ActivityLogSerializer(page, many=True).data,
+        'pagination': {
+            'limit': limit,
+            'hasMore': has_more,
+            'nextCursor': page[-1].id if has_more else None,
+        }
+    })
+
+
+def visible_tickets(request, qs=None):
+    """Tickets the requesting user may see: admins all, agents theirs, others their own."""
+    user = request.user
+    qs = SupportTicket.objects.all() if qs is None else qs
+    if not wants_all_tenants(request):
+        qs = qs.filter(tenant_scope_or_legacy_q(request))
+    if user.is_staff and user.user_type == User.Types.ADMIN:
+        return qs
+    if user.is_staff and user.user_type == User.Types.SUPPORT_AGENT:
+        return qs.filter(
+            models.Q(assigned_to=user) |
+            models.Q(submitted_by=user)
+        )
+    return qs.filter(submitted_by=user)
+
+
 class SupportTicketViewSet(viewsets.ModelViewSet):
     queryset = SupportTicket.objects.all().order_by('-created_at')
     serializer_class = SupportTicketSerializer
@@ -88,16 +139,19 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         )
 
     def perform_update(self, serializer):
-        old_instance = self.get_object()
-        old_status = old_instance.status
-        old_priority = old_instance.priority
-        old_assigned_to = old_instance.assigned_to
+        # serializer.instance is the row loaded by get_object(); read the old values
+        # from its load-time snapshot rather than fetching the ticket a second time.
+        instance = serializer.instance
+        old_status = instance.previous('status')
+        old_priority = instance.previous('priority')
+        old_assigned_to = instance.assigned_to if instance.previous('assigned_to') else None
         
         ticket = serializer.save()
-        
-        # Log status change
+
+        # One INSERT for every change this update made
+        logs = []
         if old_status != ticket.status:
-            ActivityLog.objects.create(
+            logs.append(ActivityLog(
                 ticket=ticket,
                 activity_type='status_change',
                 description=f"Status changed from '{old_status}' to '{ticket.status}'",
@@ -106,11 +160,10 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
                     'old_status': old_status,
                     'new_status': ticket.status
                 }
-            )
-        
-        # Log priority change
+            ))
+
         if old_priority != ticket.priority:
-            ActivityLog.objects.create(
+            logs.append(ActivityLog(
                 ticket=ticket,
                 activity_type='priority_change',
                 description=f"Priority changed from '{old_priority}' to '{ticket.priority}'",
@@ -119,14 +172,13 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
                     'old_priority': old_priority,
                     'new_priority': ticket.priority
                 }
-            )
-        
-        # Log assignment change
+            ))
+
         if old_assigned_to != ticket.assigned_to:
             new_assignee = ticket.assigned_to.get_full_name() if ticket.assigned_to else "No one"
             old_assignee = old_assigned_to.get_full_name() if old_assigned_to else "No one"
-            
-            ActivityLog.objects.create(
+
+            logs.append(ActivityLog(
                 ticket=ticket,
                 activity_type='assignment',
                 description=f"Ticket reassigned from {old_assignee} to {new_assignee}",
@@ -135,22 +187,13 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
                     'old_assigned_to': old_assigned_to.id if old_assigned_to else None,
                     'new_assigned_to': ticket.assigned_to.id if ticket.assigned_to else None
                 }
-            )
+            ))
 
+        if logs:
+            ActivityLog.objects.bulk_create(logs)
 
     def get_queryset(self):
-        user = self.request.user
-        qs = self.queryset
-        if not wants_all_tenants(self.request):
-            qs = qs.filter(tenant_scope_or_legacy_q(self.request))
-        if user.is_staff and user.user_type == User.Types.ADMIN:
-            return qs
-        if user.is_staff and user.user_type == User.Types.SUPPORT_AGENT:
-            return qs.filter(
-                models.Q(assigned_to=user) |
-                models.Q(submitted_by=user)
-            )
-        return qs.filter(submitted_by=user)
+        return visible_tickets(self.request, self.queryset)
 
 
 
@@ -238,90 +281,41 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
-        Return statistics about support tickets
+        Return statistics about support tickets visible to the caller, computed
+        in one query and cached per scope (see support.stats).
+
+        ?weeks=<n>  also return ``weekly``: the same figures per week of ticket
+                    creation over the last n weeks (at most 52)
         """
-        # Filter tickets based on user role
-        user = request.user
-        
-        # Get the filtered queryset based on user role
-        filtered_tickets = self.get_queryset()
-        
-        # Count tickets by status
-        open_tickets = filtered_tickets.filter(status='open').count()
-        in_progress_tickets = filtered_tickets.filter(status='in_progress').count()
-        resolved_tickets = filtered_tickets.filter(status='resolved').count()
-        urgent_tickets = filtered_tickets.filter(priority='urgent').count()
-        
-        # Calculate average resolution time for resolved tickets
-        avg_resolution_time = 0
-        resolved_with_times = filtered_tickets.filter(
-            status='resolved',
-            updated_at__isnull=False,
-            created_at__isnull=False
-        )
-        
-        if resolved_with_times.exists():
-            # Calculate the average time in hours
-            from django.db.models import F, ExpressionWrapper, fields
-            
-            resolved_with_times = resolved_with_times.annotate(
-                resolution_time=ExpressionWrapper(
-                    F('updated_at') - F('created_at'),
-                    output_field=fields.DurationField()
+        weeks = request.query_params.get('weeks')
+        if weeks is not None:
+            if not weeks.isdigit() or not 1 <= int(weeks) <= ticket_stats.MAX_WEEKS:
+                return Response(
+                    {'error': f'weeks must be between 1 and {ticket_stats.MAX_WEEKS}'},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-            )
-            
-            total_hours = 0
-            for ticket in resolved_with_times:
-                # Convert duration to hours
-                total_hours += ticket.resolution_time.total_seconds() / 3600
-            
-            avg_resolution_time = round(total_hours / resolved_with_times.count(), 1)
-        
-        return Response({
-            'totalTickets': filtered_tickets.count(),
-            'openTickets': open_tickets,
-            'inProgressTickets': in_progress_tickets,
-            'resolvedTickets': resolved_tickets,
-            'averageResolutionTime': avg_resolution_time,
-            'urgentTickets': urgent_tickets
-        })
+            weeks = int(weeks)
+
+        return Response(ticket_stats.cached_stats(request, self.get_queryset(), weeks))
     
     @action(detail=True, methods=['get'])
     def activities(self, request, pk=None):
-        ticket = self.get_object()
-        page = request.query_params.get('page', 1)
-        limit = request.query_params.get('limit', 20)
-
-        try:
-            page = int(page)
-            limit = int(limit)
-        except ValueError:
-            return Response(
-                {"error": "page and limit must be integers"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        """
+        The ticket's activity, newest first, keyset-paginated on (created_at, id).
 
-        activities = ticket.activity_logs.all()
-        paginator = Paginator(activities, limit)
-        
-        try:
-            page_obj = paginator.page(page)
-        except EmptyPage:
-            raise NotFound("Invalid page")
+        ?before=<activity id>  continue after the previous page's nextCursor
+        ?limit=<n>             page size, default 20, at most 100
+        """
+        ticket = self.get_object()
+        return activity_page(request, ActivityLog.objects.filter(ticket=ticket))
 
-        serializer = ActivityLogSerializer(page_obj.object_list, many=True)
-        
-        return Response({
-            'activities': serializer.data,
-            'pagination': {
-                'totalCount': paginator.count,
-                'totalPages': paginator.num_pages,
-                'currentPage': page_obj.number,
-                'nextPage': page_obj.next_page_number() if page_obj.has_next() else None,
-                'prevPage': page_obj.previous_page_number() if page_obj.has_previous() else None,
-            }
-        })
+    @action(detail=False, methods=['get'], url_path='activity-feed', permission_classes=[IsAdminOrSupportAgent])
+    def activity_feed(self, request):
+        """
+        Activity across every ticket the agent can see, newest first; same
+        ?before / ?limit cursor as ``activities``.
+        """
+        return activity_page(request, ActivityLog.objects.filter(ticket__in=self.get_queryset().values('pk')))
 
     # Add a dedicated status update endpoint to easily track status changes
     @action(detail=True, methods=['post'])
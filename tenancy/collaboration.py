@@ -0,0 +1,128 @@
+"""
+Cached recruiter <-> freelancer collaboration graph (backed by RecruitedFreelancer).
+
+Two adjacency lists are cached:
+  - roster:     recruiter user id -> [(freelancer id, recruited_at), ...] newest first
+  - recruiters: freelancer id     -> [recruiter user id, ...]
+
+Entries are dropped by tenancy.signals when a RecruitedFreelancer row is saved or
+deleted (accepting a workspace invite creates one). ``bulk_create``/``update`` bypass
+signals; call ``invalidate_collaboration_graph`` yourself after those. Invalidation
+reaches other worker processes only through the shared cache (settings.CACHES).
+When the cache is unreachable, lookups are logged and served from the database and
+invalidation is logged and skipped (entries then expire with the TTL).
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Iterable
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+ROSTER_CACHE_KEY = "collab:roster:{}"
+RECRUITERS_CACHE_KEY = "collab:recruiters:{}"
+
+logger = logging.getLogger(__name__)
+
+
+def _RecruitedFreelancer():
+    return apps.get_model("tenancy", "RecruitedFreelancer")
+
+
+def _cache_ttl() -> int:
+    return getattr(settings, "COLLABORATION_GRAPH_CACHE_TTL", 60 * 60)
+
+
+def _cache_set_many(values: dict) -> None:
+    try:
+        cache.set_many(values, _cache_ttl())
+    except Exception as e:
+        logger.warning(f"Could not cache collaboration graph entries: {e}")
+
+
+def get_rosters(recruiter_ids: Iterable[int]) -> dict[int, list[tuple[str, datetime]]]:
+    """Rosters for many recruiters: one cache round-trip plus at most one query for misses."""
+
+    recruiter_ids = list(dict.fromkeys(recruiter_ids))
+    if not recruiter_ids:
+        return {}
+    keys = {ROSTER_CACHE_KEY.format(rid): rid for rid in recruiter_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception as e:
+        logger.warning(f"Collaboration graph cache unavailable, loading rosters from the database: {e}")
+        cached = {}
+    rosters = {keys[k]: v for k, v in cached.items()}
+
+    missing = [rid for rid in recruiter_ids if rid not in rosters]
+    if missing:
+        loaded: dict[int, list[tuple[str, datetime]]] = {rid: [] for rid in missing}
+        rows = (
+            _RecruitedFreelancer()
+            .objects.filter(recruiter_id__in=missing)
+            .order_by("-created_at")
+            .values_list("recruiter_id", "freelancer_id", "created_at")
+        )
+        for recruiter_id, freelancer_id, created_at in rows:
+            loaded[recruiter_id].append((str(freelancer_id), created_at))
+        _cache_set_many({ROSTER_CACHE_KEY.format(rid): v for rid, v in loaded.items()})
+        rosters.update(loaded)
+    return rosters
+
+
+def get_roster(recruiter_id: int) -> list[tuple[str, datetime]]:
+    """(freelancer id, recruited_at) pairs for one recruiter, newest first."""
+
+    return get_rosters([recruiter_id])[recruiter_id]
+
+
+def get_roster_ids(recruiter_id: int) -> list[str]:
+    return [freelancer_id for freelancer_id, _ in get_roster(recruiter_id)]
+
+
+def get_recruiter_ids(freelancer_id) -> list[int]:
+    """User ids of every recruiter whose roster includes this freelancer."""
+
+    key = RECRUITERS_CACHE_KEY.format(freelancer_id)
+    try:
+        recruiter_ids = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Collaboration graph cache unavailable, loading recruiters from the database: {e}")
+        recruiter_ids = None
+    if recruiter_ids is None:
+        recruiter_ids = list(
+            _RecruitedFreelancer()
+            .objects.filter(freelancer_id=freelancer_id)
+            .values_list("recruiter_id", flat=True)
+            .distinct()
+        )
+        _cache_set_many({key: recruiter_ids})
+    return recruiter_ids
+
+
+def get_peer_ids(freelancer_id) -> set[str]:
+    """Freelancers sharing at least one recruiter's roster with ``freelancer_id`` (excluding itself)."""
+
+    rosters = get_rosters(get_recruiter_ids(freelancer_id))
+    peers: set[str] = set()
+    for roster in rosters.values():
+        peers.update(fid for fid, _ in roster)
+    peers.discard(str(freelancer_id))
+    return peers
+
+
+def invalidate_collaboration_graph(recruiter_ids: Iterable[int] = (), freelancer_ids: Iterable = ()) -> None:
+    keys = [ROSTER_CACHE_KEY.format(rid) for rid in recruiter_ids]
+    keys += [RECRUITERS_CACHE_KEY.format(fid) for fid in freelancer_ids]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        # Runs after commit (tenancy.signals); the change itself stands, entries expire with the TTL.
+        logger.warning(f"Could not invalidate collaboration graph entries {keys}: {e}")
+
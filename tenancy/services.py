@@ -6,6 +6,7 @@ from typing import Any
 from django.apps import apps
 from rest_framework.exceptions import PermissionDenied
 
+from tenancy.collaboration import get_roster_ids
 from tenancy.models import Organization, OrganizationMembership, OrganizationRole
 
 
@@ -186,11 +187,4 @@ def build_auth_claims(user, acting_organization_id: str | uuid.UUID | None = Non
 def get_recruited_freelancer_ids(recruiter_user) -> list[str]:
     """UUID strings for Freelancer PKs recruited by this user (AI `allowed_freelancer_ids`)."""
 
-    RecruitedFreelancer = apps.get_model("tenancy", "RecruitedFreelancer")
-    return [
-        str(x)
-        for x in RecruitedFreelancer.objects.filter(recruiter=recruiter_user).values_list(
-            "freelancer_id",
-            flat=True,
-        )
-    ]
+    return get_roster_ids(recruiter_user.pk)
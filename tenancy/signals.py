@@ -1,8 +1,16 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from tenancy.models import Organization, OrganizationMembership, OrganizationRole, UserEntitlement
+from tenancy.collaboration import invalidate_collaboration_graph
+from tenancy.models import (
+    Organization,
+    OrganizationMembership,
+    OrganizationRole,
+    RecruitedFreelancer,
+    UserEntitlement,
+)
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -26,3 +34,19 @@ def sync_organization_owner_membership(sender, instance, **kwargs):
         user_id=instance.owner_id,
         defaults={"role": OrganizationRole.OWNER.value},
     )
+
+
+@receiver(post_save, sender=RecruitedFreelancer)
+@receiver(post_delete, sender=RecruitedFreelancer)
+def invalidate_recruited_freelancer_graph(sender, instance, **kwargs):
+    """Drop cached roster / recruiter adjacency for both ends of the link once committed."""
+
+    if kwargs.get("raw"):
+        return
+    recruiter_id, freelancer_id = instance.recruiter_id, instance.freelancer_id
+    transaction.on_commit(
+        lambda: invalidate_collaboration_graph(
+            recruiter_ids=[recruiter_id],
+            freelancer_ids=[freelancer_id],
+        )
+    )
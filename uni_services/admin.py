@@ -4,6 +4,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Count, Sum, Q
 from django.contrib.admin import SimpleListFilter
+from django.db import transaction
 from django.utils import timezone
 from django.http import HttpResponse, HttpResponseRedirect
 from django.contrib import messages
@@ -18,6 +19,8 @@ from .models import (
     ServiceFile, Freelancer, OrderStatusHistory, OrderComment, Bid,
     ProjectWorkspace, ProjectWorkspaceInvite,
 )
+from .counters import order_queryset_transition
+from .dashboard import schedule_refresh
 
 
 # Custom Filters
@@ -191,32 +194,40 @@ def assign_to_freelancer(modeladmin, request, queryset):
 assign_to_freelancer.short_description = "Assign to freelancer"
 
 
+def _bulk_transition(queryset, to_status, **extra):
+    """Set-based status change that keeps Freelancer counters and dashboards in step."""
+    with transaction.atomic():
+        freelancer_ids = order_queryset_transition(queryset, to_status)
+        updated = queryset.update(status=to_status, **extra)
+        schedule_refresh(freelancer_ids, ['orders'])
+    return updated
+
+
 def mark_as_completed(modeladmin, request, queryset):
-    updated = queryset.filter(status__in=['in_progress', 'assigned']).update(
-        status='completed',
-        completed_at=timezone.now()
+    updated = _bulk_transition(
+        queryset.filter(status__in=['in_progress', 'assigned']), 'completed', completed_at=timezone.now(),
     )
     messages.success(request, f'{updated} orders marked as completed')
 mark_as_completed.short_description = "Mark as completed"
 
 
 def mark_as_cancelled(modeladmin, request, queryset):
-    updated = queryset.exclude(status='completed').update(status='cancelled')
+    updated = _bulk_transition(queryset.exclude(status='completed'), 'cancelled')
     messages.success(request, f'{updated} orders cancelled')
 mark_as_cancelled.short_description = "Cancel orders"
 
 def mark_as_in_progress(modeladmin, request, queryset):
-    updated = queryset.filter(status__in=['assigned', 'start_working', 'on_hold']).update(status='in_progress')
+    updated = _bulk_transition(queryset.filter(status__in=['assigned', 'start_working', 'on_hold']), 'in_progress')
     messages.success(request, f'{updated} orders moved to in progress')
 mark_as_in_progress.short_description = "Move selected orders to in progress"
 
 def mark_as_on_hold(modeladmin, request, queryset):
-    updated = queryset.exclude(status__in=['completed', 'cancelled']).update(status='on_hold')
+    updated = _bulk_transition(queryset.exclude(status__in=['completed', 'cancelled']), 'on_hold')
     messages.success(request, f'{updated} orders moved on hold')
 mark_as_on_hold.short_description = "Move selected orders on hold"
 
 def mark_as_proceed_to_pay(modeladmin, request, queryset):
-    updated = queryset.filter(status='completed').update(status='proceed_to_pay')
+    updated = _bulk_transition(queryset.filter(status='completed'), 'proceed_to_pay')
     messages.success(request, f'{updated} completed orders moved to proceed to pay')
 mark_as_proceed_to_pay.short_description = "Move completed orders to proceed to pay"
 
@@ -0,0 +1,181 @@
+"""
+Denormalized Freelancer counters.
+
+  - ``active_projects_count``     orders assigned to the freelancer in an active status
+  - ``total_projects_completed``  orders in 'completed'
+  - ``rating_sum`` / ``rating_count`` and the derived ``average_rating``
+  - ``total_earnings``            amount of the freelancer's completed payouts
+
+Every write path applies its delta with F() expressions in the same transaction
+as the row change, so concurrent transitions never lose an update and reads
+(capacity checks, rating sorts, cards) use the columns directly:
+
+  - BaseService.save / delete, and set-based status updates through
+    ``order_queryset_transition`` (call it before the UPDATE, like
+    payouts.ledger.earnings_movements);
+  - FreelancerReview.save / delete;
+  - payouts.ledger.post, via the ``ledger_posted`` signal, for payouts entering or
+    leaving the completed bucket.
+
+``recompute`` rebuilds the counters from the source rows; the
+``repair_freelancer_counters`` command uses it to report and fix drift.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import BaseService, Freelancer, FreelancerReview
+
+COUNTER_FIELDS = ['active_projects_count', 'total_projects_completed', 'total_earnings']
+RATING_FIELDS = ['rating_sum', 'rating_count', 'average_rating']
+ALL_FIELDS = COUNTER_FIELDS + RATING_FIELDS
+
+
+def _status_counters(status) -> list[str]:
+    if status in BaseService.ACTIVE_STATUSES:
+        return ['active_projects_count']
+    if status == 'completed':
+        return ['total_projects_completed']
+    return []
+
+
+def apply(deltas) -> None:
+    """Apply {freelancer_id: {field: delta}} for COUNTER_FIELDS with one UPDATE."""
+
+    deltas = {fid: d for fid, d in deltas.items() if fid is not None and any(d.values())}
+    if not deltas:
+        return
+    updates = {}
+    for field in COUNTER_FIELDS:
+        whens = [When(pk=fid, then=Value(d[field])) for fid, d in deltas.items() if d.get(field)]
+        if not whens:
+            continue
+        output = DecimalField(max_digits=12, decimal_places=2) if field == 'total_earnings' else IntegerField()
+        updates[field] = F(field) + Case(*whens, default=Value(0), output_field=output)
+    Freelancer.objects.filter(pk__in=list(deltas)).update(**updates)
+
+
+def order_change(old, new) -> None:
+    """
+    A single order going from ``old`` to ``new``, each an (assigned_to_id, status)
+    tuple, or None when the row did not / no longer exists.
+    """
+    if old == new:
+        return
+    deltas = defaultdict(lambda: defaultdict(int))
+    if old:
+        for field in _status_counters(old[1]):
+            deltas[old[0]][field] -= 1
+    if new:
+        for field in _status_counters(new[1]):
+            deltas[new[0]][field] += 1
+    apply(deltas)
+
+
+def order_queryset_transition(queryset, to_status) -> set:
+    """
+    Apply counter deltas for an UPDATE about to set ``to_status`` on ``queryset``
+    (one grouped query); returns the affected freelancer ids.
+    """
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    rows = queryset.order_by().filter(assigned_to__isnull=False).values('assigned_to', 'status').annotate(n=Count('pk'))
+    for row in rows:
+        for field in _status_counters(row['status']):
+            deltas[row['assigned_to']][field] -= row['n']
+        for field in _status_counters(to_status):
+            deltas[row['assigned_to']][field] += row['n']
+    apply(deltas)
+    return set(deltas)
+
+
+def review_change(old, new) -> None:
+    """A review going from ``old`` to ``new``, each a (freelancer_id, rating) tuple or None."""
+
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    if old:
+        deltas[old[0]][0] -= old[1]
+        deltas[old[0]][1] -= 1
+    if new:
+        deltas[new[0]][0] += new[1]
+        deltas[new[0]][1] += 1
+    for freelancer_id, (rating_delta, count_delta) in deltas.items():
+        if not rating_delta and not count_delta:
+            continue
+        # Right-hand side F() values are the pre-UPDATE ones, so the average matches the new sum / count.
+        Freelancer.objects.filter(pk=freelancer_id).update(
+            rating_sum=F('rating_sum') + rating_delta,
+            rating_count=F('rating_count') + count_delta,
+            average_rating=Case(
+                When(rating_count__lte=-count_delta, then=Value(Decimal('0'))),
+                default=Cast(
+                    (F('rating_sum') + rating_delta) * Value(1.0) / (F('rating_count') + count_delta),
+                    DecimalField(max_digits=3, decimal_places=2),
+                ),
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
+
+def earnings_change(partner_deltas) -> None:
+    """Add {partner profile id: amount} of completed payouts to the partners' freelancer rows."""
+
+    from authentication.models import Profile
+
+    partner_deltas = {pid: amount for pid, amount in partner_deltas.items() if amount}
+    if not partner_deltas:
+        return
+    user_ids = dict(Profile.objects.filter(pk__in=list(partner_deltas)).values_list('pk', 'user_id'))
+    by_user = defaultdict(Decimal)
+    for pid, amount in partner_deltas.items():
+        if pid in user_ids:
+            by_user[user_ids[pid]] += amount
+    if not by_user:
+        return
+    whens = [When(user_id=uid, then=Value(amount)) for uid, amount in by_user.items()]
+    Freelancer.objects.filter(user_id__in=list(by_user)).update(
+        total_earnings=F('total_earnings') + Case(
+            *whens, default=Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def recompute(freelancer_ids) -> dict:
+    """Counter values computed from the source rows: {freelancer_id: {field: value}}."""
+
+    from payouts.models import Payout
+
+    freelancer_ids = list(freelancer_ids)
+    values = {
+        fid: {
+            'active_projects_count': 0, 'total_projects_completed': 0, 'total_earnings': Decimal('0'),
+            'rating_sum': 0, 'rating_count': 0, 'average_rating': Decimal('0'),
+        }
+        for fid in freelancer_ids
+    }
+    orders = BaseService.objects.non_polymorphic().filter(assigned_to__in=freelancer_ids).order_by()
+    for row in orders.values('assigned_to', 'status').annotate(n=Count('pk')):
+        for field in _status_counters(row['status']):
+            values[row['assigned_to']][field] += row['n']
+
+    reviews = FreelancerReview.objects.filter(freelancer__in=freelancer_ids).order_by()
+    for row in reviews.values('freelancer').annotate(total=Sum('rating'), n=Count('pk')):
+        value = values[row['freelancer']]
+        value['rating_sum'] = row['total']
+        value['rating_count'] = row['n']
+        value['average_rating'] = (Decimal(row['total']) / row['n']).quantize(Decimal('0.01'))
+
+    completed = (
+        Payout.objects.filter(status=Payout.Status.COMPLETED, partner__user__freelancer_profile__in=freelancer_ids)
+        .order_by().values('partner__user__freelancer_profile').annotate(total=Sum('amount'))
+    )
+    for row in completed:
+        values[row['partner__user__freelancer_profile']]['total_earnings'] = row['total'] or Decimal('0')
+    return values
@@ -0,0 +1,471 @@
+"""
+Pre-aggregated freelancer dashboards (FreelancerDashboardSnapshot).
+
+The dashboard is served from one row per freelancer, read together with the
+Freelancer and its PartnerBalance in a single query. The snapshot has three
+sections, each rebuilt on its own after commit when the rows behind it change:
+
+  - ``orders``:  order status transitions, assignment, amount or timing changes
+  - ``reviews``: review created / edited / deleted
+  - ``profile``: portfolio items, certifications, Freelancer profile edits
+
+Payout figures come from the ledger-maintained PartnerBalance, which payouts
+already update incrementally, so the snapshot does not copy them.
+
+Builders work on a list of freelancer ids with one grouped query per statistic,
+so refreshing one freelancer and ``rebuild_dashboard_snapshots`` over thousands
+share the same code. Windowed figures (last 30 / 90 days, month-over-month growth,
+"x days ago") are derived at read time from the daily buckets stored in the
+snapshot; a snapshot therefore only goes stale when its rows change, and a
+snapshot older than MAX_AGE is rebuilt on read as a safety net for writes that
+bypass the signals (queryset.update()).
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncDay, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import (
+    BaseService,
+    Freelancer,
+    FreelancerCertification,
+    FreelancerDashboardSnapshot,
+    FreelancerPortfolio,
+    FreelancerReview,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Rebuild on read when older than this (seconds); None disables.
+    'MAX_AGE': 24 * 60 * 60,
+    'REBUILD_CHUNK_SIZE': 500,
+}
+
+SECTIONS = ('orders', 'reviews', 'profile')
+ACTIVE_STATUSES = BaseService.ACTIVE_STATUSES
+PENDING_STATUSES = ('submitted', 'under_review')
+UNSUCCESSFUL_STATUSES = ('cancelled', 'failed', 'disputed')
+RECENT_COMPLETED = 3
+RECENT_ASSIGNED = 2
+RECENT_REVIEWS = 3
+CHART_MONTHS = 6
+
+TASK_STATUS_DISPLAY = {
+    'completed': {'name': 'Completed', 'color': '#10b981'},
+    'in_progress': {'name': 'In Progress', 'color': '#3b82f6'},
+    'start_working': {'name': 'To Start', 'color': '#f59e0b'},
+    'assigned': {'name': 'Assigned', 'color': '#8b5cf6'},
+    'on_hold': {'name': 'On Hold', 'color': '#64748b'},
+    'submitted': {'name': 'Submitted', 'color': '#06b6d4'},
+    'under_review': {'name': 'Under Review', 'color': '#84cc16'},
+    'cancelled': {'name': 'Cancelled', 'color': '#ef4444'},
+}
+
+
+def dashboard_setting(name):
+    return getattr(settings, 'FREELANCER_DASHBOARD', {}).get(name, DEFAULTS[name])
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def _history_start(today):
+    """First day kept in the daily completion buckets: covers the chart and the 90 day window."""
+    return min(_add_months(_month_start(today), -(CHART_MONTHS - 1)), today - timedelta(days=90))
+
+
+def _money(value):
+    return float(value or 0)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _top_per_freelancer(queryset, order_by, limit, fields):
+    return queryset.annotate(
+        row_number=Window(RowNumber(), partition_by=[F('assigned_to')], order_by=order_by),
+    ).filter(row_number__lte=limit).values('assigned_to', *fields)
+
+
+# -- Section builders (freelancer ids -> {id: section}) -------------------------
+
+def build_orders_sections(freelancer_ids):
+    orders = BaseService.objects.non_polymorphic().filter(assigned_to__in=freelancer_ids).order_by()
+    sections = {
+        fid: {
+            'status_counts': {}, 'total': 0, 'clients': 0, 'average_project_value': 0.0,
+            'average_delivery_hours': None, 'daily_completions': {}, 'recent': [],
+        }
+        for fid in freelancer_ids
+    }
+
+    completed = Q(status='completed')
+    delivered = completed & Q(started_at__isnull=False, completed_at__isnull=False)
+    totals = orders.values('assigned_to').annotate(
+        total=Count('id'),
+        clients=Count('user', distinct=True),
+        average_value=Avg('bid_amount', filter=completed),
+        average_delivery=Avg(
+            ExpressionWrapper(F('completed_at') - F('started_at'), output_field=DurationField()),
+            filter=delivered,
+        ),
+    )
+    for row in totals:
+        section = sections[row['assigned_to']]
+        section['total'] = row['total']
+        section['clients'] = row['clients']
+        section['average_project_value'] = _money(row['average_value'])
+        if row['average_delivery'] is not None:
+            section['average_delivery_hours'] = row['average_delivery'].total_seconds() / 3600
+
+    for row in orders.values('assigned_to', 'status').annotate(count=Count('id')):
+        sections[row['assigned_to']]['status_counts'][row['status']] = row['count']
+
+    since = timezone.make_aware(datetime.combine(_history_start(timezone.localdate()), time.min))
+    daily = (
+        orders.filter(completed, completed_at__gte=since)
+        .annotate(day=TruncDay('completed_at'))
+        .values('assigned_to', 'day')
+        .annotate(amount=Sum('bid_amount'), count=Count('id'))
+    )
+    for row in daily:
+        day = timezone.localtime(row['day']).date() if timezone.is_aware(row['day']) else row['day'].date()
+        sections[row['assigned_to']]['daily_completions'][day.isoformat()] = [_money(row['amount']), row['count']]
+
+    recent = [
+        ('project_completed', 'completed_at', orders.filter(completed), RECENT_COMPLETED),
+        ('project_assigned', 'created_at', orders.filter(status='assigned'), RECENT_ASSIGNED),
+    ]
+    for kind, time_field, queryset, limit in recent:
+        rows = _top_per_freelancer(
+            queryset, F(time_field).desc(nulls_last=True), limit, ('id', 'title', 'bid_amount', time_field),
+        )
+        for row in rows:
+            sections[row['assigned_to']]['recent'].append({
+                'kind': kind,
+                'id': row['id'],
+                'title': row['title'],
+                'time': _iso(row[time_field]),
+                'amount': _money(row['bid_amount']) if row['bid_amount'] is not None else None,
+            })
+    return sections
+
+
+def build_reviews_sections(freelancer_ids):
+    reviews = FreelancerReview.objects.filter(freelancer__in=freelancer_ids).order_by()
+    sections = {fid: {'monthly': [], 'recent': []} for fid in freelancer_ids}
+
+    monthly = (
+        reviews.annotate(month=TruncMonth('created_at'))
+        .values('freelancer', 'month')
+        .annotate(rating_sum=Sum('rating'), count=Count('id'), satisfied=Count('id', filter=Q(rating__gte=4)))
+        .order_by('freelancer', 'month')
+    )
+    for row in monthly:
+        sections[row['freelancer']]['monthly'].append({
+            'month': _iso(row['month']),
+            'rating_sum': row['rating_sum'],
+            'count': row['count'],
+            'satisfied': row['satisfied'],
+        })
+
+    recent = reviews.annotate(
+        row_number=Window(RowNumber(), partition_by=[F('freelancer')], order_by=F('created_at').desc()),
+    ).filter(row_number__lte=RECENT_REVIEWS).values('freelancer', 'id', 'rating', 'created_at')
+    for row in recent:
+        sections[row['freelancer']]['recent'].append({
+            'id': row['id'], 'rating': row['rating'], 'time': _iso(row['created_at']),
+        })
+    return sections
+
+
+def build_profile_sections(freelancer_ids):
+    sections = {fid: {'portfolio_items': 0, 'certifications': 0, 'profile_completion': 0} for fid in freelancer_ids}
+    portfolio = dict(
+        FreelancerPortfolio.objects.filter(freelancer__in=freelancer_ids).order_by()
+        .values('freelancer').annotate(count=Count('id')).values_list('freelancer', 'count')
+    )
+    certifications = dict(
+        FreelancerCertification.objects.filter(freelancer__in=freelancer_ids).order_by()
+        .values('freelancer').annotate(count=Count('id')).values_list('freelancer', 'count')
+    )
+    for freelancer in Freelancer.objects.filter(pk__in=freelancer_ids).select_related('user'):
+        section = sections[freelancer.pk]
+        section['portfolio_items'] = portfolio.get(freelancer.pk, 0)
+        section['certifications'] = certifications.get(freelancer.pk, 0)
+        section['profile_completion'] = freelancer.profile_completion_for(section['portfolio_items'])
+    return sections
+
+
+BUILDERS = {
+    'orders': build_orders_sections,
+    'reviews': build_reviews_sections,
+    'profile': build_profile_sections,
+}
+
+
+# -- Writes ---------------------------------------------------------------------
+
+def rebuild_snapshots(freelancer_ids) -> int:
+    """Build every section for ``freelancer_ids`` and upsert their snapshots."""
+
+    freelancer_ids = list(freelancer_ids)
+    if not freelancer_ids:
+        return 0
+    built = {section: BUILDERS[section](freelancer_ids) for section in SECTIONS}
+    now = timezone.now()
+    FreelancerDashboardSnapshot.objects.bulk_create(
+        [
+            FreelancerDashboardSnapshot(
+                freelancer_id=fid, generated_at=now, **{section: built[section][fid] for section in SECTIONS},
+            )
+            for fid in freelancer_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['freelancer'],
+        update_fields=[*SECTIONS, 'generated_at'],
+    )
+    return len(freelancer_ids)
+
+
+def refresh_sections(freelancer_ids, sections) -> int:
+    """
+    Rebuild only ``sections`` of existing snapshots. Freelancers without a snapshot
+    are skipped; theirs is built on first read or by the rebuild command.
+    """
+    snapshots = list(FreelancerDashboardSnapshot.objects.filter(
+        freelancer_id__in={fid for fid in freelancer_ids if fid is not None},
+    ).only('freelancer_id'))
+    if not snapshots:
+        return 0
+    ids = [s.freelancer_id for s in snapshots]
+    built = {section: BUILDERS[section](ids) for section in sections}
+    now = timezone.now()
+    for snapshot in snapshots:
+        for section in sections:
+            setattr(snapshot, section, built[section][snapshot.freelancer_id])
+        snapshot.generated_at = now
+    FreelancerDashboardSnapshot.objects.bulk_update(snapshots, [*sections, 'generated_at'])
+    return len(snapshots)
+
+
+def schedule_refresh(freelancer_ids, sections) -> None:
+    """Refresh ``sections`` for ``freelancer_ids`` once the current transaction commits."""
+
+    freelancer_ids = {fid for fid in freelancer_ids if fid is not None}
+    if not freelancer_ids:
+        return
+
+    def _after_commit():
+        try:
+            refresh_sections(freelancer_ids, sections)
+        except Exception:
+            # The snapshot is rebuilt on read once it exceeds MAX_AGE.
+            logger.exception(f"Refreshing dashboard sections {sections} for {freelancer_ids} failed")
+
+    transaction.on_commit(_after_commit)
+
+
+# -- Reads ----------------------------------------------------------------------
+
+def get_snapshot(freelancer, refresh=False) -> FreelancerDashboardSnapshot:
+    """The freelancer's snapshot, (re)built live when missing, too old or ``refresh`` is set."""
+
+    snapshot = getattr(freelancer, 'dashboard_snapshot', None)
+    max_age = dashboard_setting('MAX_AGE')
+    stale = (
+        snapshot is not None and max_age is not None
+        and timezone.now() - snapshot.generated_at > timedelta(seconds=max_age)
+    )
+    if snapshot is None or stale or refresh:
+        rebuild_snapshots([freelancer.pk])
+        snapshot = FreelancerDashboardSnapshot.objects.get(freelancer_id=freelancer.pk)
+        freelancer.dashboard_snapshot = snapshot
+    return snapshot
+
+
+def time_ago(dt, now=None):
+    """Convert datetime to time ago string"""
+    if not dt:
+        return "Unknown"
+
+    diff = (now or timezone.now()) - dt
+    if diff.days > 7:
+        return f"{diff.days // 7} weeks ago"
+    elif diff.days > 0:
+        return f"{diff.days} days ago"
+    elif diff.seconds > 3600:
+        return f"{diff.seconds // 3600} hours ago"
+    elif diff.seconds > 60:
+        return f"{diff.seconds // 60} minutes ago"
+    return "Just now"
+
+
+def _completions_between(daily, start, end=None):
+    amount, count = 0.0, 0
+    for day, (day_amount, day_count) in daily.items():
+        day = parse_date(day)
+        if day >= start and (end is None or day < end):
+            amount += day_amount
+            count += day_count
+    return amount, count
+
+
+def _rate(part, total, empty):
+    return round(part / total * 100, 1) if total else empty
+
+
+def _format_hours(hours):
+    if hours is None:
+        return 0
+    return f"{round(hours)} hours" if hours < 24 else f"{round(hours / 24)} days"
+
+
+def _balance_figures(freelancer):
+    try:
+        balance = freelancer.user.profile.balance
+    except Exception:
+        # No partner profile / nothing posted to the ledger yet
+        return {'available_balance': 0.0, 'pending_payouts': 0.0, 'total_paid_out': 0.0}
+    return {
+        'available_balance': _money(balance.available),
+        'pending_payouts': _money(balance.payouts_pending + balance.payouts_processing),
+        'total_paid_out': _money(balance.payouts_completed),
+    }
+
+
+def dashboard_payload(freelancer, snapshot, now=None) -> dict:
+    """The dashboard_stats response, from the freelancer row, its snapshot and balance."""
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    orders, reviews, profile = snapshot.orders, snapshot.reviews, snapshot.profile
+    counts = orders.get('status_counts', {})
+    daily = orders.get('daily_completions', {})
+
+    monthly_earnings, _ = _completions_between(daily, today - timedelta(days=30))
+    quarterly_earnings, _ = _completions_between(daily, today - timedelta(days=90))
+    this_month = _month_start(today)
+    current_month, _ = _completions_between(daily, this_month)
+    last_month, _ = _completions_between(daily, _add_months(this_month, -1), this_month)
+    if last_month == 0:
+        earnings_growth = 0 if current_month == 0 else 100
+    else:
+        earnings_growth = round((current_month - last_month) / last_month * 100, 1)
+
+    earnings_data = []
+    for offset in range(CHART_MONTHS - 1, -1, -1):
+        month_start = _add_months(this_month, -offset)
+        amount, count = _completions_between(daily, month_start, _add_months(month_start, 1))
+        earnings_data.append({'month': month_start.strftime('%b %Y'), 'earnings': amount, 'projects': count})
+
+    completed = counts.get('completed', 0)
+    unsuccessful = sum(counts.get(s, 0) for s in UNSUCCESSFUL_STATUSES)
+    total_orders = orders.get('total', 0)
+    clients = orders.get('clients', 0)
+
+    rating_trend, running_sum, running_count, satisfied = [], 0, 0, 0
+    for month in reviews.get('monthly', []):
+        running_sum += month['rating_sum']
+        running_count += month['count']
+        satisfied += month['satisfied']
+        rating_trend.append({
+            'date': parse_datetime(month['month']).strftime('%b %Y'),
+            'rating': round(running_sum / running_count, 2),
+            'review_count': running_count,
+        })
+
+    activities = []
+    for item in orders.get('recent', []):
+        at = parse_datetime(item['time']) if item['time'] else None
+        is_completed = item['kind'] == 'project_completed'
+        activities.append({
+            'id': f"{'project' if is_completed else 'assigned'}_{item['id']}",
+            'type': item['kind'],
+            'action': 'Completed project' if is_completed else 'New project assigned',
+            'title': item['title'] or ('Project' if is_completed else 'New Project'),
+            'time': at,
+            'time_ago': time_ago(at, now),
+            'amount': f"${item['amount']:.2f}" if item['amount'] is not None else None,
+            'icon': 'check-circle' if is_completed else 'briefcase',
+        })
+    for item in reviews.get('recent', []):
+        at = parse_datetime(item['time'])
+        activities.append({
+            'id': f"review_{item['id']}",
+            'type': 'review_received',
+            'action': 'Received review',
+            'title': f"{item['rating']} star review",
+            'time': at,
+            'time_ago': time_ago(at, now),
+            'amount': f"{item['rating']}/5 stars",
+            'icon': 'star',
+        })
+    activities.sort(key=lambda x: x['time'] or now, reverse=True)
+
+    return {
+        'generated_at': snapshot.generated_at,
+        'financial': {
+            'total_earnings': _money(freelancer.total_earnings),
+            'monthly_earnings': monthly_earnings,
+            'quarterly_earnings': quarterly_earnings,
+            'average_project_value': orders.get('average_project_value', 0.0),
+            'earnings_growth': earnings_growth,
+            **_balance_figures(freelancer),
+        },
+        'projects': {
+            'active_tasks': sum(counts.get(s, 0) for s in ACTIVE_STATUSES),
+            'completed_tasks': completed,
+            'pending_tasks': sum(counts.get(s, 0) for s in PENDING_STATUSES),
+            'total_projects': freelancer.total_projects_completed or 0,
+            'success_rate': _rate(completed, completed + unsuccessful, 100),
+            'completion_rate': _rate(completed, total_orders, 100),
+        },
+        'profile': {
+            'average_rating': _money(freelancer.average_rating),
+            'total_reviews': running_count,
+            'profile_completion': profile.get('profile_completion', 0),
+            'profile_views': getattr(freelancer, 'profile_views', 0),
+            'is_verified': freelancer.is_profile_verified,
+            'portfolio_items': profile.get('portfolio_items', 0),
+            'certifications': profile.get('certifications', 0),
+        },
+        'activity': {
+            'last_active': freelancer.last_active,
+            'join_date': freelancer.created_at,
+            'days_active': (now - freelancer.created_at).days,
+            'is_available': freelancer.is_available,
+            'availability_status': getattr(freelancer, 'availability_status', 'available'),
+        },
+        'charts': {
+            'earnings_data': earnings_data,
+            'task_status_data': [
+                {'name': TASK_STATUS_DISPLAY[s]['name'], 'value': n, 'color': TASK_STATUS_DISPLAY[s]['color']}
+                for s, n in counts.items() if s in TASK_STATUS_DISPLAY
+            ],
+            'rating_trend': rating_trend,
+        },
+        'recent_activity': activities[:10],
+        'performance': {
+            'response_time': "< 2 hours",  # Placeholder until responses to new projects are tracked
+            'project_delivery_time': _format_hours(orders.get('average_delivery_hours')),
+            'client_satisfaction': _rate(satisfied, running_count, 100),
+            'repeat_client_rate': round(max(0, (total_orders - clients) / total_orders * 100), 1) if total_orders else 0,
+        },
+    }
@@ -0,0 +1,45 @@
+"""
+Rebuild FreelancerDashboardSnapshot rows in bulk (see uni_services.dashboard).
+
+Usage:
+  python manage.py rebuild_dashboard_snapshots                  # every freelancer
+  python manage.py rebuild_dashboard_snapshots --missing-only   # only those without a snapshot
+  python manage.py rebuild_dashboard_snapshots --freelancer <uuid> --freelancer <uuid>
+
+Run it after deploying the snapshot table, and after bulk data fixes that bypass
+model saves (queryset.update(), raw SQL).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from uni_services.dashboard import dashboard_setting, rebuild_snapshots
+from uni_services.models import Freelancer
+
+
+class Command(BaseCommand):
+    help = 'Rebuild freelancer dashboard snapshots in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--freelancer', action='append', metavar='UUID', help='Limit to these freelancers.')
+        parser.add_argument('--missing-only', action='store_true', help='Skip freelancers that already have a snapshot.')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size'] or dashboard_setting('REBUILD_CHUNK_SIZE')
+        freelancers = Freelancer.objects.order_by('pk')
+        if options['freelancer']:
+            freelancers = freelancers.filter(pk__in=options['freelancer'])
+        if options['missing_only']:
+            freelancers = freelancers.filter(dashboard_snapshot__isnull=True)
+        ids = list(freelancers.values_list('pk', flat=True))
+
+        started = time.monotonic()
+        rebuilt = 0
+        for start in range(0, len(ids), chunk_size):
+            rebuilt += rebuild_snapshots(ids[start:start + chunk_size])
+            self.stdout.write(f"{rebuilt}/{len(ids)} snapshots rebuilt")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rebuilt} dashboard snapshots in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,72 @@
+"""
+Check the denormalized Freelancer counters against their source rows
+(see uni_services.counters) and optionally rewrite the ones that drifted.
+
+Usage:
+  python manage.py repair_freelancer_counters                 # report drift
+  python manage.py repair_freelancer_counters --fix
+  python manage.py repair_freelancer_counters --freelancer <uuid> --fix
+
+Run it once with --fix after deploying the counter columns to backfill them.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from uni_services.counters import ALL_FIELDS, recompute
+from uni_services.models import Freelancer
+
+
+class Command(BaseCommand):
+    help = 'Recompute Freelancer statistics counters in bulk and repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--freelancer', action='append', metavar='UUID', help='Limit to these freelancers.')
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted counters.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--verbose-drift', action='store_true', help='Print every drifted freelancer.')
+
+    def handle(self, *args, **options):
+        freelancers = Freelancer.objects.order_by('pk')
+        if options['freelancer']:
+            freelancers = freelancers.filter(pk__in=options['freelancer'])
+        ids = list(freelancers.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+
+        checked = drifted = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            with transaction.atomic():
+                rows = Freelancer.objects.filter(pk__in=chunk).only(*ALL_FIELDS)
+                if options['fix']:
+                    # Lock first so no incremental update lands between recompute and write
+                    rows = rows.select_for_update()
+                rows = list(rows)
+                expected = recompute(chunk)
+                to_update = []
+                for freelancer in rows:
+                    checked += 1
+                    diff = {
+                        field: (getattr(freelancer, field), value)
+                        for field, value in expected[freelancer.pk].items()
+                        if getattr(freelancer, field) != value
+                    }
+                    if not diff:
+                        continue
+                    drifted += 1
+                    if options['verbose_drift']:
+                        self.stdout.write(f"{freelancer.pk}: " + ', '.join(
+                            f"{field} {stored} -> {value}" for field, (stored, value) in diff.items()
+                        ))
+                    for field, (_, value) in diff.items():
+                        setattr(freelancer, field, value)
+                    to_update.append(freelancer)
+                if options['fix'] and to_update:
+                    Freelancer.objects.bulk_update(to_update, ALL_FIELDS)
+
+        summary = f"{checked} freelancers checked, {drifted} with drifted counters"
+        if options['fix'] and drifted:
+            self.stdout.write(self.style.SUCCESS(f"{summary}; repaired."))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(f"{summary}. Run with --fix to repair."))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
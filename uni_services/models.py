@@ -7,7 +7,7 @@ from django.core.exceptions import ValidationError
 import django_filters
 from polymorphic.models import PolymorphicModel
 
-from django.db import models
+from django.db import models, transaction
 
 from django.conf import settings
 from django.utils import timezone
@@ -15,6 +15,8 @@ from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
+from fred.model_mixins import DirtyFieldsMixin
+
 class Freelancer(models.Model):
     """Enhanced Freelancer model for profile management"""
     
@@ -148,8 +150,11 @@ class Freelancer(models.Model):
         help_text="List of languages with proficiency levels"
     )
     
-    # Rating and statistics
+    # Rating and statistics (maintained incrementally by uni_services.counters)
+    active_projects_count = models.IntegerField(default=0)
     total_projects_completed = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
     average_rating = models.DecimalField(
         max_digits=3, 
         decimal_places=2, 
@@ -186,8 +191,8 @@ class Freelancer(models.Model):
         """Convenient access to user phone"""
         return self.user.phone_number
 
-    def calculate_profile_completion(self):
-        """Calculate profile completion percentage"""
+    def profile_completion_for(self, portfolio_count):
+        """Profile completion percentage given the number of portfolio items"""
         completion_factors = [
             bool(self.display_name),
             bool(self.bio),
@@ -196,12 +201,15 @@ class Freelancer(models.Model):
             bool(self.hourly_rate),
             bool(self.location),
             bool(self.user.profile_picture),
-            len(self.portfolio_items.all()) >= 1,
+            portfolio_count >= 1,
             len(self.languages) >= 1,
             bool(self.experience_level),
         ]
-        
-        completion_score = int((sum(completion_factors) / len(completion_factors)) * 100)
+        return int((sum(completion_factors) / len(completion_factors)) * 100)
+
+    def calculate_profile_completion(self):
+        """Calculate profile completion percentage"""
+        completion_score = self.profile_completion_for(len(self.portfolio_items.all()))
         self.profile_completion_score = completion_score
         self.save(update_fields=['profile_completion_score'])
         
@@ -211,34 +219,19 @@ class Freelancer(models.Model):
         return completion_score
 
     def update_statistics(self):
-        """Update freelancer statistics"""
-        completed_orders = self.assigned_orders.filter(status='completed')
-        self.total_projects_completed = completed_orders.count()
-        
-        # Calculate average rating from reviews
-        reviews = FreelancerReview.objects.filter(freelancer=self)
-        if reviews.exists():
-            self.average_rating = reviews.aggregate(
-                avg_rating=models.Avg('rating')
-            )['avg_rating'] or 0.00
-        
-        # Calculate total earnings (you might want to add a Payment model)
-        # self.total_earnings = completed_orders.aggregate(
-        #     total=models.Sum('cost')
-        # )['total'] or 0.00
-        
-        self.save(update_fields=['total_projects_completed', 'average_rating'])
+        """
+        Recompute the statistics counters from scratch. Order, review and payout
+        writes keep them up to date incrementally; this is for drift repair.
+        """
+        from .counters import ALL_FIELDS, recompute
+
+        for field, value in recompute([self.pk])[self.pk].items():
+            setattr(self, field, value)
+        Freelancer.objects.filter(pk=self.pk).update(**{f: getattr(self, f) for f in ALL_FIELDS})
 
     def can_take_new_projects(self):
         """Check if freelancer can take new projects"""
-        if not self.is_available:
-            return False
-        
-        active_projects = self.assigned_orders.filter(
-            status__in=['assigned', 'start_working', 'in_progress']
-        ).count()
-        
-        return active_projects < self.max_concurrent_projects
+        return self.is_available and self.active_projects_count < self.max_concurrent_projects
 
     class Meta:
         indexes = [
@@ -277,7 +270,7 @@ class FreelancerPortfolio(models.Model):
         ordering = ['-is_featured', '-created_at']
 
 
-class FreelancerReview(models.Model):
+class FreelancerReview(DirtyFieldsMixin, models.Model):
     """Reviews for freelancers"""
     freelancer = models.ForeignKey(
         Freelancer, 
@@ -318,6 +311,21 @@ class FreelancerReview(models.Model):
     def __str__(self):
         return f"Review for {self.freelancer.display_name} by {self.client.email}"
 
+    def save(self, *args, **kwargs):
+        from .counters import review_change
+        old = None
+        if not self._state.adding and self.has_field_snapshot:
+            old = (self.previous('freelancer'), self.previous('rating'))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            review_change(old, (self.freelancer_id, self.rating))
+
+    def delete(self, *args, **kwargs):
+        from .counters import review_change
+        with transaction.atomic():
+            review_change((self.freelancer_id, self.rating), None)
+            return super().delete(*args, **kwargs)
+
     class Meta:
         unique_together = ('freelancer', 'client', 'order')
         ordering = ['-created_at']
@@ -351,7 +359,30 @@ class FreelancerCertification(models.Model):
 
     class Meta:
         ordering = ['-issue_date']
-class BaseService(PolymorphicModel):
+
+
+class FreelancerDashboardSnapshot(models.Model):
+    """
+    Pre-aggregated dashboard data for one freelancer (see uni_services.dashboard).
+    Each section is rebuilt on its own when the rows behind it change: `orders` on
+    order saves, `reviews` on review saves, `profile` on portfolio / certification saves.
+    """
+    freelancer = models.OneToOneField(
+        Freelancer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='dashboard_snapshot'
+    )
+    orders = models.JSONField(default=dict)
+    reviews = models.JSONField(default=dict)
+    profile = models.JSONField(default=dict)
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Dashboard snapshot for {self.freelancer_id} ({self.generated_at:%Y-%m-%d %H:%M})"
+
+
+class BaseService(DirtyFieldsMixin, PolymorphicModel):
     """
     Unified marketplace record: a single primary key (`id`) identifies each row.
     Optional structured attributes from legacy “software / research / custom” flows
@@ -396,6 +427,9 @@ class BaseService(PolymorphicModel):
         ('completed', 'Completed'),
     ]
 
+    # Statuses counted in Freelancer.active_projects_count
+    ACTIVE_STATUSES = ('assigned', 'start_working', 'in_progress')
+
     PRIORITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -489,14 +523,25 @@ class BaseService(PolymorphicModel):
             self.assigned_at = timezone.now()
         elif not self.assigned_to:
             self.assigned_at = None
-            
-        super().save(*args, **kwargs)
+
+        from .counters import order_change
+        old = None
+        if not self._state.adding and self.has_field_snapshot:
+            old = (self.previous('assigned_to'), self.previous('status'))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            order_change(old, (self.assigned_to_id, self.status))
+
+    def delete(self, *args, **kwargs):
+        from .counters import order_change
+        with transaction.atomic():
+            order_change((self.assigned_to_id, self.status), None)
+            return super().delete(*args, **kwargs)
 
     def clean(self):
         """Validate status transitions"""
-        if self.pk:  # Only validate for existing objects
-            old_instance = BaseService.objects.get(pk=self.pk)
-            old_status = old_instance.status
+        if self.pk and self.has_field_snapshot:  # Only validate for existing objects
+            old_status = self.previous('status')
             new_status = self.status
             
             # Define valid status transitions
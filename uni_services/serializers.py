@@ -4,6 +4,7 @@ from django.utils import timezone
 
 from authentication.models import User
 from freelancers.serializers import FreelancerSerializer
+from chat.search import highlight
 from .models import (
     BaseService, Bid, SoftwareService, ResearchService, CustomService,
     ServiceFile, Freelancer,
@@ -115,6 +116,19 @@ class OrderCommentSerializer(serializers.ModelSerializer):
         return obj.message[:100] + '...' if len(obj.message) > 100 else obj.message
 
 
+class OrderCommentSearchHitSerializer(serializers.ModelSerializer):
+    """A comment search hit with an HTML snippet, hits in <mark>"""
+    author = UserBasicSerializer(read_only=True)
+    highlight = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderComment
+        fields = ['id', 'order', 'author', 'is_internal', 'created_at', 'highlight']
+
+    def get_highlight(self, obj):
+        return highlight(obj.search_snippet, self.context.get('query'))
+
+
 class OrderCommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderComment
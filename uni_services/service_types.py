@@ -0,0 +1,59 @@
+"""
+ContentType resolution for BaseService rows.
+
+BaseService is polymorphic, so every row already records its concrete class in
+``polymorphic_ctype``. ``resolve_content_type`` reads that column for one id (a
+primary-key lookup) instead of probing each subclass table, and checks it against
+``service_content_types``: the ContentTypes of BaseService and its subclasses,
+built once per process. Generic relations to services (chat rooms, ...) should
+then be looked up on ``(content_type, object_id)``.
+"""
+
+from __future__ import annotations
+
+import threading
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import BaseService
+
+_content_types = None
+_lock = threading.Lock()
+
+
+def service_content_types() -> dict:
+    """{content_type_id: ContentType} for BaseService and every subclass."""
+
+    global _content_types
+    if _content_types is None:
+        with _lock:
+            if _content_types is None:
+                models = [model for model in apps.get_models() if issubclass(model, BaseService)]
+                _content_types = {
+                    content_type.pk: content_type
+                    for content_type in ContentType.objects.get_for_models(*models, for_concrete_models=False).values()
+                }
+    return _content_types
+
+
+@receiver(post_migrate)
+def _reset(**kwargs):
+    # ContentType ids can change when the database is rebuilt.
+    global _content_types
+    _content_types = None
+
+
+def resolve_content_type(object_id):
+    """The ContentType of the service with this id, or None when there is no such service."""
+
+    try:
+        rows = list(BaseService.objects.filter(pk=object_id).values_list('polymorphic_ctype_id', flat=True)[:1])
+    except (TypeError, ValueError):
+        return None
+    if not rows:
+        return None
+    # Rows saved without polymorphic_ctype are plain BaseService.
+    return service_content_types().get(rows[0]) or ContentType.objects.get_for_model(BaseService)
@@ -1,10 +1,20 @@
 """Side effects on uni_services models (e.g. AI engine freelancer pool)."""
 
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from uni_services.models import Freelancer
+from payouts.models import LedgerEntry
+from payouts.signals import ledger_posted
+from uni_services.counters import earnings_change
+from uni_services.dashboard import schedule_refresh
+from uni_services.models import (
+    BaseService,
+    Freelancer,
+    FreelancerCertification,
+    FreelancerPortfolio,
+    FreelancerReview,
+)
 
 
 @receiver(post_save, sender=Freelancer)
@@ -24,3 +34,62 @@ def push_freelancer_profile_to_ai_engine(sender, instance, **kwargs):
         schedule_freelancer_pool_sync(fl)
 
     transaction.on_commit(_after_commit)
+
+
+# -- Dashboard snapshots (uni_services.dashboard) --------------------------------
+
+# BaseService fields the `orders` dashboard section is built from.
+DASHBOARD_ORDER_FIELDS = {
+    'assigned_to', 'status', 'bid_amount', 'title', 'user', 'started_at', 'completed_at', 'created_at',
+}
+# Freelancer saves limited to these fields do not affect the `profile` section.
+DASHBOARD_IGNORED_FREELANCER_FIELDS = {
+    'profile_completion_score', 'total_projects_completed', 'average_rating', 'total_earnings',
+    'last_active', 'updated_at',
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def refresh_dashboard_orders(sender, instance, **kwargs):
+    """Order transitions (any BaseService subclass) refresh the assignee's `orders` section."""
+    if kwargs.get("raw") or not issubclass(sender, BaseService):
+        return
+    previous = instance.previous('assigned_to')
+    if kwargs.get('signal') is post_save and not (instance.changed_fields() & DASHBOARD_ORDER_FIELDS):
+        return
+    schedule_refresh([instance.assigned_to_id, previous], ['orders'])
+
+
+@receiver(post_save, sender=FreelancerReview)
+@receiver(post_delete, sender=FreelancerReview)
+def refresh_dashboard_reviews(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    schedule_refresh([instance.freelancer_id], ['reviews'])
+
+
+@receiver(post_save, sender=FreelancerPortfolio)
+@receiver(post_delete, sender=FreelancerPortfolio)
+@receiver(post_save, sender=FreelancerCertification)
+@receiver(post_delete, sender=FreelancerCertification)
+def refresh_dashboard_profile(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    schedule_refresh([instance.freelancer_id], ['profile'])
+
+
+@receiver(post_save, sender=Freelancer)
+def refresh_dashboard_profile_completion(sender, instance, created, update_fields=None, **kwargs):
+    """Profile edits change the completion score; skip saves that only touch counters."""
+    if kwargs.get("raw") or created:
+        return
+    if update_fields is not None and set(update_fields) <= DASHBOARD_IGNORED_FREELANCER_FIELDS:
+        return
+    schedule_refresh([instance.pk], ['profile'])
+
+
+@receiver(ledger_posted, sender=LedgerEntry)
+def count_completed_payouts(sender, deltas, **kwargs):
+    """Payouts entering (or leaving) the completed bucket move Freelancer.total_earnings."""
+    earnings_change({pid: d.get('payouts_completed') for pid, d in deltas.items()})
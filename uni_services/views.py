@@ -29,10 +29,11 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 from tenancy.context import get_request_claims
+from chat import search as comment_search
 
 from .models import (
     BaseService, SoftwareService, ResearchService, CustomService,
-    ServiceFile, Freelancer, OrderStatusHistory, Bid,
+    ServiceFile, Freelancer, OrderStatusHistory, Bid, OrderComment,
     ProjectWorkspace, ProjectWorkspaceInvite,
 )
 from .serializers import (
@@ -44,7 +45,7 @@ from .serializers import (
     ServicePaymentUpdateSerializer, OrderActionSerializer,
     ServiceFileSerializer, ServiceFileUploadSerializer,
 
-    OrderCommentSerializer, OrderCommentCreateSerializer,
+    OrderCommentSerializer, OrderCommentCreateSerializer, OrderCommentSearchHitSerializer,
     OrderStatusHistorySerializer, OrderStatsSerializer,
     BidSerializer, BidCreateSerializer,
     ProjectWorkspaceInviteSerializer,
@@ -126,6 +127,36 @@ class BaseServiceActionMixin:
         serializer = OrderCommentSerializer(comments, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='comments/search')
+    def search_comments(self, request):
+        """
+        Full-text search over comments on the orders the caller can see, newest
+        first: ?q=<text>, optional ?order=<order id>, ?before=<comment id>, ?limit=<n>.
+        """
+        comments = OrderComment.objects.select_related('author')
+        if not (request.user.is_staff or request.user.is_admin):
+            comments = comments.filter(
+                Q(order__user=request.user) | Q(order__assigned_to__user=request.user)
+            )
+        if not request.user.is_staff:
+            comments = comments.filter(is_internal=False)
+        order_id = request.query_params.get('order')
+        if order_id:
+            comments = comments.filter(order_id=order_id)
+
+        query = request.query_params.get('q', '')
+        try:
+            hits, has_more, before = comment_search.page(
+                comment_search.search(comments, query),
+                before=request.query_params.get('before'),
+                limit=request.query_params.get('limit'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = OrderCommentSearchHitSerializer(hits, many=True, context={'request': request, 'query': query})
+        return Response({'results': serializer.data, 'has_more': has_more, 'before': before})
+
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         order = self.get_object()
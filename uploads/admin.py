@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import UploadSession
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'target', 'target_id', 'received_bytes', 'total_size', 'status', 'created_at')
+    list_filter = ('status', 'target')
+    search_fields = ('filename', 'user__email', 'target_id')
+    readonly_fields = ('id', 'chunk_checksums', 'received_bytes', 'result_id', 'created_at', 'updated_at')
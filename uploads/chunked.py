@@ -0,0 +1,238 @@
+"""
+Chunked, resumable uploads.
+
+A client opens an UploadSession for a target (chat room, service, support
+ticket or document) with the file's size, then PUTs the file as numbered chunks
+of ``chunk_size`` bytes, each with its SHA-256 in ``X-Chunk-Checksum``:
+
+  - a chunk is streamed from the request into its own temporary file under
+    TEMP_DIR while being hashed, with no transaction open, so neither a chunk
+    nor the file is held in memory and a slow client holds no row lock; a chunk
+    whose length or checksum is wrong is rejected there;
+  - only then is the session row locked, briefly, to check the chunk is still
+    the next one and append it to the part file at ``index * chunk_size``;
+  - ``received_bytes`` only moves after a chunk is on disk, so after a timeout
+    the client asks the session where it stands and resumes from ``next_chunk``;
+    re-sending an acknowledged chunk with the same checksum is a no-op;
+  - ``complete`` checks the size (and the whole-file checksum when one was
+    given), then hands the part file to the target's FileField, which streams it
+    into storage, and deletes the part file.
+
+TEMP_DIR must be shared by every web worker that serves the upload endpoints.
+Sessions left unfinished for SESSION_TTL_HOURS are removed by the
+``purge_upload_sessions`` command.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CHUNK_SIZE': 5 * 1024 * 1024,
+    'MIN_CHUNK_SIZE': 256 * 1024,
+    'MAX_CHUNK_SIZE': 32 * 1024 * 1024,
+    'MAX_FILE_SIZE': 2 * 1024 * 1024 * 1024,
+    'TEMP_DIR': None,
+    'SESSION_TTL_HOURS': 24,
+}
+
+READ_BLOCK = 64 * 1024
+
+
+def upload_setting(name):
+    return getattr(settings, 'CHUNKED_UPLOADS', {}).get(name, DEFAULTS[name])
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def temp_dir() -> Path:
+    path = Path(upload_setting('TEMP_DIR') or os.path.join(tempfile.gettempdir(), 'fred-uploads'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def part_path(session) -> Path:
+    return temp_dir() / f'{session.pk}.part'
+
+
+def normalize_checksum(value) -> str:
+    value = (value or '').strip().lower()
+    if value.startswith('sha256='):
+        value = value[len('sha256='):]
+    return value
+
+
+def open_session(user, target, target_id, filename, total_size, chunk_size=None, content_type='', checksum='', metadata=None):
+    chunk_size = chunk_size or upload_setting('CHUNK_SIZE')
+    return UploadSession.objects.create(
+        user=user,
+        target=target,
+        target_id=str(target_id),
+        filename=os.path.basename(filename),
+        content_type=content_type or '',
+        total_size=total_size,
+        chunk_size=chunk_size,
+        checksum=normalize_checksum(checksum),
+        metadata=metadata or {},
+        expires_at=timezone.now() + timedelta(hours=upload_setting('SESSION_TTL_HOURS')),
+    )
+
+
+def _check_active(session) -> None:
+    if session.status != UploadSession.Status.ACTIVE:
+        raise UploadError(f'Upload session is {session.status}', status=409)
+    if session.expires_at <= timezone.now():
+        raise UploadError('Upload session expired', status=410)
+
+
+def _check_index(session, index, checksum):
+    """True when chunk ``index`` was already acknowledged with this checksum; raises when it cannot be next."""
+
+    _check_active(session)
+    if not 0 <= index < session.chunk_count:
+        raise UploadError(f'Chunk index must be between 0 and {session.chunk_count - 1}')
+    if index < session.next_chunk:
+        if session.chunk_checksums[index] != checksum:
+            raise UploadError(f'Chunk {index} was already received with a different checksum', status=409)
+        return True
+    if index > session.next_chunk:
+        raise UploadError(
+            f'Expected chunk {session.next_chunk}', status=409,
+            next_chunk=session.next_chunk, received_bytes=session.received_bytes,
+        )
+    return False
+
+
+def write_chunk(session, index, stream, checksum) -> UploadSession:
+    """Stream chunk ``index`` from ``stream`` into a temporary file, then append it to the part file."""
+
+    checksum = normalize_checksum(checksum)
+    if not checksum:
+        raise UploadError('X-Chunk-Checksum (SHA-256 of the chunk) is required')
+
+    session = UploadSession.objects.get(pk=session.pk)
+    if _check_index(session, index, checksum):
+        return session
+
+    offset = index * session.chunk_size
+    expected = min(session.chunk_size, session.total_size - offset)
+    chunk_path = temp_dir() / f'{session.pk}.{index}.{uuid.uuid4().hex}.chunk'
+    try:
+        # Reading from the client can take long; no transaction is open meanwhile.
+        digest, written = hashlib.sha256(), 0
+        with open(chunk_path, 'wb') as chunk:
+            while written <= expected:
+                block = stream.read(min(READ_BLOCK, expected + 1 - written))
+                if not block:
+                    break
+                chunk.write(block)
+                digest.update(block)
+                written += len(block)
+        if written != expected:
+            raise UploadError(f'Chunk {index} must be exactly {expected} bytes')
+        if digest.hexdigest() != checksum:
+            raise UploadError(f'Checksum mismatch for chunk {index}', status=422)
+
+        with transaction.atomic():
+            # Serializes concurrent retries of the same chunk on the session row; held for a local copy only.
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if _check_index(session, index, checksum):
+                return session
+            path = part_path(session)
+            with open(path, 'r+b' if path.exists() else 'wb') as part, open(chunk_path, 'rb') as chunk:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, READ_BLOCK)
+                part.truncate(offset + written)
+            session.received_bytes = offset + written
+            session.chunk_checksums = session.chunk_checksums + [checksum]
+            session.save(update_fields=['received_bytes', 'chunk_checksums', 'updated_at'])
+        return session
+    finally:
+        chunk_path.unlink(missing_ok=True)
+
+
+def _file_checksum(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete(session, attach) -> UploadSession:
+    """
+    Verify the assembled file and pass it to ``attach(session, file)``, which
+    saves it on the target and returns the row it was attached to.
+    """
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        _check_active(session)
+        if session.received_bytes != session.total_size:
+            raise UploadError(
+                f'Upload incomplete: {session.received_bytes} of {session.total_size} bytes received', status=409,
+                next_chunk=session.next_chunk, received_bytes=session.received_bytes,
+            )
+        path = part_path(session)
+        if not path.exists() or path.stat().st_size != session.total_size:
+            raise UploadError('Uploaded data is missing on the server; start a new upload session', status=410)
+        if session.checksum and _file_checksum(path) != session.checksum:
+            raise UploadError('Checksum mismatch for the assembled file', status=422)
+
+        with open(path, 'rb') as part:
+            # FieldFile.save streams File.chunks() into storage.
+            instance = attach(session, File(part, name=session.filename))
+
+        session.status = UploadSession.Status.COMPLETE
+        session.result_id = str(instance.pk)
+        session.save(update_fields=['status', 'result_id', 'updated_at'])
+        transaction.on_commit(lambda: discard(session))
+    return session
+
+
+def discard(session) -> None:
+    try:
+        part_path(session).unlink(missing_ok=True)
+        # Chunks of requests that died mid-stream
+        for chunk_path in temp_dir().glob(f'{session.pk}.*.chunk'):
+            chunk_path.unlink(missing_ok=True)
+    except OSError:
+        logger.exception(f"Removing the part file of upload {session.pk} failed")
+
+
+def abort(session) -> None:
+    session.status = UploadSession.Status.ABORTED
+    session.save(update_fields=['status', 'updated_at'])
+    discard(session)
+
+
+def purge_expired(now=None) -> int:
+    """Delete sessions past their expiry, with any part file left behind."""
+
+    now = now or timezone.now()
+    stale = UploadSession.objects.filter(expires_at__lte=now)
+    for session in stale.only('pk').iterator():
+        discard(session)
+    deleted, _ = stale.delete()
+    return deleted
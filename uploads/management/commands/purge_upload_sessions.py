@@ -0,0 +1,21 @@
+"""
+Remove expired upload sessions and the part files they left behind (see
+uploads.chunked).
+
+Usage:
+  python manage.py purge_upload_sessions
+
+Run it from cron; an unfinished session expires CHUNKED_UPLOADS
+SESSION_TTL_HOURS after it was opened.
+"""
+from django.core.management.base import BaseCommand
+
+from uploads.chunked import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired chunked upload sessions and their temporary files.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired upload sessions"))
@@ -0,0 +1,64 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload (see uploads.chunked).
+
+    The file arrives as fixed-size chunks of ``chunk_size`` bytes in order;
+    ``received_bytes`` is the acknowledged offset a client resumes from. On
+    completion the assembled file is attached to ``target`` / ``target_id``.
+    """
+    class Target(models.TextChoices):
+        CHAT_MESSAGE = 'chat_message', _('Chat message attachment')
+        SERVICE_FILE = 'service_file', _('Service file')
+        SUPPORT_ATTACHMENT = 'support_attachment', _('Support ticket attachment')
+        DOCUMENT = 'document', _('Document')
+
+    class Status(models.TextChoices):
+        ACTIVE = 'active', _('Active')
+        COMPLETE = 'complete', _('Complete')
+        ABORTED = 'aborted', _('Aborted')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    target = models.CharField(max_length=20, choices=Target.choices)
+    target_id = models.CharField(max_length=50, help_text="Room, service, ticket or document the file goes to")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Optional SHA-256 of the whole file")
+    chunk_checksums = models.JSONField(default=list, blank=True, help_text="SHA-256 of each acknowledged chunk")
+    received_bytes = models.BigIntegerField(default=0)
+    metadata = models.JSONField(default=dict, blank=True, help_text="Target fields, e.g. message content or file_type")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.ACTIVE)
+    result_id = models.CharField(max_length=50, blank=True, default='', help_text="Id of the row the file was attached to")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size} bytes, {self.status})"
+
+    @property
+    def chunk_count(self):
+        return max(-(-self.total_size // self.chunk_size), 1)
+
+    @property
+    def next_chunk(self):
+        return len(self.chunk_checksums)
@@ -0,0 +1,44 @@
+from rest_framework import serializers
+
+from .chunked import upload_setting
+from .models import UploadSession
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.IntegerField(read_only=True)
+    next_chunk = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'target', 'target_id', 'filename', 'content_type', 'total_size',
+            'chunk_size', 'chunk_count', 'next_chunk', 'received_bytes', 'checksum',
+            'metadata', 'status', 'result_id', 'created_at', 'expires_at'
+        ]
+        read_only_fields = fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    target = serializers.ChoiceField(choices=UploadSession.Target.choices)
+    target_id = serializers.CharField(max_length=50)
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    total_size = serializers.IntegerField(min_value=1)
+    chunk_size = serializers.IntegerField(required=False)
+    checksum = serializers.RegexField(
+        r'^(sha256=)?[0-9a-fA-F]{64}$', required=False, allow_blank=True, default='',
+        help_text="SHA-256 of the whole file, verified on completion"
+    )
+    metadata = serializers.DictField(required=False, default=dict)
+
+    def validate_total_size(self, value):
+        limit = upload_setting('MAX_FILE_SIZE')
+        if value > limit:
+            raise serializers.ValidationError(f"File is too large. Maximum size is {limit / (1024 * 1024):.1f} MB.")
+        return value
+
+    def validate_chunk_size(self, value):
+        low, high = upload_setting('MIN_CHUNK_SIZE'), upload_setting('MAX_CHUNK_SIZE')
+        if not low <= value <= high:
+            raise serializers.ValidationError(f"chunk_size must be between {low} and {high} bytes.")
+        return value
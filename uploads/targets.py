@@ -0,0 +1,177 @@
+"""
+What a finished upload is attached to.
+
+Each target resolves ``target_id`` for the requesting user (raising NotFound /
+PermissionDenied like the endpoint that takes single-POST uploads for it) and
+saves the assembled file on the row, returning that row. Targets are looked up
+again on completion, so access revoked mid-upload is honoured.
+
+``check`` applies the endpoint's own file limits (raising ValidationError) to
+the announced filename and size when the session is opened, and again in
+``attach``. Only documents have such limits (their DocumentRequirement); the
+chat, service file and support attachment endpoints have none beyond
+CHUNKED_UPLOADS['MAX_FILE_SIZE'].
+"""
+
+from __future__ import annotations
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, PermissionDenied
+
+from .models import UploadSession
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTarget:
+    def check(self, obj, filename, size):
+        pass
+
+
+class ChatMessageTarget(UploadTarget):
+    """A new message carrying the file in a room the user participates in."""
+
+    def get(self, request, target_id):
+        from chat.models import ChatRoom
+
+        rooms = ChatRoom.objects.filter(Q(client=request.user) | Q(admin=request.user))
+        room = rooms.filter(pk=target_id).first() if str(target_id).isdigit() else None
+        if room is None:
+            raise NotFound(f'Chat room {target_id} not found')
+        return room
+
+    def attach(self, session, room, file):
+        from chat.models import Message
+        from chat.read_state import room_group_name
+
+        message = Message(room=room, sender=session.user, content=session.metadata.get('content', ''))
+        message.attachment.save(file.name, file, save=False)
+        message.save()
+        event = {
+            'type': 'chat_message',
+            'id': message.id,
+            'message': message.content,
+            'sender_id': session.user.id,
+            'sender_email': session.user.email,
+            'timestamp': str(message.timestamp),
+            'attachment': message.attachment.url,
+        }
+        transaction.on_commit(lambda: _broadcast(room_group_name(room.pk), event))
+        return message
+
+
+class ServiceFileTarget(UploadTarget):
+    """A ServiceFile on an order the user owns, is assigned to, or administers."""
+
+    def get(self, request, target_id):
+        from uni_services.models import BaseService
+        from uni_services.views import BasePermissionMixin
+
+        service = BaseService.objects.filter(pk=target_id).select_related('assigned_to').first()
+        if service is None:
+            raise NotFound(f'Service {target_id} not found')
+        if not BasePermissionMixin().check_service_permission(request, service):
+            raise PermissionDenied('Permission denied')
+        return service
+
+    def attach(self, session, service, file):
+        from uni_services.models import ServiceFile
+
+        file_type = session.metadata.get('file_type', 'other')
+        if file_type not in dict(ServiceFile.FILE_TYPES):
+            file_type = 'other'
+        service_file = ServiceFile(
+            service=service,
+            file_type=file_type,
+            description=session.metadata.get('description') or None,
+            uploaded_by=session.user,
+        )
+        service_file.file.save(file.name, file, save=False)
+        service_file.save()
+        return service_file
+
+
+class SupportAttachmentTarget(UploadTarget):
+    """An attachment on a ticket the user can see, logged like upload_attachment."""
+
+    def get(self, request, target_id):
+        from support.views import visible_tickets
+
+        ticket = visible_tickets(request).filter(pk=target_id).first() if str(target_id).isdigit() else None
+        if ticket is None:
+            raise NotFound(f'Ticket {target_id} not found')
+        return ticket
+
+    def attach(self, session, ticket, file):
+        from support.models import ActivityLog, SupportTicketAttachment
+
+        attachment = SupportTicketAttachment(ticket=ticket)
+        attachment.file.save(file.name, file, save=False)
+        attachment.save()
+        ActivityLog.objects.create(
+            ticket=ticket,
+            activity_type='file_upload',
+            description=f"File '{session.filename}' uploaded",
+            performed_by=session.user,
+            metadata={
+                'attachment_id': attachment.id,
+                'filename': session.filename,
+                'filesize': session.total_size,
+            }
+        )
+        return attachment
+
+
+class DocumentTarget(UploadTarget):
+    """The file of one of the user's documents, which goes back to pending review."""
+
+    def get(self, request, target_id):
+        from documents_management.models import Document
+
+        documents = Document.objects.all()
+        if not (request.user.is_staff and request.user.has_perm('documents.view_all_documents')):
+            documents = documents.filter(user=request.user)
+        document = documents.filter(pk=target_id).first() if str(target_id).isdigit() else None
+        if document is None:
+            raise NotFound(f'Document {target_id} not found')
+        return document
+
+    def check(self, document, filename, size):
+        # The same requirement limits as DocumentSerializer.validate_file
+        from documents_management.serializers import check_document_file
+
+        check_document_file(document.name, document.document_type, filename, size)
+
+    def attach(self, session, document, file):
+        self.check(document, session.filename, file.size)
+        document.file.save(file.name, file, save=False)
+        document.file_name = session.filename
+        document.content_type = session.content_type or None
+        document.file_size = session.total_size
+        document.status = document.DocumentStatus.PENDING
+        document.save()
+        return document
+
+
+TARGETS = {
+    UploadSession.Target.CHAT_MESSAGE: ChatMessageTarget(),
+    UploadSession.Target.SERVICE_FILE: ServiceFileTarget(),
+    UploadSession.Target.SUPPORT_ATTACHMENT: SupportAttachmentTarget(),
+    UploadSession.Target.DOCUMENT: DocumentTarget(),
+}
+
+
+def _broadcast(group, event) -> None:
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group, event)
+    except Exception:
+        # The message is saved; clients pick it up from the history.
+        logger.exception(f"Broadcasting uploaded attachment to {group} failed")
@@ -0,0 +1,81 @@
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from . import chunked
+from .models import UploadSession
+from .serializers import UploadSessionCreateSerializer, UploadSessionSerializer
+from .targets import TARGETS
+
+
+class UploadSessionViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable uploads (see uploads.chunked).
+
+    POST   /uploads/                      open a session: target, target_id, filename, total_size
+                                          [, chunk_size, content_type, checksum, metadata]
+    PUT    /uploads/{id}/chunks/{index}/  raw chunk bytes, X-Chunk-Checksum: <sha256 hex>
+    GET    /uploads/{id}/                 where to resume: next_chunk / received_bytes
+    POST   /uploads/{id}/complete/        assemble and attach; returns the session with result_id
+    DELETE /uploads/{id}/                 abort
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def error(self, e):
+        return Response({'error': str(e), **e.extra}, status=e.status)
+
+    def rejected(self, e):
+        # A target's file limits (ValidationError from check)
+        return Response({'error': ' '.join(str(detail) for detail in e.detail)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def create(self, request, *args, **kwargs):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Raises NotFound / PermissionDenied / ValidationError before any byte is sent.
+        target = TARGETS[data['target']]
+        try:
+            target.check(target.get(request, data['target_id']), data['filename'], data['total_size'])
+        except ValidationError as e:
+            return self.rejected(e)
+        session = chunked.open_session(request.user, **data)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        session = self.get_object()
+        try:
+            # Read straight from the request stream: request.data would buffer the chunk.
+            session = chunked.write_chunk(session, int(index), request.stream, request.headers.get('X-Chunk-Checksum'))
+        except chunked.UploadError as e:
+            return self.error(e)
+        return Response({
+            'next_chunk': session.next_chunk,
+            'received_bytes': session.received_bytes,
+            'total_size': session.total_size,
+        })
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        target = TARGETS[session.target]
+        obj = target.get(request, session.target_id)
+        try:
+            session = chunked.complete(session, lambda s, file: target.attach(s, obj, file))
+        except chunked.UploadError as e:
+            return self.error(e)
+        except ValidationError as e:
+            return self.rejected(e)
+        return Response(UploadSessionSerializer(session).data)
+
+    def destroy(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.status == UploadSession.Status.COMPLETE:
+            return Response({'error': 'Upload already completed'}, status=status.HTTP_409_CONFLICT)
+        chunked.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)